@@ -1,8 +1,7 @@
-from elasticsearch import Elasticsearch
 from source.lib import author_library
+from source.lib.storage_library import get_elasticsearch
 
-es_host = {"host": '192.168.2.33'}
-es = Elasticsearch([es_host])
+es = get_elasticsearch()
 
 documents = es.search(body={
     "query": {
@@ -0,0 +1,76 @@
+import collections
+import random
+import time
+import numpy
+
+if __name__ == '__main__' and __package__ is None:
+    from os import sys, path
+    sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from source.lib.edge_loader_library import get_edges_in
+from source.lib.edge_loader_library import get_edge_arrays_in
+
+# Benchmark of the filtering done by the SocialGraph builders on synthetic rows of the network table.
+# It does not need Cassandra: the rows have the same fields as the rows returned by the driver.
+# The time per edge of the set and sorted array indexes stays constant when the number of rows grows,
+# the list scan used before grows with the number of seeds.
+
+Row = collections.namedtuple("Row", ["node_id", "friend_follower_id", "is_friend", "is_follower"])
+NB_SEEDS = 5000
+EDGE_COUNTS = [10000, 100000, 1000000]
+MAX_ROWS_LIST_SCAN = 10000
+
+
+def generate_rows(nb_rows, seeds):
+    rows = []
+    for _ in range(nb_rows):
+        is_friend = random.random() < 0.5
+        if random.random() < 0.1:
+            friend_follower_id = random.choice(seeds)
+        else:
+            friend_follower_id = random.randint(1, 2 ** 62)
+        rows.append(Row(random.choice(seeds), friend_follower_id, is_friend, not is_friend))
+    return rows
+
+
+def get_edges_with_list_scan(rows, seeds):
+    edges = []
+    for row in rows:
+        if row.friend_follower_id in seeds:
+            if row.is_friend:
+                edges.append((row.node_id, row.friend_follower_id))
+            if row.is_follower:
+                edges.append((row.friend_follower_id, row.node_id))
+    return edges
+
+
+def benchmark(function, nb_rows):
+    t0 = time.time()
+    nb_edges = len(function())
+    elapsed = time.time() - t0
+    return nb_edges, elapsed, elapsed / nb_rows * 1e9
+
+
+def main():
+    random.seed(0)
+    seeds = random.sample(range(1, 2 ** 62), NB_SEEDS)
+    seeds_index = set(seeds)
+    sorted_seeds = numpy.array(sorted(seeds), dtype=numpy.int64)
+    print("{0:>10} {1:>12} {2:>10} {3:>10} {4:>12}".format("rows", "index", "edges", "seconds", "ns per row"))
+    for nb_rows in EDGE_COUNTS:
+        rows = generate_rows(nb_rows, seeds)
+        columns = [numpy.array(column) for column in zip(*rows)]
+        columns[0], columns[1] = columns[0].astype(numpy.int64), columns[1].astype(numpy.int64)
+        functions = [
+            ("set", lambda: get_edges_in(rows, seeds_index)),
+            ("sorted array", lambda: get_edge_arrays_in(*(columns + [sorted_seeds]))[0])
+        ]
+        if nb_rows <= MAX_ROWS_LIST_SCAN:
+            functions.append(("list", lambda: get_edges_with_list_scan(rows, seeds)))
+        for index_name, function in functions:
+            nb_edges, elapsed, per_row = benchmark(function, nb_rows)
+            print("{0:>10} {1:>12} {2:>10} {3:>10.4f} {4:>12.1f}".format(nb_rows, index_name, nb_edges, elapsed,
+                                                                           per_row))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+import sys
+
+if __name__ == '__main__' and __package__ is None:
+    from os import path
+    sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from source.lib import network_library as nl
+
+# Build the index of the retweet cascades of the graphs given in argument (one scroll over the tweets index
+# per graph), with "--rebuild" the indexes already stored are built again.
+rebuild = "--rebuild" in sys.argv
+for graph_name in [argument for argument in sys.argv[1:] if argument != "--rebuild"]:
+    social_graph = nl.SocialGraph(graph_name)
+    cascade_index = social_graph.get_cascade_index(rebuild=rebuild)
+    nb_exposures, nb_adoptions = cascade_index.get_exposure_counts()
+    print("{0}: {1} exposed users, {2} of them retweeted a cascade".format(graph_name, (nb_exposures > 0).sum(),
+                                                                           (nb_adoptions > 0).sum()))
@@ -0,0 +1,30 @@
+import argparse
+import os
+import sys
+
+if __name__ == '__main__' and __package__ is None:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))))
+from source.lib import article_library
+from source.lib.crawler_library import ArticleSiteCrawl
+from source.lib.crawler_library import Crawler
+
+# Crawl the listing of an article site and save the articles not saved yet in Cassandra and Elasticsearch
+# (replace the listing jobs of job_crawler.ipynb)
+ARTICLE_CLASSES = {"dailystormer": article_library.DailystormerArticle, "amren": article_library.AmrenArticle}
+
+parser = argparse.ArgumentParser()
+parser.add_argument("site", choices=sorted(ARTICLE_CLASSES))
+parser.add_argument("--first-page", type=int, default=1)
+parser.add_argument("--last-page", type=int, default=None, help="default: last page of the listing")
+parser.add_argument("--threads", type=int, default=16)
+parser.add_argument("--connections-per-host", type=int, default=2)
+parser.add_argument("--delay", type=float, default=1.0,
+                    help="minimum delay in seconds between two requests to the site (robots.txt can make it longer)")
+parser.add_argument("--retries", type=int, default=3)
+arguments = parser.parse_args()
+
+crawler = Crawler(nb_threads=arguments.threads, max_connections_per_host=arguments.connections_per_host,
+                  delay=arguments.delay, max_retries=arguments.retries)
+site_crawl = ArticleSiteCrawl(ARTICLE_CLASSES[arguments.site], crawler, arguments.first_page, arguments.last_page)
+statistics = site_crawl.run()
+print("Saved {0} articles".format(statistics["saved"]))
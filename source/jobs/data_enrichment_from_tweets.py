@@ -1,15 +1,14 @@
-from cassandra.cluster import Cluster
 from cassandra.query import SimpleStatement
-from elasticsearch import Elasticsearch
 import json
+import numpy
 
-ES_HOST = {"host": "192.168.2.33", "port": 9200}
-ES = Elasticsearch([ES_HOST])
+from source.lib.edge_cache_library import EdgeCache
+from source.lib.edge_cache_library import NETWORK_CACHE_DIRECTORY
+from source.lib.edge_loader_library import EdgeLoader
+from source.lib.storage_library import get_elasticsearch
+from source.lib.storage_library import get_session
 
-CLUSTER = Cluster(['192.168.2.33'], port=9042)
-SESSION = CLUSTER.connect()
-SESSION.set_keyspace("twitter")
-TABLE_NAME = "twitter_user"
+TABLE_NAME = "twitter.twitter_user"
 
 
 def create_new_cassandra_table(table_name):
@@ -25,14 +24,18 @@ def create_new_cassandra_table(table_name):
                                     PRIMARY KEY ((node_id), screen_name)
                                     )
                                     WITH comment='Data about every twitter user collected'""".format(table_name)
-    SESSION.execute(table)
+    get_session().execute(table)
 
 
 def get_all_ids():
-    query = "SELECT node_id, friend_follower_id FROM network"
+    edge_cache = EdgeCache(NETWORK_CACHE_DIRECTORY, lambda: EdgeLoader(get_session(), "twitter.network"))
+    if edge_cache.is_fresh():
+        node_ids, friend_follower_ids, _, _ = edge_cache.get_columns()
+        return set(numpy.union1d(node_ids, friend_follower_ids).tolist())
+    query = "SELECT node_id, friend_follower_id FROM twitter.network"
     statement = SimpleStatement(query, fetch_size=10000)
     ids = set()
-    for row in SESSION.execute(statement):
+    for row in get_session().execute(statement):
         ids.add(row.friend_follower_id)
         ids.add(row.node_id)
     return ids
@@ -75,7 +78,7 @@ def build_query(twitter_id, field):
 
 
 def retrieve_document_given_a_body(body):
-    es_response = ES.search(doc_type="tweet", index="tweets", body=body, size=1)
+    es_response = get_elasticsearch().search(doc_type="tweet", index="tweets", body=body, size=1)
     if es_response["hits"]["total"] != 0:
         return es_response["hits"]["hits"][0]
     else:
@@ -111,14 +114,16 @@ def extract(document, twitter_id, field):
 
 
 def save_user_info(data):
-    prepared = SESSION.prepare('INSERT INTO {0} JSON ?'.format(TABLE_NAME))
-    SESSION.execute(prepared, [json.dumps(data)])
+    session = get_session()
+    prepared = session.prepare('INSERT INTO {0} JSON ?'.format(TABLE_NAME))
+    session.execute(prepared, [json.dumps(data)])
 
 
 def get_and_save_info(twitter_id):
     source_fields = ["user", "retweet", "entities"]
-    prepared = SESSION.prepare('SELECT screen_name FROM {0} WHERE node_id=?'.format(TABLE_NAME))
-    row = SESSION.execute(prepared, [twitter_id])
+    session = get_session()
+    prepared = session.prepare('SELECT screen_name FROM {0} WHERE node_id=?'.format(TABLE_NAME))
+    row = session.execute(prepared, [twitter_id])
     if not row:
         for field in source_fields:
             query = build_query(twitter_id, field)
@@ -0,0 +1,32 @@
+import sys
+
+if __name__ == '__main__' and __package__ is None:
+    from os import path
+    sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+import numpy
+
+from source.lib import network_library as nl
+from source.lib.experiment_library import DiffusionExperiment
+
+# Simulate diffusions on the sampled subgraphs from the most followed nodes and from random samples of nodes.
+# The experiment of a graph is checkpointed in its directory, running the job again resumes it.
+graph_names = ["sub_graph_{0}_nodes".format(size) for size in (2000, 3000, 5000, 6000, 7000, 14000)]
+nb_seeds = 10
+nb_samples = 5
+nb_runs = 10000
+
+for graph_name in graph_names:
+    social_graph = nl.SocialGraph(graph_name)
+    compact_graph = social_graph.compact_graph
+    if compact_graph.number_of_nodes == 0:
+        continue
+    most_followed = social_graph.get_degree_statistics().top_k("in", nb_seeds)
+    seed_sets = {"most_followed": [node for node, _ in most_followed]}
+    for sample_number in range(nb_samples):
+        random_state = numpy.random.RandomState([0, sample_number])
+        seed_sets["random_{0}".format(sample_number)] = random_state.choice(
+            compact_graph.node_ids, min(nb_seeds, compact_graph.number_of_nodes), replace=False).tolist()
+    experiment = DiffusionExperiment(compact_graph, social_graph.get_result_cache())
+    activation_probabilities = experiment.run(seed_sets, nb_runs=nb_runs)
+    for name, probabilities in sorted(activation_probabilities.items()):
+        print("{0} {1}: expected cascade size {2:.1f}".format(graph_name, name, probabilities.sum()))
@@ -0,0 +1,17 @@
+import sys
+
+if __name__ == '__main__' and __package__ is None:
+    from os import path
+    sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from source.lib import network_library as nl
+from source.lib.feature_library import COMMUNITY_FEATURE_NAMES
+from source.lib.feature_library import FEATURE_NAMES
+from source.lib.feature_library import load_features
+
+# Build the exposure features of the (user, tweet) pairs of the 20000 nodes graph
+sub_graph_20000_nodes = nl.SocialGraph("sub_graph_20000_nodes")
+features_directory = sub_graph_20000_nodes.build_exposure_features(nb_node=1000, community_method="louvain")
+user_ids, tweet_ids, features, labels = load_features(features_directory)
+print("{0} exposures, {1} diffusions".format(len(labels), labels.sum()))
+for feature_name, mean in zip(FEATURE_NAMES + COMMUNITY_FEATURE_NAMES, features.mean(axis=0) if len(labels) else []):
+    print("Mean {0}: {1}".format(feature_name, mean))
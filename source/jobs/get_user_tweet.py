@@ -5,13 +5,14 @@ if __name__ == '__main__' and __package__ is None:
     sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
     from source.lib import tweeter_library as tl
     from source.lib import network_library as nl
+    from source.lib.storage_library import get_session
 
 
 # Function that will retrieve ALL the last tweets of a user
 def get_all_nodes_tweets():
-    query = "SELECT friend_follower_id FROM network"
+    query = "SELECT friend_follower_id FROM {0}".format(nl.SocialGraph.network_table)
     statement = SimpleStatement(query, fetch_size=1000)
-    for row in tl.SESSION.execute(statement):
+    for row in get_session().execute(statement):
         tl.collect_and_save_tweet_from_user(row.friend_follower_id)
 
 
@@ -1,11 +1,13 @@
 import tweepy
-from cassandra.cluster import Cluster
 
 if __name__ == '__main__' and __package__ is None:
     from os import sys, path
     sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
     from source.settings import settings
     import source.lib.network_library as nl
+    from source.lib.storage_library import get_session
+
+NETWORK_TABLE = "twitter.network"
 
 
 def cassandra_initialisation(session, strategy, replication_factor, keyspace, table_name):
@@ -13,8 +15,7 @@ def cassandra_initialisation(session, strategy, replication_factor, keyspace, ta
               " WITH replication = {{'class': '{1}', 'replication_factor': '{2}' }}"
     request = request.format(keyspace, strategy, replication_factor)
     session.execute(request)
-    session.set_keyspace(keyspace)
-    table = """CREATE TABLE IF NOT EXISTS {} (
+    table = """CREATE TABLE IF NOT EXISTS {}.{} (
                 node_id bigint ,
                 screen_name text,
                 centrality float,
@@ -22,7 +23,7 @@ def cassandra_initialisation(session, strategy, replication_factor, keyspace, ta
                 is_friend boolean,
                 is_follower boolean,
                 PRIMARY KEY ((node_id), friend_follower_id)
-            );""".format(table_name)
+            );""".format(keyspace, table_name)
     session.execute(table)
 
 
@@ -41,7 +42,8 @@ def get_data(tweepy_function, author_id, author_username, session):
                     print("Collected followers: ", len(followers))
                 followers.add(follower_id)
                 query = "INSERT INTO {0} (node_id, screen_name, friend_follower_id, centrality, is_follower) VALUES " \
-                        "({1}, '{2}', {3}, {4}, true)".format("network", author_id, author_username, follower_id, 0.0)
+                        "({1}, '{2}', {3}, {4}, true)".format(NETWORK_TABLE, author_id, author_username, follower_id,
+                                                              0.0)
                 session.execute(query)
         if tweepy_function == "friends":
             friends = set()
@@ -50,7 +52,7 @@ def get_data(tweepy_function, author_id, author_username, session):
                     print("Collected friends: ", len(friends))
                 friends.add(friend_id)
                 query = "INSERT INTO {0} (node_id, screen_name, friend_follower_id, centrality, is_friend) VALUES " \
-                        "({1}, '{2}', {3}, {4}, true)".format("network", author_id, author_username, friend_id, 0.0)
+                        "({1}, '{2}', {3}, {4}, true)".format(NETWORK_TABLE, author_id, author_username, friend_id, 0.0)
                 session.execute(query)
     except Exception as e:
         if "Not authorized." in str(e.response.content):
@@ -60,18 +62,17 @@ def get_data(tweepy_function, author_id, author_username, session):
 
 
 def seed_job():
-    cluster = Cluster(['192.168.2.33'], port=9042)
-    session = cluster.connect()
+    session = get_session()
     query = "SELECT * FROM article.author"
 
-    cassandra_initialisation(session, "SimpleStrategy", 2, "twitter", "network")
+    cassandra_initialisation(session, "SimpleStrategy", 2, *NETWORK_TABLE.split("."))
 
     authors = session.execute(query)
     methods = ["followers", "friends"]
 
     for author in authors:
         print(author.twitter_username)
-        is_present = session.execute("SELECT * FROM {0} WHERE node_id={1}".format("network", author.twitter_id))
+        is_present = session.execute("SELECT * FROM {0} WHERE node_id={1}".format(NETWORK_TABLE, author.twitter_id))
         if not is_present:
             for method in methods:
                 get_data(method, author.twitter_id, author.twitter_username, session)
@@ -79,24 +80,44 @@ def seed_job():
             print(author.twitter_username, "Already present in the database ")
 
 
-def centrality_job(extended_seed_size_wanted):
-    cluster = Cluster(['192.168.2.33'], port=9042)
-    session = cluster.connect()
+# Return the dictionary {node: value} of the metric used to choose the next node to crawl.
+# The betweenness and the PageRank are updated incrementally, the other metrics are cheap enough to be computed again
+def get_ranking(graph, metric):
+    if metric == "betweenness":
+        return graph.get_incremental_centrality().get_betweenness()
+    if metric == "pagerank":
+        return graph.get_incremental_centrality().get_pagerank()
+    return graph.get_nodes_by_centrality(metric)
+
+
+def centrality_job(extended_seed_size_wanted, nb_sources=256, metric="betweenness"):
+    session = get_session()
 
-    cassandra_initialisation(session, "SimpleStrategy", 2, "twitter", "network")
+    cassandra_initialisation(session, "SimpleStrategy", 2, *NETWORK_TABLE.split("."))
 
     methods = ["followers", "friends"]
     graph = nl.SocialGraph.build_graph_from_seed("whole_graph")
-    node_by_centrality_betweenness = graph.get_nodes_by_betweenness_centrality(5000)
-    sorted_nodes_by_centrality = nl.sort_node_by_importance(node_by_centrality_betweenness)
-    for node, centrality in sorted_nodes_by_centrality[:extended_seed_size_wanted]:
+    graph.get_incremental_centrality(nb_sources=nb_sources)
+    edge_loader = nl.SocialGraph.get_cassandra_edge_loader()
+    crawled_nodes = set()
+    # After every crawl the new edges update the centrality, so the next node is chosen with the new ranking
+    for _ in range(extended_seed_size_wanted):
+        sorted_nodes_by_centrality = nl.sort_node_by_importance(get_ranking(graph, metric))
+        node = next((node for node, _ in sorted_nodes_by_centrality if node not in crawled_nodes), None)
+        if node is None:
+            break
+        crawled_nodes.add(node)
         print(node)
-        is_present = session.execute("SELECT * FROM {0} WHERE node_id={1}".format("network", node))
+        is_present = session.execute("SELECT * FROM {0} WHERE node_id={1}".format(NETWORK_TABLE, node))
         if not is_present:
             for method in methods:
                 get_data(method, node, None, session)
         else:
             print("{} Already present in the database ".format(node))
+        edges = []
+        for row in edge_loader.iter_partitions([node]):
+            edges += nl.edges_from_row(row)
+        print("Centrality updated: {0}".format(graph.add_edge_batch(edges)))
 
 
 AUTH = tweepy.OAuthHandler(settings.CONSUMER_KEY, settings.CONSUMER_SECRET)
@@ -0,0 +1,12 @@
+import sys
+
+if __name__ == '__main__' and __package__ is None:
+    from os import path
+    sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from source.lib import network_library as nl
+
+# Convert the GML files of the graphs given in argument to .npz snapshots, the next constructions of these graphs
+# read the snapshot instead of parsing the GML file (a snapshot older than its GML file is ignored).
+for graph_name in sys.argv[1:]:
+    social_graph = nl.SocialGraph(graph_name)
+    social_graph.export_snapshot(g='original')
@@ -0,0 +1,18 @@
+import sys
+
+if __name__ == '__main__' and __package__ is None:
+    from os import path
+    sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
+from source.lib import network_library as nl
+
+# Refresh the local copy of the twitter.network table used by the SocialGraph builders.
+# Without argument only the partitions added since the last refresh are read,
+# with "--rebuild" the whole table is copied again and with "--check" the partitions missing from the cache are
+# only counted.
+edge_cache = nl.SocialGraph.get_edge_cache()
+if "--rebuild" in sys.argv:
+    edge_cache.build()
+elif "--check" in sys.argv:
+    print("{0} partitions of the network table are not in the cache".format(len(edge_cache.get_missing_partitions())))
+else:
+    edge_cache.refresh()
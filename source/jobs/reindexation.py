@@ -1,21 +1,16 @@
-from cassandra.cluster import Cluster
-from cassandra.query import SimpleStatement
+import sys
 
+if __name__ == '__main__' and __package__ is None:
+    from os import path
+    sys.path.append(path.dirname(path.dirname(path.dirname(path.abspath(__file__)))))
 from source.lib import article_library
+from source.lib.reindex_library import BulkReindexer
+from source.lib.storage_library import get_elasticsearch
+from source.lib.storage_library import get_session
 
-cluster = Cluster(['192.168.2.33'], port=9042)
-session = cluster.connect()
-
-query = "SELECT * FROM article.amren"
-
-statement = SimpleStatement(query, fetch_size=100)
-for article in session.execute(statement):
-    ammren_article = article_library.AmrenArticle.from_cassandra(article)
-    ammren_article.save_elasticsearch()
-
-query = "SELECT * FROM article.dailystormer"
-
-statement = SimpleStatement(query, fetch_size=100)
-for article in session.execute(statement):
-    dailystormer_article = article_library.DailystormerArticle.from_cassandra(article)
-    dailystormer_article.save_elasticsearch()
+# Copy the articles of article.amren and article.dailystormer from Cassandra to Elasticsearch
+# Usage: reindexation.py [chunk size] [number of bulk threads]
+chunk_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+thread_count = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+reindexer = BulkReindexer(get_session(), get_elasticsearch(), chunk_size=chunk_size, thread_count=thread_count)
+reindexer.reindex([article_library.AmrenArticle, article_library.DailystormerArticle])
@@ -0,0 +1,56 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+
+if __name__ == '__main__' and __package__ is None:
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from source.__init__ import DEFINITIONS_ROOT
+from source.lib import article_library
+from source.lib import benchmark_library
+
+# Benchmark of the storage: read throughput of Cassandra and Elasticsearch and hydration of the Dailystormer articles
+# for several dataset and fetch sizes, bulk write throughput of Elasticsearch, build and snapshot times of the
+# sub_graph_* graphs. The results are written as JSON to track the regressions.
+# With --offline the stores are replaced by in-memory stand-ins filled with synthetic articles.
+parser = argparse.ArgumentParser()
+parser.add_argument("--offline", action="store_true",
+                    help="use in-memory stores instead of Cassandra and Elasticsearch")
+parser.add_argument("--dataset-sizes", type=int, nargs="+", default=[1000, 10000])
+parser.add_argument("--fetch-sizes", type=int, nargs="+", default=[100, 1000, 5000])
+parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[500, 2000])
+parser.add_argument("--elasticsearch-host", default=None, help="host:port of Elasticsearch (default from storage)")
+parser.add_argument("--output", default=None, help="JSON file of the results (default in data/benchmark)")
+arguments = parser.parse_args()
+
+article_class = article_library.DailystormerArticle
+if arguments.offline:
+    rows = benchmark_library.generate_article_rows(max(arguments.dataset_sizes))
+    stores = [benchmark_library.MemoryArticleStore("cassandra_memory", rows, article_class.from_cassandra),
+              benchmark_library.MemoryArticleStore("elasticsearch_memory",
+                                                   [benchmark_library.get_hit(row) for row in rows],
+                                                   article_class.from_elasticsearch)]
+else:
+    from source.lib import storage_library
+    if arguments.elasticsearch_host:
+        host, port = arguments.elasticsearch_host.split(":")
+        storage_library.configure(elasticsearch_hosts=[{"host": host, "port": int(port)}])
+    stores = [benchmark_library.CassandraArticleStore(storage_library.get_session(), article_class),
+              benchmark_library.ElasticsearchArticleStore(storage_library.get_elasticsearch(), article_class)]
+
+results = {"date": datetime.datetime.now().isoformat(), "offline": arguments.offline, "reads": [], "writes": []}
+for store in stores:
+    reads, writes = benchmark_library.benchmark_store(store, arguments.dataset_sizes, arguments.fetch_sizes,
+                                                      arguments.chunk_sizes)
+    results["reads"] += reads
+    results["writes"] += writes
+results["graphs"] = benchmark_library.benchmark_graphs(DEFINITIONS_ROOT+"/data/graph")
+
+output = arguments.output or DEFINITIONS_ROOT+"/data/benchmark/storage_benchmark_{0}.json".format(
+    datetime.datetime.now().strftime("%Y%m%d_%H%M%S"))
+if not os.path.exists(os.path.dirname(os.path.abspath(output))):
+    os.makedirs(os.path.dirname(os.path.abspath(output)))
+with open(output, "w") as output_file:
+    json.dump(results, output_file, indent=2)
+print("Results written in {0}".format(output))
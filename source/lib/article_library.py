@@ -5,24 +5,30 @@ import re
 import datetime
 import random
 import abc
+import threading
 from bs4 import BeautifulSoup
-from elasticsearch import Elasticsearch
-from cassandra.cluster import Cluster
 import plotly.offline as po
 from plotly.graph_objs import *
 import plotly.graph_objs as go
 
+from source.lib.storage_library import LazyClient
+from source.lib.storage_library import get_elasticsearch
+from source.lib.storage_library import get_session
+
 
 # This class is used when you want to crawl one website, it defined some of the basic fields
 class Article(abc.ABC):
+    # The fields of the articles are stored in slots, an article is a small record without __dict__
+    __slots__ = ("url", "author", "article", "author_wording", "article_id", "date", "title", "links", "sources")
     strategy = "SimpleStrategy"
     replication_factor = 2
     cassandra_keyspace = "article"
-    cluster = Cluster(['192.168.2.33'], port=9042)
-    session = cluster.connect()
-    es_host = {"host": "192.168.2.33", "port": 9200}
-    es = Elasticsearch([es_host])
+    session = LazyClient(get_session)
+    es = LazyClient(get_elasticsearch)
     es_index = "article"
+    # If the elasticsearch index and the cassandra table of the class were created by this process (see bootstrap)
+    schema_initialised = False
+    schema_lock = threading.Lock()
     index_settings = {
         "settings": {
             "index": {
@@ -45,6 +51,11 @@ class Article(abc.ABC):
     def website_url(self):
         pass
 
+    # URL of the pages of the listing of the articles, formatted with the number of the page
+    @abc.abstractproperty
+    def listing_url(self):
+        pass
+
     @abc.abstractproperty
     def mapping(self):
         pass
@@ -62,18 +73,38 @@ class Article(abc.ABC):
 
     # Create an index in elasticsearch if no one already exists
     # Take 0 parameter in input
+    @classmethod
     @abc.abstractmethod
-    def elasticsearch_initialisation(self):
+    def elasticsearch_initialisation(cls):
         pass
 
     # Create a keyspace in cassandra
     # Take 2 parameters in input:
     #          - The replication strategy
     #          - The replication factor
+    @classmethod
     @abc.abstractmethod
-    def cassandra_initialisation(self, strategy, replication_factor):
+    def cassandra_initialisation(cls, strategy, replication_factor):
         pass
 
+    # Create the elasticsearch index and the cassandra table of the class once per process. It is called before the
+    # requests of the class instead of in the constructor, so building an article from a row does not query the
+    # databases
+    @classmethod
+    def bootstrap(cls):
+        if cls.schema_initialised:
+            return
+        with cls.schema_lock:
+            if not cls.schema_initialised:
+                cls.elasticsearch_initialisation()
+                cls.cassandra_initialisation(cls.strategy, cls.replication_factor)
+                cls.schema_initialised = True
+
+    # Return the cassandra table of the articles as "keyspace.table", the shared session is not bound to a keyspace
+    @classmethod
+    def get_table(cls):
+        return "{0}.{1}".format(cls.cassandra_keyspace, cls.document_type)
+
     # Extract all the article from a piece of HTML
     # Take 1 parameter in input:
     #          - Piece of HTML contaning all the paragraphs
@@ -119,8 +150,43 @@ class Article(abc.ABC):
     #          - The class
     #          - URL to crawl
     @classmethod
-    @abc.abstractmethod
     def from_crawler(cls, url):
+        opener = urllib.request.build_opener()
+        opener.addheaders = [('User-Agent', 'Mozilla/5.0')]
+        return cls.from_html(url, opener.open(url))
+
+    # Construct an object Article from the HTML of its page (used by the crawler, which fetches the pages itself)
+    # Take 3 parameters in input:
+    #          - The class
+    #          - URL of the page
+    #          - HTML of the page
+    @classmethod
+    @abc.abstractmethod
+    def from_html(cls, url, html):
+        pass
+
+    # Return the URL of a page of the listing of the articles
+    # Take 2 parameters in input:
+    #          - The class
+    #          - The number of the page
+    @classmethod
+    def get_listing_url(cls, page):
+        return cls.listing_url.format(page)
+
+    # Extract the URL of the articles of a page of the listing
+    # Take 1 parameter in input:
+    #          - The HTML of the listing page parsed by BeautifulSoup
+    @staticmethod
+    @abc.abstractmethod
+    def get_listing_links(soup):
+        pass
+
+    # Extract the number of the last page of the listing
+    # Take 1 parameter in input:
+    #          - The HTML of the listing page parsed by BeautifulSoup
+    @staticmethod
+    @abc.abstractmethod
+    def get_last_listing_page(soup):
         pass
 
     # Construct an object Article from a elasticsearch document
@@ -155,6 +221,23 @@ class Article(abc.ABC):
     def save_cassandra(self):
         pass
 
+    # Return the elasticsearch document of the article
+    # Take 1 parameter in input:
+    #          - The class
+    @abc.abstractmethod
+    def get_elasticsearch_body(self):
+        pass
+
+    # Return the action indexing the article with helpers.bulk (the id is chosen by elasticsearch for a new article)
+    # Take 1 parameter in input:
+    #          - The class
+    def get_bulk_action(self):
+        action = {"_op_type": "index", "_index": self.es_index, "_type": self.document_type,
+                  "_source": self.get_elasticsearch_body()}
+        if self.article_id:
+            action["_id"] = self.article_id
+        return action
+
     # Insert an object into elasticsearch
     # Take 1 parameter in input:
     #          - The class
@@ -203,7 +286,9 @@ class Article(abc.ABC):
 
 # This class is used when you want to create a dailystormer object
 class DailystormerArticle(Article):
+    __slots__ = ("nb_comment",)
     website_url = "http://www.dailystormer.com/"
+    listing_url = "http://www.dailystormer.com/section/featured-stories/page/{0}/"
     mapping = {
         "properties": {
             "title": {"type": "text", "fielddata": True},
@@ -235,20 +320,19 @@ class DailystormerArticle(Article):
         self.links = []
         self.sources = []
         self.nb_comment = -1
-        self.elasticsearch_initialisation()
-        self.cassandra_initialisation(self.strategy, self.replication_factor)
 
-    def elasticsearch_initialisation(self):
-        if not self.es.indices.exists(index=self.es_index):
-            self.es.indices.create(index=self.es_index, body=self.index_settings)
-        self.es.indices.put_mapping(index=self.es_index, doc_type=self.document_type, body=self.mapping)
+    @classmethod
+    def elasticsearch_initialisation(cls):
+        if not cls.es.indices.exists(index=cls.es_index):
+            cls.es.indices.create(index=cls.es_index, body=cls.index_settings)
+        cls.es.indices.put_mapping(index=cls.es_index, doc_type=cls.document_type, body=cls.mapping)
 
-    def cassandra_initialisation(self, strategy, replication_factor):
+    @classmethod
+    def cassandra_initialisation(cls, strategy, replication_factor):
         request = "CREATE KEYSPACE IF NOT EXISTS {0}" \
                   " WITH replication = {{'class': '{1}', 'replication_factor': '{2}' }}"
-        request = request.format(self.cassandra_keyspace, strategy, replication_factor)
-        self.session.execute(request)
-        self.session.set_keyspace(self.cassandra_keyspace)
+        request = request.format(cls.cassandra_keyspace, strategy, replication_factor)
+        cls.session.execute(request)
         table = """CREATE TABLE IF NOT EXISTS
                             {0} (
                                 url text PRIMARY KEY,
@@ -261,8 +345,8 @@ class DailystormerArticle(Article):
                                 nb_comment int,
                                 links list<text>,
                                 sources list<text>)
-                                WITH comment='Table of {1} article'""".format(self.document_type, self.document_type)
-        self.session.execute(table)
+                                WITH comment='Table of {1} article'""".format(cls.get_table(), cls.document_type)
+        cls.session.execute(table)
 
     @staticmethod
     def get_pure_article(full_article):
@@ -305,6 +389,14 @@ class DailystormerArticle(Article):
                     sources.append(source)
         return list(sources)
 
+    @staticmethod
+    def get_listing_links(soup):
+        return [title.a['href'] for title in soup.find_all("h2", {"class": "post-box-title"}) if title.a]
+
+    @staticmethod
+    def get_last_listing_page(soup):
+        return int(re.findall(r'\d+', soup.find("a", {"class": "last"})['href'])[0])
+
     @staticmethod
     def get_date(soup):
         date = soup.find("time", style=False)
@@ -323,13 +415,10 @@ class DailystormerArticle(Article):
         return date
 
     @classmethod
-    def from_crawler(cls, url):
+    def from_html(cls, url, html):
         obj = cls()
         obj.url = url
-        opener = urllib.request.build_opener()
-        opener.addheaders = [('User-Agent', 'Mozilla/5.0')]
-        response = opener.open(url)
-        soup = BeautifulSoup(response, 'html.parser')
+        soup = BeautifulSoup(html, 'html.parser')
         article = soup.find("div", {"class": "entry"})
         paragraphs = article.find_all("p")
         if len(paragraphs) == 0:  # Case if the HTML is not well formated
@@ -357,7 +446,7 @@ class DailystormerArticle(Article):
 
     @classmethod
     def from_elasticsearch(cls, elasticsearch_article):
-        obj = cls()
+        obj = cls.__new__(cls)
         document = elasticsearch_article['_source']
         obj.url = document['url']
         obj.author = document['author']
@@ -373,7 +462,7 @@ class DailystormerArticle(Article):
 
     @classmethod
     def from_cassandra(cls, cassandra_row):
-        obj = cls()
+        obj = cls.__new__(cls)
         obj.url = cassandra_row.url
         obj.author = cassandra_row.author
         obj.article = cassandra_row.article
@@ -397,12 +486,13 @@ class DailystormerArticle(Article):
             INSERT INTO {0} (article_id, url, title, author, date,
                         article, author_wording, links, sources, nb_comment)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """.format(self.document_type)
+            """.format(self.get_table())
+        self.bootstrap()
         self.session.execute(insert_query, (self.article_id, self.url, self.title, self.author, self.date, self.article,
                                             self.author_wording, self.links, self.sources, self.nb_comment))
 
-    def save_elasticsearch(self):
-        body = {
+    def get_elasticsearch_body(self):
+        return {
             'url': self.url,
             'title': self.title,
             'author': self.author,
@@ -413,6 +503,10 @@ class DailystormerArticle(Article):
             'sources': self.sources,
             'nb_comment': self.nb_comment
         }
+
+    def save_elasticsearch(self):
+        body = self.get_elasticsearch_body()
+        self.bootstrap()
         if self.article_id == "":
             response = self.es.index(index=self.es_index, doc_type=self.document_type, body=body)
             self.article_id = response['_id']
@@ -426,11 +520,13 @@ class DailystormerArticle(Article):
 
     def update(self, body):
         if self.title != "":
+            self.bootstrap()
             self.es.update(index=self.es_index, doc_type=self.document_type, id=self.article_id, body=body)
             self.save_cassandra()
 
     def is_present(self, url):
-        query = "SELECT COUNT(*) FROM {0} WHERE url='{1}'".format(self.document_type, url)
+        self.bootstrap()
+        query = "SELECT COUNT(*) FROM {0} WHERE url='{1}'".format(self.get_table(), url)
         response = self.session.execute(query)
         if response[0].count == 0:
             return False
@@ -451,7 +547,9 @@ class DailystormerArticle(Article):
 
 # This class is used when you want to create a amren object
 class AmrenArticle(Article):
+    __slots__ = ()
     website_url = "https://www.amren.com/"
+    listing_url = "https://www.amren.com/category/news/page/{0}/"
     mapping = {
         "properties": {
             "title": {"type": "text", "fielddata": True},
@@ -481,20 +579,19 @@ class AmrenArticle(Article):
         self.title = ""
         self.links = []
         self.sources = []
-        self.elasticsearch_initialisation()
-        self.cassandra_initialisation(self.strategy, self.replication_factor)
 
-    def elasticsearch_initialisation(self):
-        if not self.es.indices.exists(index=self.es_index):
-            self.es.indices.create(index=self.es_index, body=self.index_settings)
-        self.es.indices.put_mapping(index=self.es_index, doc_type=self.document_type, body=self.mapping)
+    @classmethod
+    def elasticsearch_initialisation(cls):
+        if not cls.es.indices.exists(index=cls.es_index):
+            cls.es.indices.create(index=cls.es_index, body=cls.index_settings)
+        cls.es.indices.put_mapping(index=cls.es_index, doc_type=cls.document_type, body=cls.mapping)
 
-    def cassandra_initialisation(self, strategy, replication_factor):
+    @classmethod
+    def cassandra_initialisation(cls, strategy, replication_factor):
         request = "CREATE KEYSPACE IF NOT EXISTS {0}" \
                   " WITH replication = {{'class': '{1}', 'replication_factor': '{2}' }}"
-        request = request.format(self.cassandra_keyspace, strategy, replication_factor)
-        self.session.execute(request)
-        self.session.set_keyspace(self.cassandra_keyspace)
+        request = request.format(cls.cassandra_keyspace, strategy, replication_factor)
+        cls.session.execute(request)
         table = """CREATE TABLE IF NOT EXISTS
                             {0} (
                                 url text PRIMARY KEY,
@@ -506,8 +603,8 @@ class AmrenArticle(Article):
                                 author_wording text,
                                 links list<text>,
                                 sources list<text>)
-                                WITH comment='Table of {1} article'""".format(self.document_type, self.document_type)
-        self.session.execute(table)
+                                WITH comment='Table of {1} article'""".format(cls.get_table(), cls.document_type)
+        cls.session.execute(table)
 
     @staticmethod
     def get_pure_article(full_article):
@@ -550,6 +647,14 @@ class AmrenArticle(Article):
                     sources.append(source)
         return list(sources)
 
+    @staticmethod
+    def get_listing_links(soup):
+        return [title.a['href'] for title in soup.find_all("h2", {"class": "postTitle"}) if title.a]
+
+    @staticmethod
+    def get_last_listing_page(soup):
+        return int(soup.find("div", {"class": "pagination woo-pagination"}).find_all("a")[-2].text)
+
     @staticmethod
     def get_date(soup):
         tag_date = soup.find("span", {"class": "date"})
@@ -569,13 +674,10 @@ class AmrenArticle(Article):
         return date
 
     @classmethod
-    def from_crawler(cls, url):
+    def from_html(cls, url, html):
         obj = cls()
         obj.url = url
-        opener = urllib.request.build_opener()
-        opener.addheaders = [('User-Agent', 'Mozilla/5.0')]
-        response = opener.open(url)
-        soup = BeautifulSoup(response, 'html.parser')
+        soup = BeautifulSoup(html, 'html.parser')
         obj.date = obj.get_date(soup)
         obj.title = soup.find("h1", {"class": "title"}).text
         profile = soup.find("div", {"class": "profile-image"})
@@ -593,7 +695,7 @@ class AmrenArticle(Article):
 
     @classmethod
     def from_elasticsearch(cls, elasticsearch_article):
-        obj = cls()
+        obj = cls.__new__(cls)
         document = elasticsearch_article['_source']
         obj.url = document['url']
         obj.author = document['author']
@@ -608,7 +710,7 @@ class AmrenArticle(Article):
 
     @classmethod
     def from_cassandra(cls, cassandra_row):
-        obj = cls()
+        obj = cls.__new__(cls)
         obj.url = cassandra_row.url
         obj.author = cassandra_row.author
         obj.article = cassandra_row.article
@@ -631,12 +733,13 @@ class AmrenArticle(Article):
             INSERT INTO {0} (article_id, url, title, author, date,
                         article, author_wording, links, sources)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """.format(self.document_type)
+            """.format(self.get_table())
+        self.bootstrap()
         self.session.execute(insert_query, (self.article_id, self.url, self.title, self.author, self.date, self.article,
                                             self.author_wording, self.links, self.sources))
 
-    def save_elasticsearch(self):
-        body = {
+    def get_elasticsearch_body(self):
+        return {
             'url': self.url,
             'title': self.title,
             'author': self.author,
@@ -646,6 +749,10 @@ class AmrenArticle(Article):
             'links': self.links,
             'sources': self.sources
         }
+
+    def save_elasticsearch(self):
+        body = self.get_elasticsearch_body()
+        self.bootstrap()
         if self.article_id == "":
             response = self.es.index(index=self.es_index, doc_type=self.document_type, body=body)
             self.article_id = response['_id']
@@ -659,11 +766,13 @@ class AmrenArticle(Article):
 
     def update(self, body):
         if self.title != "":
+            self.bootstrap()
             self.es.update(index=self.es_index, doc_type=self.document_type, id=self.article_id, body=body)
             self.save_cassandra()
 
     def is_present(self, url):
-        query = "SELECT COUNT(*) FROM {0} WHERE url='{1}'".format(self.document_type, url)
+        self.bootstrap()
+        query = "SELECT COUNT(*) FROM {0} WHERE url='{1}'".format(self.get_table(), url)
         response = self.session.execute(query)
         if response[0].count == 0:
             return False
@@ -1,26 +1,31 @@
 import urllib.request
 import http.cookiejar
 import random
+import threading
 import time
 from bs4 import BeautifulSoup
 from collections import Counter
 import elasticsearch
-from elasticsearch import Elasticsearch
 import cassandra
-from cassandra.cluster import Cluster
 
+from source.lib.storage_library import LazyClient
+from source.lib.storage_library import get_elasticsearch
+from source.lib.storage_library import get_session
 
-class Author:
 
+class Author:
+    # The fields of the authors are stored in slots, an author is a small record without __dict__
+    __slots__ = ("keyword", "name", "twitter_id", "twitter_username", "url")
     strategy = "SimpleStrategy"
     replication_factor = 2
     cassandra_keyspace = "article"
-    cluster = Cluster(['192.168.2.33'], port=9042)
-    session = cluster.connect()
-    es_host = {"host": "192.168.2.33", "port": 9200}
-    es = Elasticsearch([es_host])
+    session = LazyClient(get_session)
+    es = LazyClient(get_elasticsearch)
     es_index = "author"
     document_type = "author"
+    # If the elasticsearch index and the cassandra table were created by this process (see bootstrap)
+    schema_initialised = False
+    schema_lock = threading.Lock()
     index_settings = {
         "settings": {
             "index": {
@@ -47,17 +52,23 @@ class Author:
         }
     }
 
-    def elasticsearch_initialisation(self):
-        if not self.es.indices.exists(index=self.es_index):
-            self.es.indices.create(index=self.es_index, body=self.index_settings)
-        self.es.indices.put_mapping(index=self.es_index, doc_type=self.document_type, body=self.mapping)
+    @classmethod
+    def elasticsearch_initialisation(cls):
+        if not cls.es.indices.exists(index=cls.es_index):
+            cls.es.indices.create(index=cls.es_index, body=cls.index_settings)
+        cls.es.indices.put_mapping(index=cls.es_index, doc_type=cls.document_type, body=cls.mapping)
+
+    # Return the cassandra table of the authors as "keyspace.table", the shared session is not bound to a keyspace
+    @classmethod
+    def get_table(cls):
+        return "{0}.{1}".format(cls.cassandra_keyspace, cls.document_type)
 
-    def cassandra_initialisation(self, strategy, replication_factor):
+    @classmethod
+    def cassandra_initialisation(cls, strategy, replication_factor):
         request = "CREATE KEYSPACE IF NOT EXISTS {0}" \
                   " WITH replication = {{'class': '{1}', 'replication_factor': '{2}' }}"
-        request = request.format(self.cassandra_keyspace, strategy, replication_factor)
-        self.session.execute(request)
-        self.session.set_keyspace(self.cassandra_keyspace)
+        request = request.format(cls.cassandra_keyspace, strategy, replication_factor)
+        cls.session.execute(request)
         table = """CREATE TABLE IF NOT EXISTS
                             {0} (
                                 url text PRIMARY KEY,
@@ -65,14 +76,27 @@ class Author:
                                 twitter_id text,
                                 twitter_username text,
                                 )
-                                WITH comment='Table of {1}'""".format(self.document_type, self.document_type)
-        self.session.execute(table)
+                                WITH comment='Table of {1}'""".format(cls.get_table(), cls.document_type)
+        cls.session.execute(table)
+
+    # Create the elasticsearch index and the cassandra table once per process, before the first save instead of in
+    # the constructor
+    @classmethod
+    def bootstrap(cls):
+        if cls.schema_initialised:
+            return
+        with cls.schema_lock:
+            if not cls.schema_initialised:
+                cls.elasticsearch_initialisation()
+                cls.cassandra_initialisation(cls.strategy, cls.replication_factor)
+                cls.schema_initialised = True
 
     def save_cassandra(self):
         insert_query = """
             INSERT INTO {0} (url, author, twitter_id, twitter_username)
             VALUES (%s, %s, %s, %s)
-            """.format(self.document_type)
+            """.format(self.get_table())
+        self.bootstrap()
         self.session.execute(insert_query, (self.url, self.name, self.twitter_id, self.twitter_username))
 
     def save_elasticsearch(self):
@@ -82,6 +106,7 @@ class Author:
             'twitter_id': self.twitter_id,
             'twitter_username': self.twitter_username
         }
+        self.bootstrap()
         self.es.index(index=self.es_index, doc_type=self.document_type, body=body)
 
     def save(self):
@@ -169,8 +194,6 @@ class Author:
 
     def __init__(self, keyword):
         self.keyword = keyword
-        self.elasticsearch_initialisation()
-        self.cassandra_initialisation(self.strategy, self.replication_factor)
         self.name = ""
         self.twitter_id = ""
         self.twitter_username = ""
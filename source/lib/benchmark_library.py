@@ -0,0 +1,217 @@
+import abc
+import collections
+import glob
+import json
+import os
+import random
+import tempfile
+import time
+
+import networkx as nx
+from cassandra.query import SimpleStatement
+from elasticsearch import helpers
+
+from source.lib.compact_graph_library import CompactGraph
+
+# Fields of the rows of the article tables (see DailystormerArticle.cassandra_initialisation)
+ArticleRow = collections.namedtuple("ArticleRow", ["url", "article_id", "title", "author", "date", "article",
+                                                   "author_wording", "nb_comment", "links", "sources"])
+
+
+# Return nb_articles synthetic rows of an article table, the texts have the length of a short article
+def generate_article_rows(nb_articles, random_seed=0):
+    random_state = random.Random(random_seed)
+    words = ["word{0}".format(i) for i in range(1000)]
+    rows = []
+    for i in range(nb_articles):
+        links = ["http://site{0}.com/page{1}".format(random_state.randint(0, 100), j)
+                 for j in range(random_state.randint(0, 20))]
+        rows.append(ArticleRow("http://www.example.com/article/{0}".format(i), str(i), "Title {0}".format(i),
+                               "Author {0}".format(i % 50), "2017-01-{0:02d}".format(i % 28 + 1),
+                               " ".join(random_state.choice(words) for _ in range(500)),
+                               " ".join(random_state.choice(words) for _ in range(50)),
+                               random_state.randint(0, 500), links, [link[:link.index("/", 8)] for link in links]))
+    return rows
+
+
+# Return the elasticsearch hit of an article row, as returned by helpers.scan
+def get_hit(row):
+    source = row._asdict()
+    return {"_id": source.pop("article_id"), "_source": source}
+
+
+# Base class of the stores read and written by the benchmark.
+# The subclasses define read (yield the raw records: cassandra rows or elasticsearch hits), hydrate (build an
+# Article from a record) and write (index the bulk actions of articles, return the number of written documents)
+class ArticleStore(abc.ABC):
+    name = None
+    can_write = True
+
+    @abc.abstractmethod
+    def read(self, limit, fetch_size):
+        pass
+
+    @abc.abstractmethod
+    def hydrate(self, record):
+        pass
+
+    @abc.abstractmethod
+    def write(self, actions, chunk_size):
+        pass
+
+    # Remove what was written by write
+    def clean(self):
+        pass
+
+
+# Articles of a cassandra table, the table is only read: the writes are measured on elasticsearch
+class CassandraArticleStore(ArticleStore):
+    name = "cassandra"
+    can_write = False
+
+    def __init__(self, session, article_class):
+        self.session = session
+        self.article_class = article_class
+
+    def read(self, limit, fetch_size):
+        statement = SimpleStatement("SELECT * FROM {0} LIMIT {1}".format(self.article_class.get_table(), limit),
+                                    fetch_size=fetch_size)
+        return iter(self.session.execute(statement))
+
+    def hydrate(self, record):
+        return self.article_class.from_cassandra(record)
+
+    # The table is only read (can_write is False), no document is written
+    def write(self, actions, chunk_size):
+        return 0
+
+
+# Articles of an elasticsearch index, they are written in a copy of the index removed by clean
+class ElasticsearchArticleStore(ArticleStore):
+    name = "elasticsearch"
+
+    def __init__(self, es, article_class):
+        self.es = es
+        self.article_class = article_class
+        self.benchmark_index = "{0}_benchmark".format(article_class.es_index)
+
+    def read(self, limit, fetch_size):
+        documents = helpers.scan(self.es, query={"query": {"match_all": {}}}, index=self.article_class.es_index,
+                                 doc_type=self.article_class.document_type, size=fetch_size, scroll="2m")
+        for number, document in enumerate(documents):
+            if number >= limit:
+                break
+            yield document
+
+    def hydrate(self, record):
+        return self.article_class.from_elasticsearch(record)
+
+    def write(self, actions, chunk_size):
+        benchmark_actions = (dict(action, _index=self.benchmark_index) for action in actions)
+        nb_written, _ = helpers.bulk(self.es, benchmark_actions, chunk_size=chunk_size, raise_on_error=False)
+        return nb_written
+
+    def clean(self):
+        self.es.indices.delete(index=self.benchmark_index, ignore=[404])
+
+
+# Local stand-in of a store keeping the records in memory, it lets the benchmark run without Cassandra and
+# Elasticsearch. The records are read by pages of fetch_size like the drivers do and the written actions are
+# serialized to JSON like the bulk requests of the client.
+class MemoryArticleStore(ArticleStore):
+
+    # Constructor of the class
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The name of the store in the results
+    #          - The records
+    #          - The function building an Article from a record
+    def __init__(self, name, records, hydrate_record):
+        self.name = name
+        self.records = records
+        self.hydrate_record = hydrate_record
+        self.written = []
+
+    def read(self, limit, fetch_size):
+        for start in range(0, min(limit, len(self.records)), fetch_size):
+            for record in self.records[start:min(start + fetch_size, limit)]:
+                yield record
+
+    def hydrate(self, record):
+        return self.hydrate_record(record)
+
+    def write(self, actions, chunk_size):
+        for start in range(0, len(actions), chunk_size):
+            self.written.append("\n".join(json.dumps(action) for action in actions[start:start + chunk_size]))
+        return len(actions)
+
+    def clean(self):
+        self.written = []
+
+
+# Return the result of a timed step: {"count", "seconds", "per_second"}
+def get_throughput(count, seconds):
+    return {"count": count, "seconds": seconds, "per_second": count / max(seconds, 1e-9)}
+
+
+# Return the measures of the reads of a store: for every dataset size and fetch size, the throughput of the raw
+# read and of the hydration of the records into Article objects, and for every dataset size and chunk size the
+# throughput of the bulk writes of the articles
+# Take 4 parameters in input:
+#          - The ArticleStore
+#          - The numbers of articles read
+#          - The numbers of records fetched per page
+#          - The numbers of documents per bulk request
+def benchmark_store(store, dataset_sizes, fetch_sizes, chunk_sizes):
+    reads, writes = [], []
+    for dataset_size in dataset_sizes:
+        articles = []
+        for fetch_size in fetch_sizes:
+            start = time.time()
+            records = list(store.read(dataset_size, fetch_size))
+            read = get_throughput(len(records), time.time() - start)
+            start = time.time()
+            articles = [store.hydrate(record) for record in records]
+            hydration = get_throughput(len(articles), time.time() - start)
+            print("{0}: read {1} records with a fetch size of {2} in {3:.3f}s, hydrated in {4:.3f}s"
+                  .format(store.name, len(records), fetch_size, read["seconds"], hydration["seconds"]))
+            reads.append({"store": store.name, "dataset_size": dataset_size, "fetch_size": fetch_size,
+                          "read": read, "hydration": hydration})
+        if not store.can_write:
+            continue
+        actions = [article.get_bulk_action() for article in articles]
+        for chunk_size in chunk_sizes:
+            start = time.time()
+            nb_written = store.write(actions, chunk_size)
+            write = get_throughput(nb_written, time.time() - start)
+            store.clean()
+            print("{0}: wrote {1} documents by chunks of {2} in {3:.3f}s".format(store.name, nb_written, chunk_size,
+                                                                                write["seconds"]))
+            writes.append({"store": store.name, "dataset_size": dataset_size, "chunk_size": chunk_size,
+                           "write": write})
+    return reads, writes
+
+
+# Return for every sub_graph_* graph of the graph directory the time to build the CompactGraph from its GML export,
+# to save its snapshot and to load the snapshot
+def benchmark_graphs(graph_directory):
+    results = []
+    for gml_path in sorted(glob.glob(os.path.join(graph_directory, "sub_graph_*", "sub_graph_*.gml"))):
+        name = os.path.splitext(os.path.basename(gml_path))[0]
+        start = time.time()
+        compact_graph = CompactGraph.from_networkx(nx.read_gml(gml_path))
+        build_seconds = time.time() - start
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot_path = os.path.join(directory, name + ".npz")
+            start = time.time()
+            compact_graph.save_snapshot(snapshot_path)
+            save_seconds = time.time() - start
+            start = time.time()
+            CompactGraph.load_snapshot(snapshot_path)
+            load_seconds = time.time() - start
+        print("{0}: built in {1:.3f}s, snapshot saved in {2:.3f}s and loaded in {3:.3f}s"
+              .format(name, build_seconds, save_seconds, load_seconds))
+        results.append({"graph": name, "nodes": compact_graph.number_of_nodes,
+                        "edges": compact_graph.number_of_edges, "build_seconds": build_seconds,
+                        "snapshot_save_seconds": save_seconds, "snapshot_load_seconds": load_seconds})
+    return results
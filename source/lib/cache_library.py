@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+
+
+# This class stores the results of the expensive computations made on a graph (centralities, ...).
+# A result is stored under a key made of the content hash of the graph and of the parameters of the
+# computation, so a result computed on another version of the graph is never reused.
+# The results of a graph version are grouped in a sub directory named by its hash. When a maximum size is given,
+# the least recently used results are removed once the cache is bigger (the modification time of a result is
+# updated every time it is read and used as its last use).
+class ResultCache:
+
+    # Constructor of the class
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The directory where the results are pickled
+    #          - The maximum size of the cache in bytes (None for no limit)
+    def __init__(self, directory, max_size=None):
+        self.directory = directory
+        self.max_size = max_size
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    # Return the path of the entry (file or directory) storing a result
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The name of the computation (ex: "betweenness_centrality")
+    #          - The content hash of the graph
+    #          - A dictionary of the parameters of the computation
+    #          - The extension of the entry ("" for a directory)
+    def get_path(self, name, graph_hash, parameters, extension=".p"):
+        parameters_hash = hashlib.sha1(json.dumps(parameters, sort_keys=True).encode("utf-8")).hexdigest()
+        graph_directory = os.path.join(self.directory, graph_hash[:16])
+        if not os.path.exists(graph_directory):
+            os.makedirs(graph_directory)
+        return os.path.join(graph_directory, "{0}_{1}{2}".format(name, parameters_hash[:16], extension))
+
+    # Return the path of the directory storing a result made of several files, or None if it was never computed
+    def load_directory(self, name, graph_hash, parameters):
+        directory = self.get_path(name, graph_hash, parameters, extension="")
+        if not os.path.isdir(directory):
+            return None
+        print("Load {0} from directory: {1}".format(name, directory))
+        os.utime(directory, None)
+        return directory
+
+    # Store a result made of several files: write_files(directory) writes them in a temporary directory that
+    # replaces the entry once complete
+    # Return the path of the directory
+    def save_directory(self, name, graph_hash, parameters, write_files):
+        directory = self.get_path(name, graph_hash, parameters, extension="")
+        temporary_directory = directory + ".tmp"
+        for path in (temporary_directory, directory):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+        os.makedirs(temporary_directory)
+        write_files(temporary_directory)
+        os.rename(temporary_directory, directory)
+        self.evict(keep=directory)
+        return directory
+
+    # Return the path of a result stored in its own file format, or None if it was never computed
+    def load_file(self, name, graph_hash, parameters, extension):
+        file_path = self.get_path(name, graph_hash, parameters, extension=extension)
+        if not os.path.exists(file_path):
+            return None
+        print("Load {0} from file: {1}".format(name, file_path))
+        os.utime(file_path, None)
+        return file_path
+
+    # Store a result in its own file format: write_file(file) writes it in a temporary file that replaces the entry
+    # once complete
+    # Return the path of the file
+    def save_file(self, name, graph_hash, parameters, extension, write_file):
+        file_path = self.get_path(name, graph_hash, parameters, extension=extension)
+        with open(file_path + ".tmp", "wb") as result_file:
+            write_file(result_file)
+        os.replace(file_path + ".tmp", file_path)
+        self.evict(keep=file_path)
+        return file_path
+
+    # Return the stored result or None if it was never computed
+    def load(self, name, graph_hash, parameters):
+        file_path = self.get_path(name, graph_hash, parameters)
+        if not os.path.exists(file_path):
+            return None
+        print("Load {0} from file: {1}".format(name, file_path))
+        os.utime(file_path, None)
+        with open(file_path, "rb") as result_file:
+            return pickle.load(result_file)
+
+    def save(self, name, graph_hash, parameters, result):
+        file_path = self.get_path(name, graph_hash, parameters)
+        with open(file_path + ".tmp", "wb") as result_file:
+            pickle.dump(result, result_file)
+        os.replace(file_path + ".tmp", file_path)
+        self.evict(keep=file_path)
+
+    # Return the cached result or compute it with the given function and store it
+    def get_or_compute(self, name, graph_hash, parameters, compute):
+        result = self.load(name, graph_hash, parameters)
+        if result is None:
+            print("No {0} found in the cache, computing it".format(name))
+            result = compute()
+            self.save(name, graph_hash, parameters, result)
+        return result
+
+    # Return the list of (last use, size, path) of the entries of the cache
+    def get_entries(self):
+        entries = []
+        for graph_directory in os.listdir(self.directory):
+            graph_directory = os.path.join(self.directory, graph_directory)
+            if not os.path.isdir(graph_directory):
+                continue
+            for entry in os.listdir(graph_directory):
+                path = os.path.join(graph_directory, entry)
+                if entry.endswith(".tmp"):
+                    continue
+                if os.path.isdir(path):
+                    size = sum(os.path.getsize(os.path.join(root, file_name))
+                               for root, _, file_names in os.walk(path) for file_name in file_names)
+                else:
+                    size = os.path.getsize(path)
+                entries.append((os.path.getmtime(path), size, path))
+        return entries
+
+    # Remove the least recently used entries until the cache is below its maximum size, the entry just written is
+    # kept even if it is bigger than the maximum size
+    # Return the number of removed entries
+    def evict(self, keep=None):
+        if self.max_size is None:
+            return 0
+        entries = sorted(self.get_entries())
+        total_size = sum(size for _, size, _ in entries)
+        nb_removed = 0
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            print("Remove the least recently used result: {0}".format(path))
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            total_size -= size
+            nb_removed += 1
+            graph_directory = os.path.dirname(path)
+            if not os.listdir(graph_directory):
+                os.rmdir(graph_directory)
+        return nb_removed
@@ -0,0 +1,176 @@
+import os.path
+import numpy
+from scipy import sparse
+
+# Version of the layout of the index files, an index written with a newer version can not be read
+CASCADE_INDEX_VERSION = 1
+
+
+# This class stores the retweet cascades of the tweets written by the nodes of a graph.
+# A cascade is the list of the retweets of an original tweet ordered by time, a retweet is only kept if the
+# retweeter follows the author or an earlier retweeter in the graph, this followed account is its parent.
+# The cascades are stored in columnar arrays (like a CSR matrix): the retweets of the cascade i are the
+# positions indptr[i]:indptr[i + 1] of the retweet arrays.
+class CascadeIndex:
+
+    # Constructor of the class
+    # Take 9 parameters in input:
+    #          - The class
+    #          - The CompactGraph
+    #          - The sorted ids of the original tweets
+    #          - The ids of the authors of the original tweets
+    #          - The times of the original tweets (milliseconds)
+    #          - The index of the first retweet of every cascade (one more value than the tweets)
+    #          - The ids of the retweeters
+    #          - The times of the retweets (milliseconds)
+    #          - The ids of the parents of the retweets
+    def __init__(self, compact_graph, tweet_ids, author_ids, tweet_times, indptr, retweeter_ids, retweet_times,
+                 parent_ids):
+        self.compact_graph = compact_graph
+        self.tweet_ids = tweet_ids
+        self.author_ids = author_ids
+        self.tweet_times = tweet_times
+        self.indptr = indptr
+        self.retweeter_ids = retweeter_ids
+        self.retweet_times = retweet_times
+        self.parent_ids = parent_ids
+
+    @property
+    def number_of_cascades(self):
+        return len(self.tweet_ids)
+
+    # Build the index from retweets given as (retweeter id, time of the retweet, original tweet id,
+    # original author id, time of the original tweet), like the ones of TweetQuery.iter_retweets
+    # The retweets are filtered by batches of batch_size while they are read, so only the retweets between two nodes
+    # of the graph are kept in memory
+    @classmethod
+    def build(cls, compact_graph, retweets, batch_size=100000):
+        batches, batch = [], []
+        for retweet in retweets:
+            batch.append(retweet)
+            if len(batch) == batch_size:
+                batches.append(get_retweets_in(compact_graph, batch))
+                batch = []
+        batches.append(get_retweets_in(compact_graph, batch))
+        retweeters, retweet_times, tweet_ids, authors, tweet_times = numpy.concatenate(batches).T
+        retweeter_indexes = compact_graph.find(retweeters)[0]
+        author_indexes = compact_graph.find(authors)[0]
+        order = numpy.lexsort((retweet_times, tweet_ids))
+        cascade_starts = numpy.flatnonzero(numpy.r_[True, numpy.diff(tweet_ids[order]) != 0])[:len(order)]
+        cascade_ends = numpy.append(cascade_starts[1:], len(order))
+        out_indptr, out_indices = compact_graph.out_indptr, compact_graph.out_indices
+
+        kept_tweets, kept_retweets, parents, indptr = [], [], [], [0]
+        for start, end in zip(cascade_starts.tolist(), cascade_ends.tolist()):
+            author = int(author_indexes[order[start]])
+            participants = [author]
+            participant_set = {author}
+            for position in order[start:end].tolist():
+                retweeter = int(retweeter_indexes[position])
+                if retweeter in participant_set:
+                    continue
+                friends = set(out_indices[out_indptr[retweeter]:out_indptr[retweeter + 1]].tolist())
+                # The retweet comes from the last participant followed by the retweeter
+                parent = next((participant for participant in reversed(participants) if participant in friends),
+                              None)
+                if parent is not None:
+                    participants.append(retweeter)
+                    participant_set.add(retweeter)
+                    kept_retweets.append(position)
+                    parents.append(parent)
+            if len(participants) > 1:
+                kept_tweets.append(order[start])
+                indptr.append(len(kept_retweets))
+        node_ids = compact_graph.node_ids
+        kept_tweets = numpy.array(kept_tweets, dtype=numpy.int64)
+        kept_retweets = numpy.array(kept_retweets, dtype=numpy.int64)
+        return cls(compact_graph, tweet_ids[kept_tweets], node_ids[author_indexes[kept_tweets]],
+                   tweet_times[kept_tweets], numpy.array(indptr, dtype=numpy.int64), retweeters[kept_retweets],
+                   retweet_times[kept_retweets], node_ids[numpy.array(parents, dtype=numpy.int64)])
+
+    def save(self, path):
+        numpy.savez(path, version=CASCADE_INDEX_VERSION, graph_hash=self.compact_graph.content_hash(),
+                    tweet_ids=self.tweet_ids, author_ids=self.author_ids, tweet_times=self.tweet_times,
+                    indptr=self.indptr, retweeter_ids=self.retweeter_ids, retweet_times=self.retweet_times,
+                    parent_ids=self.parent_ids)
+
+    # Return the index stored in the file, or None if it does not exist or was built on another version of the graph
+    @classmethod
+    def load(cls, path, compact_graph):
+        if not os.path.exists(path):
+            return None
+        with numpy.load(path) as arrays:
+            if int(arrays["version"]) > CASCADE_INDEX_VERSION:
+                raise ValueError("The cascade index {0} has an unknown version".format(path))
+            if str(arrays["graph_hash"]) != compact_graph.content_hash():
+                return None
+            return cls(compact_graph, arrays["tweet_ids"], arrays["author_ids"], arrays["tweet_times"],
+                       arrays["indptr"], arrays["retweeter_ids"], arrays["retweet_times"], arrays["parent_ids"])
+
+    def get_cascade_number(self, tweet_id):
+        cascade_number = numpy.searchsorted(self.tweet_ids, tweet_id)
+        if cascade_number == len(self.tweet_ids) or self.tweet_ids[cascade_number] != tweet_id:
+            raise KeyError("No cascade for the tweet {0}".format(tweet_id))
+        return cascade_number
+
+    # Return the list of the (retweeter, time of the retweet) of a tweet ordered by time
+    def get_cascade(self, tweet_id):
+        cascade_number = self.get_cascade_number(tweet_id)
+        retweets = slice(self.indptr[cascade_number], self.indptr[cascade_number + 1])
+        return list(zip(self.retweeter_ids[retweets].tolist(), self.retweet_times[retweets].tolist()))
+
+    # Return the list of the (parent, retweeter, time of the retweet) of a tweet ordered by time
+    def get_cascade_edges(self, tweet_id):
+        cascade_number = self.get_cascade_number(tweet_id)
+        retweets = slice(self.indptr[cascade_number], self.indptr[cascade_number + 1])
+        return list(zip(self.parent_ids[retweets].tolist(), self.retweeter_ids[retweets].tolist(),
+                        self.retweet_times[retweets].tolist()))
+
+    # Return the sparse matrix (cascades x nodes) of the retweeters, and the one of the participants (authors included)
+    def get_participation_matrices(self):
+        nb_nodes = self.compact_graph.number_of_nodes
+        shape = (self.number_of_cascades, nb_nodes)
+        cascade_numbers = numpy.repeat(numpy.arange(self.number_of_cascades), numpy.diff(self.indptr))
+        retweeters = sparse.csr_matrix((numpy.ones(len(cascade_numbers)),
+                                        (cascade_numbers, self.compact_graph.index_of(self.retweeter_ids))),
+                                       shape=shape)
+        authors = sparse.csr_matrix((numpy.ones(self.number_of_cascades),
+                                     (numpy.arange(self.number_of_cascades),
+                                      self.compact_graph.index_of(self.author_ids))), shape=shape)
+        return retweeters, retweeters + authors
+
+    # Return the sparse boolean matrix (cascades x nodes) of the nodes following at least one participant
+    # of the cascade (the authors of the cascades are not exposed to their own tweets)
+    def get_exposure_matrix(self):
+        retweeters, participants = self.get_participation_matrices()
+        sources, targets = self.compact_graph.edges()
+        nb_nodes = self.compact_graph.number_of_nodes
+        follows = sparse.csr_matrix((numpy.ones(len(sources)), (sources, targets)), shape=(nb_nodes, nb_nodes))
+        exposures = (participants.dot(follows.T) > 0).astype(numpy.float64)
+        exposures = exposures - exposures.multiply(participants - retweeters)
+        exposures.eliminate_zeros()
+        return exposures
+
+    # Return the number of cascades every node was exposed to and the number of these cascades it retweeted
+    # (arrays aligned with the node_ids of the CompactGraph)
+    def get_exposure_counts(self):
+        retweeters, _ = self.get_participation_matrices()
+        exposures = self.get_exposure_matrix()
+        nb_exposures = numpy.asarray(exposures.sum(axis=0)).ravel().astype(numpy.int64)
+        nb_adoptions = numpy.asarray(exposures.multiply(retweeters > 0).sum(axis=0)).ravel().astype(numpy.int64)
+        return nb_exposures, nb_adoptions
+
+    # Return the dictionary {node exposed to at least one cascade: 1 if it retweeted one of them else 0}
+    def get_diffusion_labels(self):
+        nb_exposures, nb_adoptions = self.get_exposure_counts()
+        exposed = nb_exposures > 0
+        labels = (nb_adoptions[exposed] > 0).astype(int)
+        return dict(zip(self.compact_graph.node_ids[exposed].tolist(), labels.tolist()))
+
+
+# Return the (nb_retweets x 5) array of the retweets between two different nodes of the graph
+def get_retweets_in(compact_graph, retweets):
+    retweets = numpy.array(retweets, dtype=numpy.int64).reshape((-1, 5))
+    retweeter_indexes, retweeter_found = compact_graph.find(retweets[:, 0])
+    author_indexes, author_found = compact_graph.find(retweets[:, 3])
+    return retweets[retweeter_found & author_found & (retweeter_indexes != author_indexes)]
@@ -0,0 +1,269 @@
+import math
+import multiprocessing
+import numpy
+from scipy import sparse
+
+# Adjacency matrices of the graph in the worker processes, set once by init_worker
+WORKER_GRAPH = {}
+# Number of nodes per process when the number of processes is chosen automatically: below it the start of the
+# processes and the copy of the graph cost more than the computation (a graph of 1000 nodes takes about 0.3s)
+MIN_NODES_PER_PROCESS = 1000
+
+
+# Build the (A, A transposed) sparse matrices of a CompactGraph, A[v, w] = 1 if v follows w
+def get_adjacency_matrices(out_indptr, out_indices, nb_nodes):
+    adjacency = sparse.csr_matrix((numpy.ones(len(out_indices)), out_indices, out_indptr),
+                                  shape=(nb_nodes, nb_nodes))
+    return adjacency, adjacency.transpose().tocsr()
+
+
+def init_worker(out_indptr, out_indices, nb_nodes):
+    WORKER_GRAPH["matrices"] = get_adjacency_matrices(out_indptr, out_indices, nb_nodes)
+
+
+# Run the Brandes accumulation for a batch of sources at the same time.
+# The BFS of every source is a column of the (nb_nodes x nb_sources) matrices, one level of all the BFS is one
+# sparse matrix product, so the loops are done by scipy instead of python.
+# Return the (nb_nodes x nb_sources) matrices of the dependencies and of the depths in the BFS (-1 if not reached)
+def get_dependencies(sources, matrices=None):
+    adjacency, adjacency_transposed = matrices or WORKER_GRAPH["matrices"]
+    nb_nodes, nb_sources = adjacency.shape[0], len(sources)
+    columns = numpy.arange(nb_sources)
+    sigma = numpy.zeros((nb_nodes, nb_sources))
+    depth = numpy.full((nb_nodes, nb_sources), -1, dtype=numpy.int32)
+    sigma[sources, columns] = 1
+    depth[sources, columns] = 0
+    frontier = sigma.copy()
+    level = 0
+    while frontier.any():
+        level += 1
+        frontier = adjacency_transposed.dot(frontier)
+        discovered = (frontier > 0) & (depth < 0)
+        frontier[~discovered] = 0
+        depth[discovered] = level
+        sigma += frontier
+    dependencies = numpy.zeros((nb_nodes, nb_sources))
+    for level in range(level - 1, 0, -1):
+        at_level = depth == level
+        coefficients = numpy.zeros((nb_nodes, nb_sources))
+        coefficients[at_level] = (1 + dependencies[at_level]) / sigma[at_level]
+        contributions = adjacency.dot(coefficients)
+        at_previous_level = depth == level - 1
+        dependencies[at_previous_level] += sigma[at_previous_level] * contributions[at_previous_level]
+    dependencies[sources, columns] = 0
+    return dependencies, depth
+
+
+# Return the sum and the sum of the squares of the dependencies of every node over the sources
+def accumulate_dependencies(sources, matrices=None):
+    dependencies, _ = get_dependencies(sources, matrices)
+    return dependencies.sum(axis=1), (dependencies ** 2).sum(axis=1)
+
+
+# This class computes the betweenness centrality of a CompactGraph.
+# The sources of the Brandes algorithm are split in batches processed by a pool of processes and the partial
+# sums are merged. It gives the same values as networkx.betweenness_centrality (directed, without endpoints).
+class BetweennessCentrality:
+
+    # Constructor of the class
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The CompactGraph
+    #          - The number of processes (None for one process per MIN_NODES_PER_PROCESS nodes up to the number
+    #            of CPU, 1 to stay in the current process)
+    #          - The number of sources processed together by a worker
+    #          - The seed of the sampling of the sources
+    def __init__(self, compact_graph, nb_processes=None, batch_size=64, random_seed=0):
+        self.compact_graph = compact_graph
+        self.nb_nodes = compact_graph.number_of_nodes
+        if nb_processes is None:
+            nb_processes = min(multiprocessing.cpu_count(), max(self.nb_nodes // MIN_NODES_PER_PROCESS, 1))
+        self.nb_processes = nb_processes
+        self.batch_size = batch_size
+        self.random_state = numpy.random.RandomState(random_seed)
+        self.pool = None
+
+    def __enter__(self):
+        if self.nb_processes > 1:
+            self.pool = multiprocessing.Pool(
+                self.nb_processes, initializer=init_worker,
+                initargs=(self.compact_graph.out_indptr, self.compact_graph.out_indices, self.nb_nodes))
+        else:
+            self.matrices = get_adjacency_matrices(self.compact_graph.out_indptr, self.compact_graph.out_indices,
+                                                   self.nb_nodes)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    # Return the sum and the sum of the squares of the dependencies for the given sources
+    def accumulate(self, sources):
+        batches = [sources[i:i + self.batch_size] for i in range(0, len(sources), self.batch_size)]
+        if self.pool is not None:
+            partial_results = self.pool.map(accumulate_dependencies, batches)
+        else:
+            partial_results = [accumulate_dependencies(batch, self.matrices) for batch in batches]
+        total, total_squares = numpy.zeros(self.nb_nodes), numpy.zeros(self.nb_nodes)
+        for partial_total, partial_squares in partial_results:
+            total += partial_total
+            total_squares += partial_squares
+        return total, total_squares
+
+    # Return the factor applied to a sum of dependencies over nb_sources sources (same rescaling as networkx)
+    def get_scale(self, nb_sources, normalized):
+        scale = 1.0
+        if normalized and self.nb_nodes > 2:
+            scale = 1.0 / ((self.nb_nodes - 1) * (self.nb_nodes - 2))
+        return scale * self.nb_nodes / nb_sources
+
+    # Return the dictionary {twitter id: betweenness}
+    def to_dictionary(self, values):
+        return dict(zip(self.compact_graph.node_ids.tolist(), values.tolist()))
+
+    # Compute the betweenness with k sampled sources (all the nodes if k is None)
+    def compute(self, k=None, normalized=True):
+        if k is None or k >= self.nb_nodes:
+            sources = numpy.arange(self.nb_nodes)
+        else:
+            sources = self.random_state.choice(self.nb_nodes, k, replace=False)
+        if len(sources) == 0:
+            return {}
+        total, _ = self.accumulate(sources)
+        return self.to_dictionary(total * self.get_scale(len(sources), normalized))
+
+    # Approximate the betweenness by sampling sources until all the normalized values are known within
+    # +/- epsilon with a probability of 1 - delta.
+    # The dependency of a node on a source divided by (n - 2) is in [0, 1], so after every round the
+    # empirical Bernstein bound (with a union bound over the nodes) gives the error of the estimation.
+    # The sampling stops at the latest when the Hoeffding bound guarantees epsilon.
+    # Return the dictionary of the betweenness and the error bound reached
+    def approximate(self, epsilon=0.01, delta=0.1, normalized=True):
+        nb_nodes = self.nb_nodes
+        if nb_nodes <= 2:
+            return self.compute(normalized=normalized), 0.0
+        # Half of delta is given to the Hoeffding bound, the other half is shared by the checks of every round
+        hoeffding_term = math.log(4.0 * nb_nodes / delta)
+        max_samples = min(nb_nodes, int(math.ceil(hoeffding_term / (2 * epsilon ** 2))))
+        round_size = self.batch_size * self.nb_processes
+        nb_rounds = int(math.ceil(float(max_samples) / round_size))
+        log_term = math.log(4.0 * nb_nodes * nb_rounds / delta)
+        order = self.random_state.permutation(nb_nodes)
+        total, total_squares = numpy.zeros(nb_nodes), numpy.zeros(nb_nodes)
+        nb_samples, error_bound = 0, float("inf")
+        while nb_samples < max_samples and error_bound > epsilon:
+            sources = order[nb_samples:min(nb_samples + round_size, max_samples)]
+            partial_total, partial_squares = self.accumulate(sources)
+            total += partial_total / (nb_nodes - 2)
+            total_squares += partial_squares / (nb_nodes - 2) ** 2
+            nb_samples += len(sources)
+            if nb_samples > 1:
+                mean = total / nb_samples
+                variance = numpy.maximum(total_squares / nb_samples - mean ** 2, 0) * nb_samples / (nb_samples - 1)
+                error_bound = (math.sqrt(2 * variance.max() * log_term / nb_samples) +
+                               7 * log_term / (3 * (nb_samples - 1)))
+            print("Betweenness approximation: {0} sources, error bound {1}".format(nb_samples, error_bound))
+        if nb_samples == nb_nodes:
+            error_bound = 0.0
+        else:
+            error_bound = min(error_bound, math.sqrt(hoeffding_term / (2 * nb_samples)))
+        error_bound *= nb_nodes / (nb_nodes - 1.0)
+        scale = nb_nodes / (nb_nodes - 1.0)
+        if not normalized:
+            scale *= (nb_nodes - 1) * (nb_nodes - 2)
+            error_bound *= (nb_nodes - 1) * (nb_nodes - 2)
+        return self.to_dictionary(total / nb_samples * scale), error_bound
+
+
+# Return the PageRank of every node of a CompactGraph (same definition as networkx.pagerank: the teleportation and
+# the redistribution of the dangling nodes are uniform), computed with sparse power iterations
+def pagerank(compact_graph, damping=0.85, tolerance=1e-10, max_iterations=1000):
+    nb_nodes = compact_graph.number_of_nodes
+    if nb_nodes == 0:
+        return numpy.zeros(0)
+    adjacency, _ = get_adjacency_matrices(compact_graph.out_indptr, compact_graph.out_indices, nb_nodes)
+    out_degree = compact_graph.out_degree()
+    dangling = out_degree == 0
+    inverse_degree = numpy.where(dangling, 0.0, 1.0 / numpy.maximum(out_degree, 1))
+    transition = adjacency.transpose().tocsr()
+    ranks = numpy.full(nb_nodes, 1.0 / nb_nodes)
+    for _ in range(max_iterations):
+        previous = ranks
+        ranks = damping * (transition.dot(previous * inverse_degree) + previous[dangling].sum() / nb_nodes) + \
+            (1 - damping) / nb_nodes
+        if numpy.abs(ranks - previous).sum() < nb_nodes * tolerance:
+            break
+    return ranks
+
+
+# Return the (hubs, authorities) scores of every node of a CompactGraph, both normalized to sum to 1
+# A good hub follows good authorities and a good authority is followed by good hubs
+def hits(compact_graph, tolerance=1e-10, max_iterations=1000):
+    nb_nodes = compact_graph.number_of_nodes
+    if nb_nodes == 0:
+        return numpy.zeros(0), numpy.zeros(0)
+    adjacency, adjacency_transposed = get_adjacency_matrices(compact_graph.out_indptr, compact_graph.out_indices,
+                                                             nb_nodes)
+    hubs = numpy.full(nb_nodes, 1.0 / nb_nodes)
+    for _ in range(max_iterations):
+        previous = hubs
+        authorities = adjacency_transposed.dot(previous)
+        hubs = adjacency.dot(authorities)
+        hubs /= max(hubs.sum(), 1e-300)
+        if numpy.abs(hubs - previous).sum() < nb_nodes * tolerance:
+            break
+    authorities = adjacency_transposed.dot(hubs)
+    return hubs, authorities / max(authorities.sum(), 1e-300)
+
+
+# Return the eigenvector centrality of every node of a CompactGraph (same definition as
+# networkx.eigenvector_centrality: the centrality of a node comes from its followers, euclidean norm of 1)
+def eigenvector_centrality(compact_graph, tolerance=1e-6, max_iterations=1000):
+    nb_nodes = compact_graph.number_of_nodes
+    if nb_nodes == 0:
+        return numpy.zeros(0)
+    _, adjacency_transposed = get_adjacency_matrices(compact_graph.out_indptr, compact_graph.out_indices, nb_nodes)
+    centrality = numpy.full(nb_nodes, 1.0 / nb_nodes)
+    for _ in range(max_iterations):
+        previous = centrality
+        # The iteration of (A^T + I) converges even on bipartite parts of the graph
+        centrality = previous + adjacency_transposed.dot(previous)
+        centrality /= max(numpy.linalg.norm(centrality), 1e-300)
+        if numpy.abs(centrality - previous).sum() < nb_nodes * tolerance:
+            break
+    return centrality
+
+
+# Return the core number of every node of a CompactGraph for the "in" (followers), "out" (friends) or "total"
+# degree. All the nodes whose degree is at most k are removed together, then the degrees of their neighbours are
+# decreased with one bincount, until no node is left.
+def core_number(compact_graph, direction="total"):
+    nb_nodes = compact_graph.number_of_nodes
+    sources, targets = compact_graph.edges()
+    if direction == "in":
+        degree, removed_edges = compact_graph.in_degree().copy(), [(sources, targets)]
+    elif direction == "out":
+        degree, removed_edges = compact_graph.out_degree().copy(), [(targets, sources)]
+    elif direction == "total":
+        degree = compact_graph.in_degree() + compact_graph.out_degree()
+        removed_edges = [(sources, targets), (targets, sources)]
+    else:
+        raise ValueError("Unknown direction: {0}".format(direction))
+    cores = numpy.zeros(nb_nodes, dtype=numpy.int64)
+    remaining = numpy.ones(nb_nodes, dtype=bool)
+    # The degree of a node only counts the edges coming from a removed node to it, so an edge is used once
+    edge_alive = [numpy.ones(len(sources), dtype=bool) for _ in removed_edges]
+    k = 0
+    while remaining.any():
+        peeled = remaining & (degree <= k)
+        if not peeled.any():
+            k = degree[remaining].min()
+            continue
+        cores[peeled] = k
+        remaining &= ~peeled
+        for (removed, neighbours), alive in zip(removed_edges, edge_alive):
+            used = alive & peeled[removed]
+            alive &= ~used
+            degree -= numpy.bincount(neighbours[used], minlength=nb_nodes)
+    return cores
@@ -0,0 +1,178 @@
+import numpy
+from scipy import sparse
+
+
+# Return the symmetric sparse matrix W = A + A^T of a CompactGraph (2 for the users following each other)
+def get_undirected_adjacency(compact_graph):
+    nb_nodes = compact_graph.number_of_nodes
+    adjacency = sparse.csr_matrix((numpy.ones(compact_graph.number_of_edges), compact_graph.out_indices,
+                                   compact_graph.out_indptr), shape=(nb_nodes, nb_nodes))
+    return (adjacency + adjacency.transpose()).tocsr()
+
+
+# Return the labels renumbered from 0 to the number of distinct labels - 1
+def renumber(labels):
+    return numpy.unique(labels, return_inverse=True)[1].astype(numpy.int64)
+
+
+# Return the (node, community, weight) arrays of the weights between every node and the communities of its
+# neighbours, the self loops are not counted
+def get_community_weights(weights, communities):
+    coordinates = weights.tocoo()
+    not_loop = coordinates.row != coordinates.col
+    nb_communities = max(communities.max() + 1, 1) if len(communities) else 1
+    keys = coordinates.row[not_loop].astype(numpy.int64) * nb_communities + communities[coordinates.col[not_loop]]
+    unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+    return unique_keys // nb_communities, unique_keys % nb_communities, numpy.bincount(
+        inverse, weights=coordinates.data[not_loop])
+
+
+# Return for every node the community with the highest score among its candidates (or -1 without candidate)
+def get_best_candidates(nb_nodes, nodes, candidates, scores):
+    best = numpy.full(nb_nodes, -1, dtype=numpy.int64)
+    best_scores = numpy.full(nb_nodes, -numpy.inf)
+    order = numpy.lexsort((-scores, nodes))
+    first = numpy.r_[True, numpy.diff(nodes[order]) != 0][:len(order)]
+    best[nodes[order][first]] = candidates[order][first]
+    best_scores[nodes[order][first]] = scores[order][first]
+    return best, best_scores
+
+
+# Return the modularity of a partition of the symmetric weight matrix
+def modularity(weights, communities, resolution=1.0):
+    total_weight = weights.sum()
+    if total_weight == 0:
+        return 0.0
+    degrees = numpy.asarray(weights.sum(axis=1)).ravel()
+    coordinates = weights.tocoo()
+    same = communities[coordinates.row] == communities[coordinates.col]
+    community_degrees = numpy.bincount(communities, weights=degrees)
+    return (coordinates.data[same].sum() - resolution * (community_degrees ** 2).sum() / total_weight) / total_weight
+
+
+# Return the community of every node found by label propagation: every node takes the label carried by the largest
+# weight of its neighbours. At every iteration a random half of the nodes is updated (all the chosen nodes at the
+# same time), which avoids the oscillations of a fully synchronous update, and the ties are broken at random.
+def label_propagation(compact_graph, max_iterations=100, random_seed=0):
+    random_state = numpy.random.RandomState(random_seed)
+    weights = get_undirected_adjacency(compact_graph)
+    nb_nodes = compact_graph.number_of_nodes
+    labels = numpy.arange(nb_nodes, dtype=numpy.int64)
+    for _ in range(max_iterations):
+        nodes, candidates, candidate_weights = get_community_weights(weights, labels)
+        best, _ = get_best_candidates(nb_nodes, nodes, candidates,
+                                      candidate_weights + random_state.random_sample(len(nodes)) * 1e-6)
+        best_weights, current_weights = numpy.zeros(nb_nodes), numpy.zeros(nb_nodes)
+        numpy.maximum.at(best_weights, nodes, candidate_weights)
+        current = candidates == labels[nodes]
+        current_weights[nodes[current]] = candidate_weights[current]
+        # A node keeps its label when it is already one of the most frequent labels around it
+        improving = (best >= 0) & (current_weights < best_weights)
+        if not improving.any():
+            break
+        changing = improving & (random_state.random_sample(nb_nodes) < 0.5)
+        labels[changing] = best[changing]
+    return renumber(labels)
+
+
+# Move the nodes of a weighted graph between communities while the modularity increases.
+# The gain of moving every node to the community of each of its neighbours is computed at once, a random part of
+# the nodes having a positive gain is moved, and the moves are cancelled if they decreased the modularity
+# (simultaneous moves can conflict), in which case less nodes are moved at the next sweep.
+# The nodes start in their own community, or in the given communities.
+# Return the communities of the nodes
+def move_nodes(weights, resolution, random_state, communities=None, max_sweeps=100, tolerance=1e-7):
+    nb_nodes = weights.shape[0]
+    if communities is None:
+        communities = numpy.arange(nb_nodes, dtype=numpy.int64)
+    else:
+        communities = renumber(communities)
+    degrees = numpy.asarray(weights.sum(axis=1)).ravel()
+    total_weight = degrees.sum()
+    if total_weight == 0:
+        return communities
+    current_modularity = modularity(weights, communities, resolution)
+    move_probability = 0.5
+    for _ in range(max_sweeps):
+        community_degrees = numpy.bincount(communities, weights=degrees, minlength=nb_nodes)
+        nodes, candidates, candidate_weights = get_community_weights(weights, communities)
+        own = candidates == communities[nodes]
+        own_weights = numpy.zeros(nb_nodes)
+        own_weights[nodes[own]] = candidate_weights[own]
+        nodes, candidates, candidate_weights = nodes[~own], candidates[~own], candidate_weights[~own]
+        # Gain of leaving the own community D for the community C: k_i,C - k_i,D - r * k_i * (S_C - S_D + k_i) / 2m
+        gains = candidate_weights - own_weights[nodes] - resolution * degrees[nodes] * (
+            community_degrees[candidates] - community_degrees[communities[nodes]] + degrees[nodes]) / total_weight
+        best, best_gains = get_best_candidates(nb_nodes, nodes, candidates, gains)
+        improving = best_gains > tolerance
+        if not improving.any():
+            break
+        moving = improving & (random_state.random_sample(nb_nodes) < move_probability)
+        previous_communities = communities.copy()
+        communities[moving] = best[moving]
+        new_modularity = modularity(weights, communities, resolution)
+        if new_modularity < current_modularity:
+            communities = previous_communities
+            move_probability /= 2
+            if move_probability < 1e-3:
+                break
+        else:
+            current_modularity = new_modularity
+    return renumber(communities)
+
+
+# Return the communities of the nodes after one pass of levels: the nodes are moved between communities starting
+# from the given ones (see move_nodes), then every community becomes a node of an aggregated graph (S^T W S) and the
+# moves start again on it, until the aggregation does not merge any community.
+def run_levels(weights, communities, resolution, random_state, max_levels):
+    level_communities = move_nodes(weights, resolution, random_state, communities)
+    communities = numpy.arange(weights.shape[0], dtype=numpy.int64)
+    for _ in range(max_levels):
+        nb_communities = level_communities.max() + 1 if len(level_communities) else 0
+        if nb_communities == weights.shape[0]:
+            break
+        communities = level_communities[communities]
+        membership = sparse.csr_matrix((numpy.ones(len(level_communities)),
+                                        (numpy.arange(len(level_communities)), level_communities)),
+                                       shape=(len(level_communities), nb_communities))
+        weights = membership.transpose().dot(weights).dot(membership).tocsr()
+        level_communities = move_nodes(weights, resolution, random_state)
+    return communities
+
+
+# Return the community of every node found by a Louvain-style optimisation of the modularity (see run_levels).
+# The simultaneous moves stop in a worse local optimum than the sequential moves of the original Louvain, so the
+# levels are run again from the communities found, on the whole graph, while a pass increases the modularity by more
+# than the tolerance.
+def louvain(compact_graph, resolution=1.0, random_seed=0, max_levels=20, max_passes=10, tolerance=1e-7):
+    random_state = numpy.random.RandomState(random_seed)
+    weights = get_undirected_adjacency(compact_graph)
+    communities = numpy.arange(compact_graph.number_of_nodes, dtype=numpy.int64)
+    current_modularity = modularity(weights, communities, resolution)
+    for _ in range(max_passes):
+        pass_communities = run_levels(weights, communities, resolution, random_state, max_levels)
+        pass_modularity = modularity(weights, pass_communities, resolution)
+        if pass_modularity <= current_modularity + tolerance:
+            break
+        communities, current_modularity = pass_communities, pass_modularity
+    return communities
+
+
+# Return the statistics of every community as a dictionary of arrays indexed by community:
+# size, internal_edges, cut_edges (edges with one end in the community), density (internal edges / possible
+# directed edges) and conductance (cut edges / edges touching the community)
+def get_community_statistics(compact_graph, communities):
+    nb_communities = communities.max() + 1 if len(communities) else 0
+    sources, targets = compact_graph.edges()
+    source_communities, target_communities = communities[sources], communities[targets]
+    internal = source_communities == target_communities
+    sizes = numpy.bincount(communities, minlength=nb_communities)
+    internal_edges = numpy.bincount(source_communities[internal], minlength=nb_communities)
+    cut_edges = numpy.bincount(source_communities[~internal], minlength=nb_communities) + \
+        numpy.bincount(target_communities[~internal], minlength=nb_communities)
+    possible_edges = sizes * (sizes - 1.0)
+    density = numpy.where(possible_edges > 0, internal_edges / numpy.maximum(possible_edges, 1), 0.0)
+    touching_edges = 2 * internal_edges + cut_edges
+    conductance = numpy.where(touching_edges > 0, cut_edges / numpy.maximum(touching_edges, 1.0), 0.0)
+    return {"size": sizes, "internal_edges": internal_edges, "cut_edges": cut_edges, "density": density,
+            "conductance": conductance}
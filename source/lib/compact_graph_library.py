@@ -0,0 +1,261 @@
+import hashlib
+import os.path
+import numpy
+import networkx as nx
+
+# Version of the layout of the .npz snapshots, to increment when the stored arrays change
+SNAPSHOT_VERSION = 1
+
+# Membership test of the elements of an array in another one: numpy.isin does not exist in numpy 1.11 (pinned in
+# requirements.txt) and numpy.in1d was removed in numpy 2
+isin = getattr(numpy, "isin", None) or numpy.in1d
+
+
+# Methods of nx.DiGraph changing the nodes or the edges (some of them only exist in some versions of networkx)
+MUTATING_METHODS = ("add_node", "add_nodes_from", "remove_node", "remove_nodes_from", "add_edge", "add_edges_from",
+                    "add_weighted_edges_from", "remove_edge", "remove_edges_from", "add_path", "add_cycle",
+                    "add_star", "clear", "clear_edges", "update")
+
+
+# This class is a networkx DiGraph counting its changes: version is incremented by every method adding or removing
+# nodes or edges, so the owner of a CompactGraph mirror knows when the mirror is stale even if the sizes did not
+# change (an edge removed and another one added)
+class VersionedDiGraph(nx.DiGraph):
+    version = 0
+
+
+def get_versioned_method(name):
+    method = getattr(nx.DiGraph, name)
+
+    def versioned_method(self, *args, **kwargs):
+        self.version += 1
+        return method(self, *args, **kwargs)
+    versioned_method.__name__ = name
+    versioned_method.__doc__ = method.__doc__
+    return versioned_method
+
+
+for method_name in MUTATING_METHODS:
+    if hasattr(nx.DiGraph, method_name):
+        setattr(VersionedDiGraph, method_name, get_versioned_method(method_name))
+
+
+# Return the graph as a VersionedDiGraph, a plain DiGraph is converted in place so the references to it stay valid
+def as_versioned(graph):
+    if type(graph) is nx.DiGraph:
+        graph.__class__ = VersionedDiGraph
+    return graph
+
+
+# This class is an array based store of a directed graph.
+# The twitter ids are remapped to contiguous int64 indexes (the position of the id in the sorted array node_ids),
+# the successors are stored in CSR form (out_indptr, out_indices) and the predecessors in CSC form
+# (in_indptr, in_indices). It takes a few bytes per edge instead of the dictionaries of networkx.
+class CompactGraph:
+
+    # Constructor of the class
+    # Take 3 parameters in input:
+    #          - The sorted array of the unique twitter ids of the nodes
+    #          - The array of the indexes of the source of every edge
+    #          - The array of the indexes of the target of every edge
+    def __init__(self, node_ids, sources, targets):
+        self.node_ids = numpy.asarray(node_ids, dtype=numpy.int64)
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        targets = numpy.asarray(targets, dtype=numpy.int64)
+        self.out_indptr, self.out_indices = build_compressed(sources, targets, len(self.node_ids))
+        self.in_indptr, self.in_indices = build_compressed(targets, sources, len(self.node_ids))
+        self._networkx = None
+        self._content_hash = None
+
+    # Construct a CompactGraph from two arrays of twitter ids, the duplicated edges are removed
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The twitter ids of the source of the edges
+    #          - The twitter ids of the target of the edges
+    #          - Optional isolated nodes to keep in the graph
+    @classmethod
+    def from_edges(cls, sources, targets, nodes=()):
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        targets = numpy.asarray(targets, dtype=numpy.int64)
+        nodes = numpy.asarray(list(nodes), dtype=numpy.int64)
+        node_ids = numpy.unique(numpy.concatenate((sources, targets, nodes)))
+        nb_nodes = len(node_ids)
+        keys = numpy.unique(numpy.searchsorted(node_ids, sources) * nb_nodes + numpy.searchsorted(node_ids, targets))
+        return cls(node_ids, keys // max(nb_nodes, 1), keys % max(nb_nodes, 1))
+
+    # Construct a CompactGraph from already compressed arrays, nothing is sorted or copied
+    @classmethod
+    def from_arrays(cls, node_ids, out_indptr, out_indices, in_indptr, in_indices):
+        obj = cls.__new__(cls)
+        obj.node_ids = node_ids
+        obj.out_indptr, obj.out_indices = out_indptr, out_indices
+        obj.in_indptr, obj.in_indices = in_indptr, in_indices
+        obj._networkx = None
+        obj._content_hash = None
+        return obj
+
+    @classmethod
+    def from_networkx(cls, graph):
+        edges = graph.edges()
+        sources = [edge[0] for edge in edges]
+        targets = [edge[1] for edge in edges]
+        return cls.from_edges(sources, targets, nodes=graph.nodes())
+
+    @property
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    @property
+    def number_of_edges(self):
+        return len(self.out_indices)
+
+    # Return the indexes of the given twitter ids, raise a KeyError if one of them is not in the graph
+    def index_of(self, node_ids):
+        node_ids = numpy.asarray(node_ids, dtype=numpy.int64)
+        indexes = numpy.searchsorted(self.node_ids, node_ids)
+        indexes[indexes == len(self.node_ids)] = 0
+        if len(self.node_ids) == 0 or not numpy.all(self.node_ids[indexes] == node_ids):
+            raise KeyError("Some nodes are not in the graph")
+        return indexes
+
+    # Return the indexes of the given twitter ids and the mask of the ids that are in the graph
+    def find(self, node_ids):
+        node_ids = numpy.asarray(node_ids, dtype=numpy.int64)
+        if len(self.node_ids) == 0:
+            return numpy.zeros(len(node_ids), dtype=numpy.int64), numpy.zeros(len(node_ids), dtype=bool)
+        indexes = numpy.searchsorted(self.node_ids, node_ids)
+        indexes[indexes == len(self.node_ids)] = 0
+        return indexes, self.node_ids[indexes] == node_ids
+
+    # Return the number of friends of every node
+    def out_degree(self):
+        return numpy.diff(self.out_indptr)
+
+    # Return the number of followers of every node
+    def in_degree(self):
+        return numpy.diff(self.in_indptr)
+
+    def successors(self, node):
+        index = self.index_of([node])[0]
+        return self.node_ids[self.out_indices[self.out_indptr[index]:self.out_indptr[index + 1]]]
+
+    def predecessors(self, node):
+        index = self.index_of([node])[0]
+        return self.node_ids[self.in_indices[self.in_indptr[index]:self.in_indptr[index + 1]]]
+
+    # Return the indexes of the sources and the targets of all the edges
+    def edges(self):
+        sources = numpy.repeat(numpy.arange(self.number_of_nodes, dtype=numpy.int64), self.out_degree())
+        return sources, self.out_indices
+
+    # Return the out edges of the given nodes as (index of the source, index of the target)
+    def out_edges_of(self, indexes):
+        indexes = numpy.asarray(indexes, dtype=numpy.int64)
+        nb_successors = self.out_indptr[indexes + 1] - self.out_indptr[indexes]
+        offsets = numpy.arange(nb_successors.sum()) - numpy.repeat(numpy.cumsum(nb_successors) - nb_successors,
+                                                                   nb_successors)
+        return (numpy.repeat(indexes, nb_successors),
+                self.out_indices[numpy.repeat(self.out_indptr[indexes], nb_successors) + offsets])
+
+    # Return a new CompactGraph with the edges added (given as twitter ids) and the edges that were not
+    # already in the graph, as (index of the source, index of the target) in the new graph.
+    # Also return the new index of every node of this graph
+    def add_edges(self, sources, targets):
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        targets = numpy.asarray(targets, dtype=numpy.int64)
+        node_ids = numpy.unique(numpy.concatenate((self.node_ids, sources, targets)))
+        nb_nodes = len(node_ids)
+        new_indexes = numpy.searchsorted(node_ids, self.node_ids)
+        old_sources, old_targets = self.edges()
+        old_keys = new_indexes[old_sources] * nb_nodes + new_indexes[old_targets]
+        keys = numpy.unique(numpy.searchsorted(node_ids, sources) * nb_nodes + numpy.searchsorted(node_ids, targets))
+        added_keys = keys[~isin(keys, old_keys)]
+        keys = numpy.concatenate((old_keys, added_keys))
+        graph = CompactGraph(node_ids, keys // max(nb_nodes, 1), keys % max(nb_nodes, 1))
+        return graph, added_keys // max(nb_nodes, 1), added_keys % max(nb_nodes, 1), new_indexes
+
+    # Return the list of the edges as (twitter id of the source, twitter id of the target)
+    def get_edge_list(self):
+        sources, targets = self.edges()
+        return list(zip(self.node_ids[sources].tolist(), self.node_ids[targets].tolist()))
+
+    # Return the CompactGraph induced by the nodes where the mask is True
+    def subgraph(self, mask):
+        mask = numpy.asarray(mask, dtype=bool)
+        sources, targets = self.edges()
+        kept_edges = mask[sources] & mask[targets]
+        new_indexes = numpy.cumsum(mask) - 1
+        return CompactGraph(self.node_ids[mask], new_indexes[sources[kept_edges]], new_indexes[targets[kept_edges]])
+
+    # Return a stable hash of the edge set, two graphs with the same nodes and edges have the same hash
+    # It is computed once, a CompactGraph is never modified (add_edges returns a new graph)
+    def content_hash(self):
+        if self._content_hash is None:
+            sources, targets = self.edges()
+            keys = numpy.sort(sources * max(self.number_of_nodes, 1) + targets)
+            content_hash = hashlib.sha1()
+            content_hash.update(self.node_ids.astype("<i8").tobytes())
+            content_hash.update(keys.astype("<i8").tobytes())
+            self._content_hash = content_hash.hexdigest()
+        return self._content_hash
+
+    # Lazily build the networkx view of the graph for the algorithms that still need it
+    def to_networkx(self):
+        if self._networkx is None:
+            graph = VersionedDiGraph()
+            graph.add_nodes_from(self.node_ids.tolist())
+            graph.add_edges_from(self.get_edge_list())
+            self._networkx = graph
+        return self._networkx
+
+    # Save the graph in a binary snapshot (uncompressed .npz)
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The path of the snapshot
+    #          - The twitter ids of the seeds of the graph
+    #          - A dictionary of node attributes, every array is aligned with node_ids
+    def save_snapshot(self, path, seeds=(), attributes=None):
+        arrays = {
+            "version": numpy.array(SNAPSHOT_VERSION),
+            "node_ids": self.node_ids,
+            "out_indptr": self.out_indptr,
+            "out_indices": self.out_indices,
+            "in_indptr": self.in_indptr,
+            "in_indices": self.in_indices,
+            "seeds": numpy.array(list(seeds), dtype=numpy.int64)
+        }
+        for attribute, values in (attributes or {}).items():
+            arrays["attribute_" + attribute] = numpy.asarray(values)
+        with open(path, "wb") as snapshot_file:
+            numpy.savez(snapshot_file, **arrays)
+
+    # Load a snapshot written by save_snapshot
+    # Return the CompactGraph, the list of the seeds and the dictionary of the node attributes
+    @classmethod
+    def load_snapshot(cls, path):
+        with numpy.load(path) as snapshot:
+            version = int(snapshot["version"])
+            if version > SNAPSHOT_VERSION:
+                raise ValueError("The snapshot {0} has the version {1}, the newest supported version is {2}"
+                                 .format(path, version, SNAPSHOT_VERSION))
+            obj = cls.from_arrays(snapshot["node_ids"], snapshot["out_indptr"], snapshot["out_indices"],
+                                  snapshot["in_indptr"], snapshot["in_indices"])
+            seeds = snapshot["seeds"].tolist()
+            attributes = {key[len("attribute_"):]: snapshot[key] for key in snapshot.files
+                          if key.startswith("attribute_")}
+        return obj, seeds, attributes
+
+
+# Return True if a snapshot exists and is more recent than the GML export of the same graph
+def is_snapshot_up_to_date(snapshot_path, gml_path):
+    if not os.path.exists(snapshot_path):
+        return False
+    return not os.path.exists(gml_path) or os.path.getmtime(snapshot_path) >= os.path.getmtime(gml_path)
+
+
+# Build the compressed (indptr, indices) arrays of a sparse adjacency from its coordinates
+def build_compressed(rows, columns, nb_rows):
+    order = numpy.argsort(rows, kind="mergesort")
+    indptr = numpy.zeros(nb_rows + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(rows, minlength=max(nb_rows, 1))[:nb_rows], out=indptr[1:])
+    return indptr, columns[order]
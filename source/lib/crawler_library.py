@@ -0,0 +1,246 @@
+import collections
+import concurrent.futures
+import threading
+import time
+import urllib.parse
+import urllib.robotparser
+
+import urllib3
+from bs4 import BeautifulSoup
+
+USER_AGENT = "Mozilla/5.0 (compatible; thesis-article-crawler)"
+
+
+# This class keeps the URLs waiting to be crawled, a URL is only added once even after it was crawled
+class CrawlFrontier:
+
+    def __init__(self):
+        self.seen = set()
+        self.waiting = collections.deque()
+        self.lock = threading.Lock()
+
+    # Add the URLs never seen before, return the number of added URLs
+    def add(self, urls):
+        nb_added = 0
+        with self.lock:
+            for url in urls:
+                url = urllib.parse.urldefrag(url)[0]
+                if url not in self.seen:
+                    self.seen.add(url)
+                    self.waiting.append(url)
+                    nb_added += 1
+        return nb_added
+
+    # Return the next URL or None if no URL is waiting
+    def pop(self):
+        with self.lock:
+            return self.waiting.popleft() if self.waiting else None
+
+
+# This class makes the crawl polite for one host: at most max_connections requests at the same time and at least
+# delay seconds between the start of two requests (the crawl delay of robots.txt if it is longer)
+class HostPoliteness:
+
+    def __init__(self, robots, max_connections, delay):
+        self.robots = robots
+        self.delay = delay
+        self.connections = threading.BoundedSemaphore(max_connections)
+        self.lock = threading.Lock()
+        self.next_request = 0.0
+
+    # Wait until a request can be sent to the host
+    def wait_turn(self):
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_request)
+            self.next_request = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+
+# This class fetches pages with a pool of threads. The connections to every host are kept alive and reused
+# (urllib3 pools), robots.txt and the crawl delay of every host are respected, and the failed requests are retried
+# with an exponential backoff.
+class Crawler:
+
+    # Constructor of the class
+    # Take 8 parameters in input:
+    #          - The class
+    #          - The number of threads fetching the pages
+    #          - The maximum number of requests in flight per host
+    #          - The minimum delay in seconds between two requests to a host (robots.txt can make it longer)
+    #          - The number of retries of a failed request (robots.txt included)
+    #          - The delay before the first retry, doubled at every retry
+    #          - The timeout of a request in seconds
+    #          - The user agent of the requests
+    def __init__(self, nb_threads=16, max_connections_per_host=2, delay=1.0, max_retries=3, backoff=1.0,
+                 timeout=30.0, user_agent=USER_AGENT):
+        self.nb_threads = nb_threads
+        self.max_connections_per_host = max_connections_per_host
+        self.delay = delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.user_agent = user_agent
+        self.pool = urllib3.PoolManager(num_pools=64, maxsize=max_connections_per_host, block=True,
+                                        headers={"User-Agent": user_agent}, timeout=timeout, retries=False)
+        self.hosts = {}
+        self.host_locks = {}
+        self.hosts_lock = threading.Lock()
+
+    # Return the HostPoliteness of the host of a URL, robots.txt is read on the first request to the host
+    # Only the threads waiting for the same host are blocked while its robots.txt is read
+    def get_host(self, url):
+        parsed_url = urllib.parse.urlsplit(url)
+        host = "{0}://{1}".format(parsed_url.scheme, parsed_url.netloc)
+        with self.hosts_lock:
+            host_lock = self.host_locks.setdefault(host, threading.Lock())
+        with host_lock:
+            if host not in self.hosts:
+                robots = self.read_robots(host)
+                delay = max(self.delay, float(robots.crawl_delay(self.user_agent) or 0))
+                self.hosts[host] = HostPoliteness(robots, self.max_connections_per_host, delay)
+        return self.hosts[host]
+
+    # Return the parsed robots.txt of a host, everything is allowed when the host has no robots.txt and nothing when
+    # it can not be read after all the retries
+    def read_robots(self, host):
+        robots = urllib.robotparser.RobotFileParser(host + "/robots.txt")
+        response = self.request(host + "/robots.txt")
+        if response is None or response.status in (401, 403):
+            print("Can not read {0}/robots.txt, nothing is crawled on this host".format(host))
+            robots.disallow_all = True
+        elif response.status >= 400:
+            robots.allow_all = True
+        else:
+            robots.parse(response.data.decode("utf-8", errors="replace").splitlines())
+        return robots
+
+    # Send a GET request, retried with an exponential backoff after a network error, a server error or a 429
+    # Return the response, or None if all the attempts failed
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The URL
+    #          - The HostPoliteness the request has to respect (None to send it at once)
+    def request(self, url, host=None):
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            try:
+                if host is None:
+                    response = self.pool.request("GET", url)
+                else:
+                    with host.connections:
+                        host.wait_turn()
+                        response = self.pool.request("GET", url)
+            except urllib3.exceptions.HTTPError as error:
+                print("Request failed ({0}): {1}".format(error, url))
+                continue
+            # The client errors are not retried, except when the host asks to slow down
+            if response.status < 500 and response.status != 429:
+                return response
+            print("Status {0}: {1}".format(response.status, url))
+        print("Failed after {0} retries: {1}".format(self.max_retries, url))
+        return None
+
+    # Return the body of a page, or None if robots.txt forbids it or if it failed after all the retries
+    def fetch(self, url):
+        host = self.get_host(url)
+        if not host.robots.can_fetch(self.user_agent, url):
+            print("Forbidden by robots.txt: {0}".format(url))
+            return None
+        response = self.request(url, host)
+        if response is None:
+            return None
+        if response.status != 200:
+            print("Status {0}: {1}".format(response.status, url))
+            return None
+        return response.data
+
+    # Crawl the pages reachable from the start URLs: every fetched page is given to handle(url, body), which returns
+    # the URLs to crawl next (the URLs already seen are skipped)
+    # Return the dictionary {"fetched", "failed", "seconds"}
+    def crawl(self, start_urls, handle):
+        frontier = CrawlFrontier()
+        frontier.add(start_urls)
+        nb_fetched, nb_failed = 0, 0
+        start = time.time()
+
+        def process(url):
+            body = self.fetch(url)
+            return body is not None, handle(url, body) if body is not None else []
+
+        with concurrent.futures.ThreadPoolExecutor(self.nb_threads) as executor:
+            running = set()
+            while True:
+                # At most two pages per thread are queued so the URLs found meanwhile keep their order
+                while len(running) < 2 * self.nb_threads:
+                    url = frontier.pop()
+                    if url is None:
+                        break
+                    running.add(executor.submit(process, url))
+                if not running:
+                    break
+                done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        fetched, next_urls = future.result()
+                    except Exception as error:
+                        print("Failed to process a page: {0}".format(error))
+                        fetched, next_urls = False, []
+                    nb_fetched, nb_failed = nb_fetched + fetched, nb_failed + (not fetched)
+                    frontier.add(next_urls)
+        elapsed = time.time() - start
+        print("Fetched {0} pages ({1} failed) in {2:.1f}s".format(nb_fetched, nb_failed, elapsed))
+        return {"fetched": nb_fetched, "failed": nb_failed, "seconds": elapsed}
+
+
+# This class crawls the listing of an article site and saves the new articles (see Article.save_article)
+class ArticleSiteCrawl:
+
+    # Constructor of the class
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The Article class of the site (ex: DailystormerArticle)
+    #          - The Crawler
+    #          - The first page of the listing
+    #          - The last page of the listing (None for the last page found on the first page)
+    def __init__(self, article_class, crawler, first_page=1, last_page=None):
+        self.article_class = article_class
+        self.crawler = crawler
+        self.first_page = first_page
+        self.last_page = last_page
+        self.listing_urls = set()
+        self.nb_saved = 0
+        self.lock = threading.Lock()
+
+    def get_listing_urls(self, first_page, last_page):
+        urls = [self.article_class.get_listing_url(page) for page in range(first_page, last_page + 1)]
+        with self.lock:
+            self.listing_urls.update(urls)
+        return urls
+
+    # Handle a page fetched by the crawler: a listing page gives the URLs of the articles that are not saved yet
+    # (and of the other listing pages for the first one), an article page is parsed and saved
+    def handle(self, url, body):
+        if url in self.listing_urls:
+            soup = BeautifulSoup(body, 'html.parser')
+            next_urls = []
+            if url == self.article_class.get_listing_url(self.first_page):
+                last_page = self.last_page or self.article_class.get_last_listing_page(soup)
+                next_urls += self.get_listing_urls(self.first_page + 1, last_page)
+            article = self.article_class()
+            next_urls += [link for link in self.article_class.get_listing_links(soup) if not article.is_present(link)]
+            return next_urls
+        article = self.article_class.from_html(url, body)
+        article.save_article()
+        with self.lock:
+            self.nb_saved += 1
+        print("Saved: {0}".format(url))
+        return []
+
+    # Crawl the listing and save the new articles
+    # Return the statistics of the crawl (see Crawler.crawl) with the number of saved articles
+    def run(self):
+        statistics = self.crawler.crawl(self.get_listing_urls(self.first_page, self.first_page), self.handle)
+        statistics["saved"] = self.nb_saved
+        return statistics
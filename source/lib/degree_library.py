@@ -0,0 +1,77 @@
+import numpy
+
+
+# This class computes once the in and out degree arrays of a CompactGraph and gives vectorized summaries of them.
+# The direction is "in" (number of followers), "out" (number of friends) or "total".
+class DegreeStatistics:
+
+    # Constructor of the class
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The CompactGraph
+    #          - Optional in degree array already known (ex: maintained while edges are added)
+    #          - Optional out degree array already known
+    def __init__(self, compact_graph, in_degree=None, out_degree=None):
+        self.compact_graph = compact_graph
+        self.node_ids = compact_graph.node_ids
+        self.in_degree = compact_graph.in_degree() if in_degree is None else in_degree
+        self.out_degree = compact_graph.out_degree() if out_degree is None else out_degree
+        self.total_degree = self.in_degree + self.out_degree
+
+    def get_degree(self, direction):
+        if direction == "in":
+            return self.in_degree
+        if direction == "out":
+            return self.out_degree
+        if direction == "total":
+            return self.total_degree
+        raise ValueError("Unknown direction: {0}".format(direction))
+
+    def mean(self, direction):
+        return numpy.mean(self.get_degree(direction))
+
+    # Return the dictionary {quantile: degree}
+    def quantiles(self, direction, quantiles=(0.25, 0.5, 0.75, 0.9, 0.99)):
+        degree = self.get_degree(direction)
+        if len(degree) == 0:
+            return {}
+        return dict(zip(quantiles, numpy.percentile(degree, [100 * quantile for quantile in quantiles]).tolist()))
+
+    # Return the indexes of the k nodes with the highest degree, from the highest to the lowest
+    # Only the k selected nodes are sorted (partial sort)
+    def top_k_indexes(self, direction, k):
+        degree = self.get_degree(direction)
+        if k < len(degree):
+            indexes = numpy.argpartition(-degree, k)[:k]
+        else:
+            indexes = numpy.arange(len(degree))
+        return indexes[numpy.argsort(-degree[indexes], kind="mergesort")]
+
+    # Return the list of the k (twitter id, degree) with the highest degree
+    def top_k(self, direction, k):
+        indexes = self.top_k_indexes(direction, k)
+        return list(zip(self.node_ids[indexes].tolist(), self.get_degree(direction)[indexes].tolist()))
+
+    # Return the histogram of the positive degrees with logarithmic bins
+    # Return the edges of the bins, the number of nodes per bin and the density (number of nodes / width of the bin)
+    def log_binned_histogram(self, direction, nb_bins=20):
+        degree = self.get_degree(direction)
+        degree = degree[degree > 0]
+        if len(degree) == 0:
+            return numpy.zeros(0), numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0)
+        bin_edges = numpy.unique(numpy.floor(numpy.logspace(0, numpy.log10(degree.max() + 1), nb_bins + 1)))
+        if len(bin_edges) < 2:
+            bin_edges = numpy.array([1.0, 2.0])
+        counts, bin_edges = numpy.histogram(degree, bins=bin_edges)
+        return bin_edges, counts, counts / numpy.diff(bin_edges)
+
+    def summary(self):
+        summary = {}
+        for direction in ("in", "out", "total"):
+            degree = self.get_degree(direction)
+            summary[direction] = {
+                "mean": float(numpy.mean(degree)) if len(degree) else 0.0,
+                "max": int(degree.max()) if len(degree) else 0,
+                "quantiles": self.quantiles(direction)
+            }
+        return summary
@@ -0,0 +1,155 @@
+import multiprocessing
+import numpy
+from scipy import sparse
+
+INDEPENDENT_CASCADE = "independent_cascade"
+LINEAR_THRESHOLD = "linear_threshold"
+
+# Influence arrays of the graph in the worker processes, set once by init_worker
+WORKER_MODEL = {}
+
+
+# Return the influence edges of a CompactGraph: if u follows v, v influences u
+# Return the arrays of the influencers, of the influenced nodes and the number of nodes followed by every node
+def get_influence_edges(compact_graph):
+    followers, followed = compact_graph.edges()
+    return followed, followers, compact_graph.out_degree()
+
+
+# Return the activation probability of every influence edge
+# Take 3 parameters in input:
+#          - The influenced node of every edge
+#          - The number of accounts followed by every node
+#          - A probability shared by all the edges, or "weighted" for 1 / number of accounts followed
+def get_edge_probabilities(influenced, nb_followed, probability):
+    if probability == "weighted":
+        return 1.0 / nb_followed[influenced]
+    return numpy.full(len(influenced), float(probability))
+
+
+# Run nb_runs independent cascades at once, the state of the runs is a (nb_nodes x nb_runs) boolean matrix
+# The edges are tried by chunks of at most max_attempts (edge, run) pairs and a random number is only drawn for the
+# runs where the influencer was just activated, so the memory of a step does not grow with the number of edges
+# (the random numbers are drawn in the same order whatever the size of the chunks)
+# Return the matrix of the nodes active at the end of every run
+def run_independent_cascades(influencers, influenced, probabilities, nb_nodes, seeds, nb_runs, random_state,
+                             max_attempts=2 ** 20):
+    active = numpy.zeros((nb_nodes, nb_runs), dtype=bool)
+    active[seeds] = True
+    newly_active = active.copy()
+    chunk_size = max(max_attempts // max(nb_runs, 1), 1)
+    while newly_active.any():
+        # Only the edges leaving a node activated at the last step in at least one run are tried
+        candidates = numpy.flatnonzero(newly_active.any(axis=1)[influencers])
+        reached = numpy.zeros((nb_nodes, nb_runs), dtype=bool)
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            edges, runs = numpy.nonzero(newly_active[influencers[chunk]])
+            successes = random_state.random_sample(len(edges)) < probabilities[chunk[edges]]
+            reached[influenced[chunk[edges[successes]]], runs[successes]] = True
+        newly_active = reached & ~active
+        active |= newly_active
+    return active
+
+
+# Run nb_runs linear threshold diffusions at once, every node gets a uniform random threshold per run and is
+# activated when the sum of the weights of its active influencers reaches it
+# Return the matrix of the nodes active at the end of every run
+def run_linear_thresholds(weights, nb_nodes, seeds, nb_runs, random_state):
+    thresholds = random_state.random_sample((nb_nodes, nb_runs))
+    active = numpy.zeros((nb_nodes, nb_runs), dtype=bool)
+    active[seeds] = True
+    newly_active = active
+    while newly_active.any():
+        influence = weights.dot(active.astype(numpy.float64))
+        newly_active = (influence >= thresholds) & ~active
+        active |= newly_active
+    return active
+
+
+def init_worker(model, influencers, influenced, probabilities, nb_nodes):
+    WORKER_MODEL.update(get_model_arrays(model, influencers, influenced, probabilities, nb_nodes))
+
+
+# Return the arrays used by the simulations of a model
+def get_model_arrays(model, influencers, influenced, probabilities, nb_nodes):
+    arrays = {"model": model, "nb_nodes": nb_nodes}
+    if model == INDEPENDENT_CASCADE:
+        arrays.update({"influencers": influencers, "influenced": influenced, "probabilities": probabilities})
+    elif model == LINEAR_THRESHOLD:
+        # weights[u, v] is the weight of the influence of v on u
+        arrays["weights"] = sparse.csr_matrix((probabilities, (influenced, influencers)), shape=(nb_nodes, nb_nodes))
+    else:
+        raise ValueError("Unknown diffusion model: {0}".format(model))
+    return arrays
+
+
+# Run a batch of simulations and return the number of runs where every node was active
+# Take 4 parameters in input:
+#          - The indexes of the seeds
+#          - The number of runs of the batch
+#          - The random seed of the batch
+#          - The arrays of the model (default to the ones of the worker process)
+def simulate_batch(seeds, nb_runs, random_seed, arrays=None):
+    arrays = arrays or WORKER_MODEL
+    random_state = numpy.random.RandomState(random_seed)
+    if arrays["model"] == INDEPENDENT_CASCADE:
+        active = run_independent_cascades(arrays["influencers"], arrays["influenced"], arrays["probabilities"],
+                                          arrays["nb_nodes"], seeds, nb_runs, random_state)
+    else:
+        active = run_linear_thresholds(arrays["weights"], arrays["nb_nodes"], seeds, nb_runs, random_state)
+    return active.sum(axis=1)
+
+
+def simulate_batch_from_arguments(arguments):
+    return simulate_batch(*arguments)
+
+
+# This class runs Monte-Carlo diffusions (independent cascade or linear threshold) on a CompactGraph.
+# The runs are done in batches of vectorized simulations, the batches can be split across a pool of processes.
+# Every batch has its own random seed derived from the seed of the simulation, so the result does not depend on
+# the number of processes.
+class DiffusionModel:
+
+    # Constructor of the class
+    # Take 6 parameters in input:
+    #          - The class
+    #          - The CompactGraph
+    #          - The model: "independent_cascade" or "linear_threshold"
+    #          - The activation probability of the edges for the independent cascade, the weight of the edges for
+    #            the linear threshold ("weighted" for 1 / number of accounts followed by the influenced node)
+    #          - The number of processes (1 to stay in the current process)
+    #          - The number of runs simulated together
+    def __init__(self, compact_graph, model=INDEPENDENT_CASCADE, probability="weighted", nb_processes=1,
+                 batch_size=256):
+        self.compact_graph = compact_graph
+        self.model = model
+        self.nb_processes = nb_processes
+        self.batch_size = batch_size
+        self.influencers, self.influenced, nb_followed = get_influence_edges(compact_graph)
+        self.probabilities = get_edge_probabilities(self.influenced, nb_followed, probability)
+        self.arrays = get_model_arrays(model, self.influencers, self.influenced, self.probabilities,
+                                       compact_graph.number_of_nodes)
+
+    # Return the activation probability of every node (aligned with the node_ids of the CompactGraph)
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The twitter ids of the seeds of the diffusion
+    #          - The number of Monte-Carlo runs
+    #          - The seed of the random generators
+    def get_activation_probabilities(self, seeds, nb_runs=1000, random_seed=0):
+        seeds = self.compact_graph.index_of(list(seeds))
+        batches = []
+        for batch_number, start in enumerate(range(0, nb_runs, self.batch_size)):
+            batches.append((seeds, min(self.batch_size, nb_runs - start), [random_seed, batch_number]))
+        if self.nb_processes > 1:
+            pool = multiprocessing.Pool(self.nb_processes, initializer=init_worker,
+                                        initargs=(self.model, self.influencers, self.influenced,
+                                                  self.probabilities, self.compact_graph.number_of_nodes))
+            try:
+                counts = pool.map(simulate_batch_from_arguments, batches)
+            finally:
+                pool.terminate()
+        else:
+            counts = [simulate_batch(*(batch + (self.arrays,))) for batch in batches]
+        return numpy.sum(counts, axis=0) / float(nb_runs)
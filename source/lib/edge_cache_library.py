@@ -0,0 +1,218 @@
+import collections
+import glob
+import json
+import os
+import time
+import numpy
+
+from source.__init__ import DEFINITIONS_ROOT
+from source.lib.compact_graph_library import isin
+from source.lib.edge_loader_library import EdgeSource
+from source.lib.edge_loader_library import get_edge_arrays_in
+
+# Version of the layout of the cache, a cache written with another version is rebuilt
+CACHE_VERSION = 1
+NETWORK_CACHE_DIRECTORY = DEFINITIONS_ROOT + "/data/network_cache"
+FRIEND_FLAG = 1
+FOLLOWER_FLAG = 2
+
+# Same fields as the rows of the network table returned by the cassandra driver
+EdgeRow = collections.namedtuple("EdgeRow", ["node_id", "friend_follower_id", "is_friend", "is_follower"])
+
+
+# Return the sorted array of the given twitter ids
+def get_sorted_ids(node_ids):
+    return numpy.array(sorted(int(node_id) for node_id in node_ids), dtype=numpy.int64)
+
+
+# Return the (node_id, friend_follower_id, flags) arrays of rows of the network table
+def rows_to_columns(rows):
+    node_ids, friend_follower_ids, flags = [], [], []
+    for row in rows:
+        node_ids.append(row.node_id)
+        friend_follower_ids.append(row.friend_follower_id)
+        flags.append((FRIEND_FLAG if row.is_friend else 0) | (FOLLOWER_FLAG if row.is_follower else 0))
+    return (numpy.array(node_ids, dtype=numpy.int64), numpy.array(friend_follower_ids, dtype=numpy.int64),
+            numpy.array(flags, dtype=numpy.uint8))
+
+
+# This class is a local copy of the network table stored in columnar shards (.npz files sorted by node_id).
+# It is read like the EdgeLoader, so the SocialGraph builders can use it instead of Cassandra when it is fresh.
+# The crawlers only add new partitions to the network table, so a refresh only reads the partitions that are
+# not in the cache yet (or the partitions given explicitly when they changed).
+# Reading the cache never connects to Cassandra: the EdgeLoader is only created by build and refresh.
+# The freshness is only based on the age of the cache, the partitions added meanwhile by the crawlers (seed_job,
+# centrality_job) are ignored until the next refresh, get_missing_partitions lists them.
+class EdgeCache(EdgeSource):
+
+    # Constructor of the class
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The directory of the cache
+    #          - The function returning the EdgeLoader reading Cassandra when the cache is built or refreshed
+    #          - The number of seconds after which the cache is not fresh anymore
+    #          - The maximum number of rows per shard
+    def __init__(self, directory, edge_loader_factory, max_age=24 * 3600, shard_size=5000000):
+        self.directory = directory
+        self.edge_loader_factory = edge_loader_factory
+        self.edge_loader = None
+        self.max_age = max_age
+        self.shard_size = shard_size
+        self.columns = None
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def get_edge_loader(self):
+        if self.edge_loader is None:
+            self.edge_loader = self.edge_loader_factory()
+        return self.edge_loader
+
+    def get_manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def get_partitions_path(self):
+        return os.path.join(self.directory, "partitions.npy")
+
+    def read_manifest(self):
+        if not os.path.exists(self.get_manifest_path()):
+            return None
+        with open(self.get_manifest_path()) as manifest_file:
+            manifest = json.load(manifest_file)
+        if manifest["version"] != CACHE_VERSION:
+            return None
+        return manifest
+
+    def write_manifest(self, manifest):
+        manifest["version"] = CACHE_VERSION
+        manifest["refreshed_at"] = time.time()
+        with open(self.get_manifest_path(), "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+
+    # Return True if the cache exists and was refreshed less than max_age seconds ago
+    def is_fresh(self):
+        manifest = self.read_manifest()
+        return manifest is not None and time.time() - manifest["refreshed_at"] < self.max_age
+
+    # Return the set of the nodes having a partition in the network table that is not in the cache yet
+    # It scans the distinct partitions of the network table, so it needs Cassandra
+    def get_missing_partitions(self):
+        cached_partitions = set(self.distinct_node_ids()) if self.read_manifest() is not None else set()
+        return set(self.get_edge_loader().distinct_node_ids()) - cached_partitions
+
+    # Write the rows in new shards sorted by node_id and return their file names
+    def write_shards(self, node_ids, friend_follower_ids, flags, first_shard_number):
+        order = numpy.lexsort((friend_follower_ids, node_ids))
+        shards = []
+        for start in range(0, len(order), self.shard_size):
+            shard = "shard_{0:05d}.npz".format(first_shard_number + len(shards))
+            rows = order[start:start + self.shard_size]
+            numpy.savez(os.path.join(self.directory, shard), node_id=node_ids[rows],
+                        friend_follower_id=friend_follower_ids[rows], flags=flags[rows])
+            shards.append(shard)
+        return shards
+
+    def write_partitions(self, partitions):
+        numpy.save(self.get_partitions_path(), numpy.unique(numpy.asarray(list(partitions), dtype=numpy.int64)))
+
+    # Copy the whole network table in the cache
+    def build(self):
+        print("Build the local cache of the network table in {0}".format(self.directory))
+        for shard in glob.glob(os.path.join(self.directory, "shard_*.npz")):
+            os.remove(shard)
+        edge_loader = self.get_edge_loader()
+        partitions = edge_loader.distinct_node_ids()
+        shards = self.write_shards(*rows_to_columns(edge_loader.iter_table()), first_shard_number=0)
+        self.write_partitions(partitions)
+        self.write_manifest({"shards": shards, "created_at": time.time(), "next_shard": len(shards)})
+        self.columns = None
+        self.clear_crawled_nodes()
+
+    # Update the cache with the partitions changed since the last refresh
+    # Take 2 parameters in input:
+    #          - The class
+    #          - The nodes whose partitions changed, by default the partitions that are not in the cache yet
+    def refresh(self, node_ids=None):
+        manifest = self.read_manifest()
+        if manifest is None:
+            return self.build()
+        partitions = set(numpy.load(self.get_partitions_path()).tolist())
+        if node_ids is None:
+            node_ids = set(self.get_edge_loader().distinct_node_ids()) - partitions
+        else:
+            node_ids = set(int(node_id) for node_id in node_ids)
+            self.drop_partitions(manifest, node_ids)
+        print("Refresh {0} partitions of the local cache of the network table".format(len(node_ids)))
+        if node_ids:
+            columns = rows_to_columns(self.get_edge_loader().iter_partitions(node_ids))
+            shards = self.write_shards(*columns, first_shard_number=manifest["next_shard"])
+            manifest["shards"] += shards
+            manifest["next_shard"] += len(shards)
+            self.write_partitions(partitions | node_ids)
+        self.write_manifest(manifest)
+        self.columns = None
+        self.clear_crawled_nodes()
+
+    # Remove the rows of the given partitions from the shards
+    def drop_partitions(self, manifest, node_ids):
+        sorted_node_ids = numpy.array(sorted(node_ids), dtype=numpy.int64)
+        for shard in manifest["shards"]:
+            shard_path = os.path.join(self.directory, shard)
+            with numpy.load(shard_path) as columns:
+                columns = {name: columns[name] for name in columns.files}
+            kept = ~isin(columns["node_id"], sorted_node_ids)
+            if not kept.all():
+                numpy.savez(shard_path, **{name: values[kept] for name, values in columns.items()})
+
+    # Return the node_id, friend_follower_id, is_friend and is_follower arrays of all the cached rows
+    def get_columns(self):
+        if self.columns is None:
+            manifest = self.read_manifest()
+            node_ids, friend_follower_ids, flags = [], [], []
+            for shard in manifest["shards"]:
+                with numpy.load(os.path.join(self.directory, shard)) as columns:
+                    node_ids.append(columns["node_id"])
+                    friend_follower_ids.append(columns["friend_follower_id"])
+                    flags.append(columns["flags"])
+            flags = numpy.concatenate(flags) if flags else numpy.zeros(0, dtype=numpy.uint8)
+            self.columns = (numpy.concatenate(node_ids) if node_ids else numpy.zeros(0, dtype=numpy.int64),
+                            numpy.concatenate(friend_follower_ids) if node_ids else numpy.zeros(0, dtype=numpy.int64),
+                            (flags & FRIEND_FLAG) > 0, (flags & FOLLOWER_FLAG) > 0)
+        return self.columns
+
+    # Yield the cached rows where the mask is True (all the rows by default)
+    def iter_rows(self, mask=None):
+        columns = self.get_columns()
+        if mask is not None:
+            columns = [column[mask] for column in columns]
+        for row in zip(*[column.tolist() for column in columns]):
+            yield EdgeRow(*row)
+
+    def iter_partitions(self, node_ids):
+        return self.iter_rows(isin(self.get_columns()[0], get_sorted_ids(node_ids)))
+
+    def iter_restricted_partitions(self, node_ids, friend_follower_ids, chunk_size=None):
+        columns = self.get_columns()
+        return self.iter_rows(isin(columns[0], get_sorted_ids(node_ids)) &
+                              isin(columns[1], get_sorted_ids(friend_follower_ids)))
+
+    # The cached columns are filtered with the sorted array index of get_edge_arrays_in, no row is built
+    def load_edges_in(self, node_ids, kept_nodes):
+        return self.get_edges_in_columns(isin(self.get_columns()[0], get_sorted_ids(node_ids)), kept_nodes)
+
+    def load_table_edges_in(self, kept_nodes):
+        return self.get_edges_in_columns(None, kept_nodes)
+
+    # Return the edges of the cached rows where the mask is True (all the rows if it is None) whose
+    # friend_follower_id is one of the kept nodes
+    def get_edges_in_columns(self, mask, kept_nodes):
+        columns = self.get_columns()
+        if mask is not None:
+            columns = [column[mask] for column in columns]
+        sources, targets = get_edge_arrays_in(*columns, sorted_nodes=get_sorted_ids(kept_nodes))
+        return list(zip(sources.tolist(), targets.tolist()))
+
+    def iter_table(self):
+        return self.iter_rows()
+
+    def distinct_node_ids(self):
+        return numpy.load(self.get_partitions_path()).tolist()
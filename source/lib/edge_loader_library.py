@@ -0,0 +1,171 @@
+import numpy
+from cassandra.concurrent import execute_concurrent_with_args
+
+# Bounds of the Murmur3 partitioner token ring used by Cassandra
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+
+# Split the whole token ring into nb_token_ranges contiguous and inclusive ranges
+def get_token_ranges(nb_token_ranges):
+    step = (MAX_TOKEN - MIN_TOKEN) // nb_token_ranges
+    ranges = []
+    start = MIN_TOKEN
+    for i in range(nb_token_ranges):
+        end = MAX_TOKEN if i == nb_token_ranges - 1 else start + step
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+# Execute a prepared statement for every parameter tuple with concurrency queries in flight and yield all the rows
+# of all the pages
+def execute_concurrently(session, statement, parameters, concurrency):
+    results = execute_concurrent_with_args(session, statement, parameters, concurrency=concurrency,
+                                           results_generator=True)
+    for success, result in results:
+        if not success:
+            raise result
+        for row in result:
+            yield row
+
+
+# Base class of the sources of rows of the network table (Cassandra or the local cache)
+# The subclasses define iter_partitions, iter_restricted_partitions, iter_table and distinct_node_ids
+class EdgeSource:
+    crawled_nodes = None
+
+    # Return the set of the nodes having a partition in the network table.
+    # It is read once with distinct_node_ids and kept by the source, call clear_crawled_nodes to read it again
+    # after partitions were added to the table.
+    def get_crawled_nodes(self):
+        if self.crawled_nodes is None:
+            self.crawled_nodes = set(self.distinct_node_ids())
+        return self.crawled_nodes
+
+    def clear_crawled_nodes(self):
+        self.crawled_nodes = None
+
+    # Return the edges of the partitions of the given nodes whose friend_follower_id is one of the kept nodes (a set)
+    def load_edges_in(self, node_ids, kept_nodes):
+        return get_edges_in(self.iter_partitions(node_ids), kept_nodes)
+
+    # Return the edges of the whole table whose friend_follower_id is one of the kept nodes (a set)
+    def load_table_edges_in(self, kept_nodes):
+        return get_edges_in(self.iter_table(), kept_nodes)
+
+    # Return the edges having one end in nodes_a and the other one in nodes_b.
+    # Only the partitions of the crawled nodes of nodes_a are fully read, the partitions of the crawled nodes
+    # of nodes_b are only read for the rows pointing to nodes_a, so the cost depends on the size of nodes_a.
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The set of the first nodes (usually the new nodes)
+    #          - The set of the second nodes
+    #          - The set of the nodes having a partition in the network table (default to get_crawled_nodes)
+    def load_edges_between(self, nodes_a, nodes_b, crawled_nodes=None):
+        if crawled_nodes is None:
+            crawled_nodes = self.get_crawled_nodes()
+        edges = self.load_edges_in(nodes_a & crawled_nodes, nodes_b)
+        edges += get_edges_in(self.iter_restricted_partitions((nodes_b - nodes_a) & crawled_nodes, nodes_a), nodes_a)
+        return edges
+
+
+# This class is used to read the friend/follower edges stored in the network table in bulk.
+# All the statements are prepared once and executed concurrently, so the builders of the
+# SocialGraph are limited by the bandwidth instead of the latency of one query per node.
+class EdgeLoader(EdgeSource):
+    columns = "node_id, friend_follower_id, is_friend, is_follower"
+
+    # Constructor of the class
+    # Take 5 parameters in input:
+    #          - The cassandra session
+    #          - The network table ("keyspace.table")
+    #          - The number of queries in flight at the same time
+    #          - The number of rows fetched per page
+    #          - The number of token ranges used to split a full table scan
+    def __init__(self, session, network_table, concurrency=64, fetch_size=5000, nb_token_ranges=256):
+        self.session = session
+        self.network_table = network_table
+        self.concurrency = concurrency
+        self.fetch_size = fetch_size
+        self.nb_token_ranges = nb_token_ranges
+        self.partition_statement = self.prepare("SELECT {0} FROM {1} WHERE node_id=?")
+        self.range_statement = self.prepare("SELECT {0} FROM {1} WHERE token(node_id) >= ? AND token(node_id) <= ?")
+        self.restricted_statement = self.prepare(
+            "SELECT {0} FROM {1} WHERE node_id=? AND friend_follower_id IN ?")
+        self.distinct_statement = session.prepare(
+            "SELECT DISTINCT node_id FROM {0} WHERE token(node_id) >= ? AND token(node_id) <= ?"
+            .format(network_table))
+        self.distinct_statement.fetch_size = fetch_size
+
+    def prepare(self, query):
+        statement = self.session.prepare(query.format(self.columns, self.network_table))
+        statement.fetch_size = self.fetch_size
+        return statement
+
+    def token_ranges(self):
+        return get_token_ranges(self.nb_token_ranges)
+
+    def execute(self, statement, parameters):
+        return execute_concurrently(self.session, statement, parameters, self.concurrency)
+
+    # Yield the rows of the partitions of the given nodes
+    def iter_partitions(self, node_ids):
+        return self.execute(self.partition_statement, [(int(node_id),) for node_id in node_ids])
+
+    # Yield the rows of the partitions of the given nodes whose friend_follower_id is one of the given neighbours
+    # The neighbours are sent in chunks of chunk_size ids per query
+    def iter_restricted_partitions(self, node_ids, friend_follower_ids, chunk_size=500):
+        friend_follower_ids = [int(node_id) for node_id in friend_follower_ids]
+        chunks = [friend_follower_ids[i:i + chunk_size] for i in range(0, len(friend_follower_ids), chunk_size)]
+        return self.execute(self.restricted_statement,
+                            [(int(node_id), chunk) for node_id in node_ids for chunk in chunks])
+
+    # Yield every row of the network table with a parallel scan of the token ring
+    def iter_table(self):
+        return self.execute(self.range_statement, self.token_ranges())
+
+    # Return the list of the nodes that own a partition in the network table (the crawled nodes)
+    def distinct_node_ids(self):
+        return [int(row.node_id) for row in self.execute(self.distinct_statement, self.token_ranges())]
+
+
+# Return the directed edges (follower -> followed) described by a row of the network table
+def edges_from_row(row):
+    edges = []
+    if row.is_friend:
+        edges.append((int(row.node_id), int(row.friend_follower_id)))
+    if row.is_follower:
+        edges.append((int(row.friend_follower_id), int(row.node_id)))
+    return edges
+
+
+# Return the edges of the rows whose friend_follower_id is one of the given nodes
+# Take 2 parameters in input:
+#          - The rows of the network table
+#          - The nodes kept, it has to be a set so every row costs one hash lookup
+def get_edges_in(rows, nodes_index):
+    edges = []
+    for row in rows:
+        if row.friend_follower_id in nodes_index:
+            edges += edges_from_row(row)
+    return edges
+
+
+# Columnar version of get_edges_in working on the arrays of the columns of the network table
+# Take 5 parameters in input:
+#          - The node_id column
+#          - The friend_follower_id column
+#          - The is_friend column
+#          - The is_follower column
+#          - The sorted array of the nodes kept
+# Return the arrays of the sources and of the targets of the edges
+def get_edge_arrays_in(node_ids, friend_follower_ids, is_friend, is_follower, sorted_nodes):
+    positions = numpy.searchsorted(sorted_nodes, friend_follower_ids)
+    positions[positions == len(sorted_nodes)] = 0
+    kept = sorted_nodes[positions] == friend_follower_ids if len(sorted_nodes) > 0 else positions < 0
+    friend_rows = kept & is_friend
+    follower_rows = kept & is_follower
+    sources = numpy.concatenate((node_ids[friend_rows], friend_follower_ids[follower_rows]))
+    targets = numpy.concatenate((friend_follower_ids[friend_rows], node_ids[follower_rows]))
+    return sources, targets
@@ -0,0 +1,169 @@
+import multiprocessing
+import os
+import pickle
+import numpy
+from scipy import sparse
+
+from source.lib import diffusion_library
+from source.lib.diffusion_library import get_edge_probabilities
+from source.lib.diffusion_library import get_influence_edges
+from source.lib.diffusion_library import get_model_arrays
+from source.lib.diffusion_library import simulate_batch
+
+
+# Return a shared memory copy of a numpy array with its dtype and its length (the workers read it without receiving
+# a pickled copy)
+def to_shared_array(array):
+    shared_array = multiprocessing.RawArray("b", max(array.nbytes, 1))
+    numpy.frombuffer(shared_array, dtype=array.dtype, count=len(array))[:] = array
+    return shared_array, array.dtype.str, len(array)
+
+
+def from_shared_array(shared_array):
+    buffer, dtype, length = shared_array
+    return numpy.frombuffer(buffer, dtype=dtype, count=length)
+
+
+# Return the arrays of a model (see diffusion_library.get_model_arrays) with every array in shared memory.
+# The model is built once in the main process: the edge arrays of the independent cascades and the data, indices and
+# indptr arrays of the CSR matrix of the linear thresholds are shared, so no worker holds its own copy.
+def share_model_arrays(arrays):
+    shared_arrays = {}
+    for name, value in arrays.items():
+        if sparse.issparse(value):
+            shared_arrays[name] = ("csr", value.shape, to_shared_array(value.data), to_shared_array(value.indices),
+                                   to_shared_array(value.indptr))
+        elif isinstance(value, numpy.ndarray):
+            shared_arrays[name] = ("array", to_shared_array(value))
+        else:
+            shared_arrays[name] = ("value", value)
+    return shared_arrays
+
+
+# Return the arrays of a model read from shared memory (the CSR matrix is built on the shared arrays, not copied)
+def from_shared_model_arrays(shared_arrays):
+    arrays = {}
+    for name, shared_value in shared_arrays.items():
+        if shared_value[0] == "csr":
+            shape, data, indices, indptr = shared_value[1:]
+            arrays[name] = sparse.csr_matrix((from_shared_array(data), from_shared_array(indices),
+                                              from_shared_array(indptr)), shape=shape, copy=False)
+        elif shared_value[0] == "array":
+            arrays[name] = from_shared_array(shared_value[1])
+        else:
+            arrays[name] = shared_value[1]
+    return arrays
+
+
+# Set the diffusion model of the worker from the arrays in shared memory
+def init_worker(shared_arrays):
+    diffusion_library.WORKER_MODEL.update(from_shared_model_arrays(shared_arrays))
+
+
+# Run the simulations of a task in a worker and return the task with the number of activations of every node
+def run_task(task):
+    seed_set_name, task_number, seeds, nb_runs, random_seed = task
+    return seed_set_name, task_number, nb_runs, simulate_batch(seeds, nb_runs, random_seed)
+
+
+# This class runs the Monte-Carlo diffusions of an experiment (several seed sets on one graph) in a pool of processes.
+# The arrays of the model are built once and put in shared memory (see share_model_arrays), the runs are cut in tasks
+# of task_size runs and every task has its own random stream [base_seed, number of the seed set, number of the task],
+# so the result does not depend on the number of processes nor on the order of the tasks.
+# The sums of the activations are checkpointed while the tasks end, a killed experiment restarts from the checkpoint.
+class DiffusionExperiment:
+
+    # Constructor of the class
+    # Take 9 parameters in input:
+    #          - The class
+    #          - The CompactGraph
+    #          - The ResultCache storing the checkpoints and the results
+    #          - The model: "independent_cascade" or "linear_threshold"
+    #          - The probability (or weight) of the edges, "weighted" for 1 / number of accounts followed
+    #          - The number of processes (None for the number of CPU)
+    #          - The number of runs of a task
+    #          - The seed of the experiment
+    #          - The number of finished tasks between two checkpoints
+    def __init__(self, compact_graph, result_cache, model=diffusion_library.INDEPENDENT_CASCADE,
+                 probability="weighted", nb_processes=None, task_size=256, base_seed=0, checkpoint_every=8):
+        self.compact_graph = compact_graph
+        self.result_cache = result_cache
+        self.model = model
+        self.probability = probability
+        self.nb_processes = nb_processes or multiprocessing.cpu_count()
+        self.task_size = task_size
+        self.base_seed = base_seed
+        self.checkpoint_every = checkpoint_every
+        self.graph_hash = compact_graph.content_hash()
+
+    def get_parameters(self, seed_sets, nb_runs):
+        return {"model": self.model, "probability": self.probability, "nb_runs": nb_runs,
+                "task_size": self.task_size, "base_seed": self.base_seed,
+                "seed_sets": {name: sorted(int(seed) for seed in seeds) for name, seeds in seed_sets.items()}}
+
+    def load_checkpoint(self, path, seed_sets):
+        if os.path.exists(path):
+            with open(path, "rb") as checkpoint_file:
+                checkpoint = pickle.load(checkpoint_file)
+            print("Resume the experiment from {0} finished tasks".format(len(checkpoint["done"])))
+            return checkpoint
+        nb_nodes = self.compact_graph.number_of_nodes
+        return {"done": set(), "counts": {name: numpy.zeros(nb_nodes, dtype=numpy.int64) for name in seed_sets},
+                "nb_runs": {name: 0 for name in seed_sets}}
+
+    # Write the checkpoint in a temporary file first, so a job killed while writing keeps the previous one
+    def save_checkpoint(self, path, checkpoint):
+        with open(path + ".tmp", "wb") as checkpoint_file:
+            pickle.dump(checkpoint, checkpoint_file)
+        os.replace(path + ".tmp", path)
+
+    # Return the tasks of the experiment that are not in the checkpoint
+    def get_tasks(self, seed_sets, nb_runs, done):
+        tasks = []
+        for seed_set_number, name in enumerate(sorted(seed_sets)):
+            seeds = self.compact_graph.index_of(list(seed_sets[name]))
+            for task_number, start in enumerate(range(0, nb_runs, self.task_size)):
+                if (name, task_number) not in done:
+                    tasks.append((name, task_number, seeds, min(self.task_size, nb_runs - start),
+                                  [self.base_seed, seed_set_number, task_number]))
+        return tasks
+
+    # Return the dictionary {name of the seed set: activation probability of every node} (aligned with node_ids)
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The dictionary {name of the seed set: seeds of the diffusion}
+    #          - The number of Monte-Carlo runs per seed set
+    def run(self, seed_sets, nb_runs=10000):
+        if nb_runs <= 0:
+            raise ValueError("The number of runs must be positive: {0}".format(nb_runs))
+        parameters = self.get_parameters(seed_sets, nb_runs)
+        result = self.result_cache.load("diffusion_experiment", self.graph_hash, parameters)
+        if result is not None:
+            return result
+        checkpoint_path = self.result_cache.get_path("diffusion_experiment_checkpoint", self.graph_hash, parameters)
+        checkpoint = self.load_checkpoint(checkpoint_path, seed_sets)
+        tasks = self.get_tasks(seed_sets, nb_runs, checkpoint["done"])
+        print("Run {0} tasks of {1} diffusions in {2} processes".format(len(tasks), self.task_size,
+                                                                         self.nb_processes))
+        if tasks:
+            influencers, influenced, nb_followed = get_influence_edges(self.compact_graph)
+            probabilities = get_edge_probabilities(influenced, nb_followed, self.probability)
+            arrays = get_model_arrays(self.model, influencers, influenced, probabilities,
+                                      self.compact_graph.number_of_nodes)
+            pool = multiprocessing.Pool(self.nb_processes, initializer=init_worker,
+                                        initargs=(share_model_arrays(arrays),))
+            try:
+                for nb_done, (name, task_number, task_runs, counts) in enumerate(pool.imap_unordered(run_task, tasks),
+                                                                                 1):
+                    checkpoint["counts"][name] += counts
+                    checkpoint["nb_runs"][name] += task_runs
+                    checkpoint["done"].add((name, task_number))
+                    if nb_done % self.checkpoint_every == 0:
+                        self.save_checkpoint(checkpoint_path, checkpoint)
+            finally:
+                pool.terminate()
+        result = {name: checkpoint["counts"][name] / float(checkpoint["nb_runs"][name]) for name in seed_sets}
+        self.result_cache.save("diffusion_experiment", self.graph_hash, parameters, result)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        return result
@@ -0,0 +1,161 @@
+import glob
+import json
+import os
+import numpy
+
+FEATURE_NAMES = ["nb_exposing_friends", "time_since_first_exposure", "mean_friends_centrality",
+                 "max_friends_centrality", "in_degree", "out_degree"]
+# Features added when the communities of the nodes are given
+COMMUNITY_FEATURE_NAMES = ["nb_exposing_friends_in_community", "community_size", "community_conductance"]
+# File of the names of the features, written next to the chunks (even when there is no chunk)
+FEATURE_NAMES_FILE = "feature_names.json"
+
+
+# Return the names of the features stored in a directory
+def get_feature_names(directory):
+    path = os.path.join(directory, FEATURE_NAMES_FILE)
+    if not os.path.exists(path):
+        return FEATURE_NAMES
+    with open(path) as feature_names_file:
+        return json.load(feature_names_file)
+
+
+# Return the concatenated (user ids, tweet ids, features, labels) of the chunks stored in a directory
+def load_features(directory):
+    user_ids, tweet_ids, features, labels = [], [], [], []
+    for chunk_path in sorted(glob.glob(os.path.join(directory, "features_*.npz"))):
+        with numpy.load(chunk_path) as chunk:
+            user_ids.append(chunk["user_ids"])
+            tweet_ids.append(chunk["tweet_ids"])
+            features.append(chunk["features"])
+            labels.append(chunk["labels"])
+    if not features:
+        return (numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64),
+                numpy.zeros((0, len(get_feature_names(directory)))), numpy.zeros(0, dtype=bool))
+    return numpy.concatenate(user_ids), numpy.concatenate(tweet_ids), numpy.concatenate(features), \
+        numpy.concatenate(labels)
+
+
+# This class builds the exposure features of every (user, tweet) pair where the user follows at least one
+# participant (author or retweeter) of the cascade of the tweet. A participant exposes the user if it took part
+# before the user retweeted (or before the end of the cascade when the user did not retweet).
+# The users are processed by chunks: the friendships of a chunk are joined with the participations of the friends
+# using numpy arrays only, so the memory used only depends on the size of the chunk.
+class ExposureFeatureExtractor:
+
+    # Constructor of the class
+    # Take 6 parameters in input:
+    #          - The class
+    #          - The CascadeIndex of the graph
+    #          - The centrality of every node (array aligned with the node_ids of the graph)
+    #          - The number of users per chunk
+    #          - Optional community of every node (array aligned with the node_ids of the graph)
+    #          - The statistics of the communities (see community_library.get_community_statistics)
+    def __init__(self, cascade_index, centrality, chunk_size=1000, communities=None, community_statistics=None):
+        self.cascade_index = cascade_index
+        self.compact_graph = cascade_index.compact_graph
+        self.centrality = numpy.asarray(centrality, dtype=numpy.float64)
+        self.chunk_size = chunk_size
+        self.communities = communities
+        self.community_statistics = community_statistics
+        self.feature_names = FEATURE_NAMES + (COMMUNITY_FEATURE_NAMES if communities is not None else [])
+        self.in_degree = self.compact_graph.in_degree()
+        self.out_degree = self.compact_graph.out_degree()
+        self.prepare_participations()
+
+    # Build the participations (cascade, node, time) sorted by node and the lookup of the retweets by (node, cascade)
+    def prepare_participations(self):
+        cascade_index = self.cascade_index
+        nb_cascades = cascade_index.number_of_cascades
+        retweet_cascades = numpy.repeat(numpy.arange(nb_cascades, dtype=numpy.int64), numpy.diff(cascade_index.indptr))
+        retweeters = self.compact_graph.index_of(cascade_index.retweeter_ids)
+        authors = self.compact_graph.index_of(cascade_index.author_ids)
+        cascades = numpy.concatenate((numpy.arange(nb_cascades, dtype=numpy.int64), retweet_cascades))
+        nodes = numpy.concatenate((authors, retweeters))
+        times = numpy.concatenate((cascade_index.tweet_times, cascade_index.retweet_times))
+        order = numpy.argsort(nodes, kind="mergesort")
+        self.participation_cascades = cascades[order]
+        self.participation_times = times[order]
+        self.participation_indptr = numpy.concatenate(([0], numpy.cumsum(
+            numpy.bincount(nodes, minlength=self.compact_graph.number_of_nodes))))
+        retweet_keys = retweeters * max(nb_cascades, 1) + retweet_cascades
+        order = numpy.argsort(retweet_keys)
+        # The last key is greater than any (node, cascade) key, so a search always ends on a valid position
+        self.retweet_keys = numpy.append(retweet_keys[order], numpy.iinfo(numpy.int64).max)
+        self.retweet_key_times = numpy.append(cascade_index.retweet_times[order], 0)
+        self.authors = authors
+        # A cascade without retweet ends with its tweet, else with its last retweet (the retweets are ordered by time)
+        last_retweets = cascade_index.indptr[1:] - 1
+        self.end_times = numpy.where(numpy.diff(cascade_index.indptr) > 0,
+                                     cascade_index.retweet_times[numpy.maximum(last_retweets, 0)],
+                                     cascade_index.tweet_times)
+
+    # Return the exposures (user, friend, cascade, time of the participation of the friend) of the users of a chunk
+    def get_exposures(self, users):
+        edge_users, friends = self.compact_graph.out_edges_of(users)
+        nb_participations = self.participation_indptr[friends + 1] - self.participation_indptr[friends]
+        exposure_users = numpy.repeat(edge_users, nb_participations)
+        exposure_friends = numpy.repeat(friends, nb_participations)
+        participations = numpy.repeat(self.participation_indptr[friends], nb_participations) + \
+            numpy.arange(nb_participations.sum()) - numpy.repeat(numpy.cumsum(nb_participations) - nb_participations,
+                                                                 nb_participations)
+        return exposure_users, exposure_friends, self.participation_cascades[participations], \
+            self.participation_times[participations]
+
+    # Return the (user ids, tweet ids, features, labels) of the users of a chunk
+    def get_chunk(self, users):
+        nb_cascades = max(self.cascade_index.number_of_cascades, 1)
+        exposure_users, friends, cascades, times = self.get_exposures(users)
+        keys = exposure_users * nb_cascades + cascades
+        # The time of the retweet of the user in the cascade, or just after the end of the cascade
+        positions = numpy.searchsorted(self.retweet_keys, keys)
+        retweeted = self.retweet_keys[positions] == keys
+        reference_times = numpy.where(retweeted, self.retweet_key_times[positions], self.end_times[cascades] + 1)
+        kept = (times < reference_times) & (self.authors[cascades] != exposure_users)
+        keys, friends, times = keys[kept], friends[kept], times[kept]
+        reference_times, retweeted = reference_times[kept], retweeted[kept]
+
+        order = numpy.argsort(keys, kind="mergesort")
+        keys, friends, times = keys[order], friends[order], times[order]
+        reference_times, retweeted = reference_times[order], retweeted[order]
+        starts = numpy.flatnonzero(numpy.r_[True, numpy.diff(keys) != 0])[:len(keys)]
+        nb_exposing_friends = numpy.diff(numpy.append(starts, len(keys)))
+        pair_users = keys[starts] // nb_cascades
+        features = numpy.zeros((len(starts), len(self.feature_names)))
+        if len(starts):
+            friends_centrality = self.centrality[friends]
+            features[:, 0] = nb_exposing_friends
+            features[:, 1] = reference_times[starts] - numpy.minimum.reduceat(times, starts)
+            features[:, 2] = numpy.add.reduceat(friends_centrality, starts) / nb_exposing_friends
+            features[:, 3] = numpy.maximum.reduceat(friends_centrality, starts)
+            features[:, 4] = self.in_degree[pair_users]
+            features[:, 5] = self.out_degree[pair_users]
+            if self.communities is not None:
+                user_communities = self.communities[pair_users]
+                same_community = self.communities[friends] == numpy.repeat(user_communities, nb_exposing_friends)
+                features[:, 6] = numpy.add.reduceat(same_community.astype(numpy.float64), starts)
+                features[:, 7] = self.community_statistics["size"][user_communities]
+                features[:, 8] = self.community_statistics["conductance"][user_communities]
+        return (self.compact_graph.node_ids[pair_users], self.cascade_index.tweet_ids[keys[starts] % nb_cascades],
+                features, retweeted[starts])
+
+    # Yield the features of the users chunk by chunk
+    def iter_chunks(self):
+        for start in range(0, self.compact_graph.number_of_nodes, self.chunk_size):
+            yield self.get_chunk(numpy.arange(start, min(start + self.chunk_size, self.compact_graph.number_of_nodes),
+                                              dtype=numpy.int64))
+
+    # Write the features of every chunk in the directory and return the number of (user, tweet) pairs
+    def save(self, directory):
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        for chunk_path in glob.glob(os.path.join(directory, "features_*.npz")):
+            os.remove(chunk_path)
+        with open(os.path.join(directory, FEATURE_NAMES_FILE), "w") as feature_names_file:
+            json.dump(self.feature_names, feature_names_file)
+        nb_pairs = 0
+        for chunk_number, (user_ids, tweet_ids, features, labels) in enumerate(self.iter_chunks()):
+            numpy.savez(os.path.join(directory, "features_{0:05d}.npz".format(chunk_number)), user_ids=user_ids,
+                        tweet_ids=tweet_ids, features=features, labels=labels, feature_names=self.feature_names)
+            nb_pairs += len(labels)
+        return nb_pairs
@@ -0,0 +1,142 @@
+import numpy
+
+from source.lib.centrality_library import get_adjacency_matrices
+from source.lib.centrality_library import get_dependencies
+
+
+# This class keeps the degrees, the PageRank and an approximate betweenness of a CompactGraph up to date while
+# batches of edges are added, without computing them again on the whole graph.
+#  - The degrees are incremented with the new edges only.
+#  - The PageRank is the normalized solution of x = 1 + damping * P^T x (it is the PageRank of networkx, the dangling
+#    nodes and the teleportation being uniform). The residual r = 1 + damping * P^T x - x is kept, a new edge only
+#    changes the residual of the successors of its source, and the residual is pushed to the successors of the nodes
+#    where it is above the tolerance, so only the nodes reached by the change are visited. The tolerance is relative
+#    to the average value of x: a residual divided by the degrees at every hop soon falls below it, so the pushes stay
+#    around the new edges, and the L1 error of the normalized PageRank is below tolerance / (1 - damping).
+#  - The betweenness is estimated from a fixed sample of sources whose BFS depths are kept. A new edge (u, v) only
+#    changes the shortest paths of the sources reaching u with depth(v) > depth(u) (or not reaching v), only these
+#    sources are computed again. This condition is exact, on a graph with a small diameter most of the sources
+#    reaching u are affected.
+class IncrementalCentrality:
+
+    # Constructor of the class
+    # Take 7 parameters in input:
+    #          - The class
+    #          - The CompactGraph
+    #          - The damping factor of the PageRank
+    #          - The residual below which a node is not pushed anymore, relative to the average value of x
+    #          - The number of sampled sources of the betweenness
+    #          - The number of sources computed together
+    #          - The seed of the sampling of the sources
+    def __init__(self, compact_graph, damping=0.85, tolerance=1e-6, nb_sources=256, batch_size=64, random_seed=0):
+        self.compact_graph = compact_graph
+        self.damping = damping
+        self.tolerance = tolerance
+        self.batch_size = batch_size
+        nb_nodes = compact_graph.number_of_nodes
+        self.in_degree = compact_graph.in_degree()
+        self.out_degree = compact_graph.out_degree()
+
+        self.pagerank = numpy.zeros(nb_nodes)
+        self.residual = numpy.ones(nb_nodes)
+        self.push()
+
+        random_state = numpy.random.RandomState(random_seed)
+        self.sources = random_state.choice(nb_nodes, min(nb_sources, nb_nodes), replace=False)
+        self.matrices = get_adjacency_matrices(compact_graph.out_indptr, compact_graph.out_indices, nb_nodes)
+        self.dependencies, self.depths = self.compute_sources(self.sources, self.matrices)
+
+    # Push the residuals above the tolerance to the successors until all of them are below it
+    # Return the number of pushes and the number of distinct nodes pushed
+    def push(self):
+        # x + residual only grows with the pushes and starts at 1 per node, so it bounds the average value of x
+        threshold = self.tolerance * (self.pagerank.sum() + self.residual.sum()) / max(len(self.residual), 1)
+        visited = numpy.zeros(len(self.residual), dtype=bool)
+        nb_pushes = 0
+        while True:
+            active = numpy.flatnonzero(numpy.abs(self.residual) > threshold)
+            if len(active) == 0:
+                return nb_pushes, int(visited.sum())
+            nb_pushes += len(active)
+            visited[active] = True
+            values = self.residual[active]
+            self.pagerank[active] += values
+            self.residual[active] = 0
+            self.spread(active, values, self.compact_graph, self.out_degree)
+
+    # Add damping * value / out degree to the residual of the successors of the nodes
+    def spread(self, nodes, values, compact_graph, out_degree):
+        _, targets = compact_graph.out_edges_of(nodes)
+        weights = numpy.repeat(self.damping * values / numpy.maximum(out_degree[nodes], 1), out_degree[nodes])
+        self.residual += numpy.bincount(targets, weights=weights, minlength=len(self.residual))
+
+    # Return the sum of the dependencies of every node over the sources and the depths of the nodes in their BFS
+    def compute_sources(self, sources, matrices):
+        nb_nodes = matrices[0].shape[0]
+        total, depths = numpy.zeros(nb_nodes), [numpy.zeros((nb_nodes, 0), dtype=numpy.int32)]
+        for start in range(0, len(sources), self.batch_size):
+            dependencies, batch_depths = get_dependencies(sources[start:start + self.batch_size], matrices)
+            total += dependencies.sum(axis=1)
+            depths.append(batch_depths)
+        return total, numpy.concatenate(depths, axis=1)
+
+    # Add a batch of edges given as twitter ids, the new nodes are added to the graph
+    # Return a dictionary describing the work done by the update
+    def add_edges(self, sources, targets):
+        old_graph, old_matrices = self.compact_graph, self.matrices
+        graph, added_sources, added_targets, new_indexes = old_graph.add_edges(sources, targets)
+        nb_nodes = graph.number_of_nodes
+
+        # The sources of the new edges give their PageRank with their new out degree instead of the old one
+        changed_nodes = numpy.unique(added_sources)
+        is_old_node = numpy.zeros(nb_nodes, dtype=bool)
+        is_old_node[new_indexes] = True
+        old_changed_nodes = (numpy.cumsum(is_old_node) - 1)[changed_nodes[is_old_node[changed_nodes]]]
+        self.spread(old_changed_nodes, -self.pagerank[old_changed_nodes], old_graph, self.out_degree)
+
+        def remap(values, fill_value):
+            remapped = numpy.full((nb_nodes,) + values.shape[1:], fill_value, dtype=values.dtype)
+            remapped[new_indexes] = values
+            return remapped
+
+        self.compact_graph = graph
+        self.in_degree = remap(self.in_degree, 0) + numpy.bincount(added_targets, minlength=nb_nodes)
+        self.out_degree = remap(self.out_degree, 0) + numpy.bincount(added_sources, minlength=nb_nodes)
+        self.pagerank = remap(self.pagerank, 0.0)
+        # A new node starts with a residual of 1 (its own teleportation)
+        self.residual = remap(self.residual, 1.0)
+        self.spread(changed_nodes, self.pagerank[changed_nodes], graph, self.out_degree)
+        nb_pushes, nb_visited_nodes = self.push()
+
+        old_sources = self.sources
+        self.sources = new_indexes[self.sources]
+        self.dependencies = remap(self.dependencies, 0.0)
+        self.depths = remap(self.depths, -1)
+        source_depths = self.depths[added_sources]
+        target_depths = self.depths[added_targets]
+        affected = numpy.flatnonzero(((source_depths >= 0) &
+                                      ((target_depths < 0) | (target_depths > source_depths))).any(axis=0))
+        self.matrices = get_adjacency_matrices(graph.out_indptr, graph.out_indices, nb_nodes)
+        if len(affected):
+            # The old dependencies of the affected sources are computed on the old graph and replaced
+            old_total, _ = self.compute_sources(old_sources[affected], old_matrices)
+            new_total, self.depths[:, affected] = self.compute_sources(self.sources[affected], self.matrices)
+            self.dependencies += new_total - remap(old_total, 0.0)
+        return {"new_nodes": nb_nodes - len(new_indexes), "new_edges": len(added_sources),
+                "pagerank_pushes": nb_pushes, "pagerank_visited_nodes": nb_visited_nodes,
+                "betweenness_sources": len(affected)}
+
+    # Return the dictionary {twitter id: PageRank}
+    def get_pagerank(self):
+        total = self.pagerank.sum()
+        return dict(zip(self.compact_graph.node_ids.tolist(), (self.pagerank / max(total, 1e-300)).tolist()))
+
+    # Return the dictionary {twitter id: betweenness estimated from the sampled sources}
+    def get_betweenness(self, normalized=True):
+        nb_nodes = self.compact_graph.number_of_nodes
+        if len(self.sources) == 0:
+            return {}
+        scale = float(nb_nodes) / len(self.sources)
+        if normalized and nb_nodes > 2:
+            scale /= (nb_nodes - 1) * (nb_nodes - 2)
+        return dict(zip(self.compact_graph.node_ids.tolist(), (self.dependencies * scale).tolist()))
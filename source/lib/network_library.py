@@ -1,76 +1,114 @@
 import networkx as nx
-from cassandra.cluster import Cluster
-from cassandra.query import SimpleStatement
-from elasticsearch import Elasticsearch
-import random
 import pickle
 import os.path
 import numpy
 import plotly.graph_objs as go
 
 from source.__init__ import DEFINITIONS_ROOT
+from source.lib.cache_library import ResultCache
+from source.lib.cascade_library import CascadeIndex
+from source.lib.centrality_library import BetweennessCentrality
+from source.lib.centrality_library import core_number
+from source.lib.centrality_library import eigenvector_centrality
+from source.lib.centrality_library import hits
+from source.lib.centrality_library import pagerank
+from source.lib.compact_graph_library import CompactGraph
+from source.lib.compact_graph_library import VersionedDiGraph
+from source.lib.compact_graph_library import as_versioned
+from source.lib.compact_graph_library import is_snapshot_up_to_date
+from source.lib.community_library import get_community_statistics
+from source.lib.community_library import label_propagation
+from source.lib.community_library import louvain
+from source.lib.degree_library import DegreeStatistics
+from source.lib.diffusion_library import DiffusionModel
+from source.lib.edge_cache_library import EdgeCache
+from source.lib.edge_cache_library import NETWORK_CACHE_DIRECTORY
+from source.lib.edge_loader_library import EdgeLoader
+from source.lib.edge_loader_library import edges_from_row
+from source.lib.feature_library import ExposureFeatureExtractor
+from source.lib.incremental_library import IncrementalCentrality
+from source.lib.node_attribute_library import NodeAttributeStore
+from source.lib.node_attribute_library import UserTableReader
+from source.lib.sampling_library import StreamingNeighbourSampler
+from source.lib.storage_library import LazyClient
+from source.lib.storage_library import get_elasticsearch
+from source.lib.storage_library import get_session
+from source.lib.traversal_library import NeighbourhoodQuery
+from source.lib.tweet_query_library import TweetQuery
+
+
+# Names of the centralities accepted by SocialGraph.get_nodes_by_centrality
+CENTRALITY_METRICS = ("betweenness", "pagerank", "hits_hubs", "hits_authorities", "eigenvector", "in_core",
+                      "out_core", "total_core")
 
 
 class SocialGraph:
-    cluster = Cluster(['192.168.2.33'], port=9042)
-    session = cluster.connect()
-    es_host = {"host": "192.168.2.33", "port": 9200}
-    es = Elasticsearch([es_host])
+    session = LazyClient(get_session)
+    es = LazyClient(get_elasticsearch)
     seed_data_table = "article.author"
     network_table = "twitter.network"
+    user_table = "twitter.twitter_user"
+    # Directory and maximum size in bytes of the cache of the results computed on the graphs, the results are keyed
+    # by the content hash of the graph so the graphs share the cache and a stale result is never reused
+    result_cache_directory = DEFINITIONS_ROOT+"/data/cache"
+    result_cache_max_size = 10 * 1024 ** 3
+    edge_loader = None
+    edge_cache = None
+    tweet_query = None
+
+    @classmethod
+    def get_cassandra_edge_loader(cls):
+        if cls.edge_loader is None:
+            cls.edge_loader = EdgeLoader(cls.session, cls.network_table)
+        return cls.edge_loader
+
+    @classmethod
+    def get_edge_cache(cls):
+        if cls.edge_cache is None:
+            cls.edge_cache = EdgeCache(NETWORK_CACHE_DIRECTORY, cls.get_cassandra_edge_loader)
+        return cls.edge_cache
 
+    # Return the local cache of the network table when it is fresh, Cassandra otherwise
+    # The builders read their edges from it: with a fresh cache they do not connect to Cassandra, but the partitions
+    # added to the network table since the last refresh of the cache (see network_cache_job.py) are not in the graph
     @classmethod
-    def build_graph_from_nodes(cls, nodes, name):
+    def get_edge_loader(cls):
+        edge_cache = cls.get_edge_cache()
+        if edge_cache.is_fresh():
+            return edge_cache
+        return cls.get_cassandra_edge_loader()
+
+    @classmethod
+    def build_graph_from_nodes(cls, nodes, name, backend="networkx"):
         print("Build graph from a list of nodes")
-        obj = cls(name)
-        for node in nodes:
-            query = "SELECT friend_follower_id, is_friend, is_follower FROM {0} WHERE node_id={1}"\
-                .format(obj.network_table, node)
-            statement = SimpleStatement(query, fetch_size=1000)
-            for friend in obj.session.execute(statement):
-                if friend.friend_follower_id in nodes:
-                    if friend.is_friend:
-                        obj.graph.add_edge(node, friend.friend_follower_id)
-                    if friend.is_follower:
-                        obj.graph.add_edge(friend.friend_follower_id, node)
-        obj.modified_graph = obj.graph
+        obj = cls(name, backend=backend)
+        nodes_index = set(int(node) for node in nodes)
+        obj.load_edges(obj.get_edge_loader().load_edges_in(nodes_index, nodes_index))
         obj.diffusers = obj.get_followed_nodes()
         return obj
 
     @classmethod
-    def build_graph_from_seed(cls, name):
+    def build_graph_from_seed(cls, name, backend="networkx"):
         print("Building graph from seed")
-        obj = cls(name=name)
-        if len(obj.graph.nodes()) > 0:
+        obj = cls(name=name, backend=backend)
+        if obj.number_of_nodes() > 0:
             return obj
         else:
             query = "SELECT twitter_id FROM {0};"
             seeds = obj.session.execute(query.format(obj.seed_data_table))
             for seed in seeds:
                 obj.seeds.append(int(seed.twitter_id))
-                query = "SELECT friend_follower_id, is_friend, is_follower FROM {0} WHERE node_id={1}"
-                statement = SimpleStatement(query.format(obj.network_table, seed.twitter_id), fetch_size=1000)
-                friend_ids = []
-                follower_ids = []
-                for row in obj.session.execute(statement):
-                    if row.is_friend:
-                        friend_ids.append(row.friend_follower_id)
-                    if row.is_follower:
-                        follower_ids.append(row.friend_follower_id)
-                if friend_ids:
-                    for friend_id in friend_ids:
-                        obj.graph.add_edge(int(seed.twitter_id), int(friend_id))
-                if follower_ids:
-                    for follower_id in follower_ids:
-                        obj.graph.add_edge(int(follower_id), int(seed.twitter_id))
-            obj.modified_graph = obj.graph
+            edges = []
+            for row in obj.get_edge_loader().iter_partitions(obj.seeds):
+                edges += edges_from_row(row)
+            obj.load_edges(edges)
             obj.diffusers = obj.get_followed_nodes()
             return obj
 
     @classmethod
-    def build_seed_graph(cls, name):
-        obj = cls(name=name)
-        if len(obj.graph.nodes()) > 0:
+    def build_seed_graph(cls, name, backend="networkx"):
+        obj = cls(name=name, backend=backend)
+        if obj.number_of_nodes() > 0:
             return obj
         else:
             print("Build the graph from the seed present in the table {}".format(obj.seed_data_table))
@@ -78,102 +116,207 @@ class SocialGraph:
             seeds = obj.session.execute(query.format(obj.seed_data_table))
             for seed in seeds:
                 obj.seeds.append(int(seed.twitter_id))
-            obj.graph.add_nodes_from(obj.seeds)
-            for seed in obj.seeds:
-                query = "SELECT friend_follower_id, is_friend, is_follower FROM {0} WHERE node_id={1}"
-                statement = SimpleStatement(query.format(obj.network_table, seed), fetch_size=1000)
-                for row in obj.session.execute(statement):
-                    if row.friend_follower_id in obj.seeds:
-                        if row.is_friend:
-                            obj.graph.add_edge(seed, row.friend_follower_id)
-                        if row.is_follower:
-                            obj.graph.add_edge(row.friend_follower_id, seed)
-            obj.modified_graph = obj.graph
+            seeds_index = set(obj.seeds)
+            edges = obj.get_edge_loader().load_edges_in(seeds_index, seeds_index)
+            obj.load_edges(edges, nodes=obj.seeds)
             obj.diffusers = obj.get_followed_nodes()
             return obj
 
     @classmethod
-    def build_extended_seed_graph(cls, name):
-        obj = cls(name=name)
-        if len(obj.graph.nodes()) > 0:
+    def build_extended_seed_graph(cls, name, backend="networkx"):
+        obj = cls(name=name, backend=backend)
+        if obj.number_of_nodes() > 0:
             return obj
         else:
             print("Build the graph from the extended seed present in the table {}".format(obj.network_table))
-            query = "SELECT DISTINCT node_id FROM {0};"
-            seeds = obj.session.execute(query.format(obj.network_table))
-            for seed in seeds:
-                obj.seeds.append(int(seed.node_id))
-            obj.graph.add_nodes_from(obj.seeds)
-            for seed in obj.seeds:
-                query = "SELECT friend_follower_id, is_friend, is_follower FROM {0} WHERE node_id={1}"
-                statement = SimpleStatement(query.format(obj.network_table, seed), fetch_size=1000)
-                for row in obj.session.execute(statement):
-                    if row.friend_follower_id in obj.seeds:
-                        if row.is_friend:
-                            obj.graph.add_edge(seed, row.friend_follower_id)
-                        if row.is_follower:
-                            obj.graph.add_edge(row.friend_follower_id, seed)
-            obj.modified_graph = obj.graph
+            edge_loader = obj.get_edge_loader()
+            obj.seeds = edge_loader.distinct_node_ids()
+            # Every partition belongs to a seed so one scan of the table gives all the edges
+            edges = edge_loader.load_table_edges_in(set(obj.seeds))
+            obj.load_edges(edges, nodes=obj.seeds)
             obj.diffusers = obj.get_followed_nodes()
             return obj
 
+    # Build a graph made of the extended seed and of a uniform sample of their neighbours
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The name of the graph
+    #          - The number of nodes of the graph (seeds included)
+    #          - The backend of the graph
+    #          - The seed of the sampling, the same seed and the same table give the same graph
     @classmethod
-    def build_graph_from_extended_seed_with_random_neighboors(cls, name, graph_size=2000):
-        obj = cls(name=name)
-        if len(obj.graph.nodes()) > 0:
+    def build_graph_from_extended_seed_with_random_neighboors(cls, name, graph_size=2000, backend="networkx",
+                                                              random_seed=0):
+        obj = cls(name=name, backend=backend)
+        if obj.number_of_nodes() > 0:
             return obj
         else:
             print("Build the graph from extended seed with {0} random neighboors".format(graph_size))
-            statement = SimpleStatement("SELECT DISTINCT node_id FROM {0}".format(obj.network_table))
-            for node in obj.session.execute(statement):
-                obj.seeds.append(node.node_id)
-            obj.graph.add_nodes_from(obj.seeds)
-            nodes_dictionnary = {}
-            all_nodes = set()
-            for seed in obj.seeds:
-                query = "SELECT friend_follower_id, is_follower, is_friend FROM {0} WHERE node_id={1}"\
-                    .format(obj.network_table, seed)
-                statement = SimpleStatement(query, fetch_size=10000)
-                friends, followers = [], []
-                for row in obj.session.execute(statement):
-                    if row.is_follower:
-                        followers.append(row.friend_follower_id)
-                    if row.is_friend:
-                        friends.append(row.friend_follower_id)
-                nodes_dictionnary[seed] = {}
-                nodes_dictionnary[seed]["friends"] = friends
-                nodes_dictionnary[seed]["followers"] = followers
-                all_nodes.update(set(friends + followers))
-            percentage_of_the_graph = float(100.0 * graph_size / len(all_nodes))
-            print("The random graph will have {0}% of the initial graph ({1} nodes)"
-                  .format(percentage_of_the_graph, len(all_nodes)))
-            probability_node = percentage_of_the_graph/200
-            print(probability_node)
-            for seed, neighboors in nodes_dictionnary.items():
-                if "friends" in neighboors:
-                    seed_links = [seed for seed in obj.seeds if seed in neighboors["friends"]]
-                    filter(lambda x: random.random() < probability_node, neighboors["friends"])
-                    random_friends = [x for x in neighboors["friends"] if random.random() < probability_node]
-                    random_friends += seed_links
-                    for friend in random_friends:
-                        obj.graph.add_edge(seed, friend)
-                if "followers" in neighboors:
-                    seed_links = [seed for seed in obj.seeds if seed in neighboors["followers"]]
-                    filter(lambda x: random.random() < probability_node, neighboors["followers"])
-                    random_followers = [x for x in neighboors["followers"] if random.random() < probability_node]
-                    random_followers += seed_links
-                    for followers in random_followers:
-                        obj.graph.add_edge(followers, seed)
-            print("Final number of nodes is: {0}, with {1} edges".format(len(obj.graph.nodes()),
-                                                                         len(obj.graph.edges())))
-            obj.modified_graph = obj.graph
+            edge_loader = obj.get_edge_loader()
+            obj.seeds = edge_loader.distinct_node_ids()
+            sampler = StreamingNeighbourSampler(obj.seeds, max(graph_size - len(obj.seeds), 0),
+                                                random_seed=random_seed)
+            sampler.add_rows(edge_loader.iter_table())
+            print("{0} neighboors sampled from {1} rows".format(len(sampler.get_sampled_nodes()), sampler.nb_rows))
+            obj.load_edges(sampler.get_edges(), nodes=obj.seeds)
+            print("Final number of nodes is: {0}, with {1} edges".format(obj.number_of_nodes(),
+                                                                         obj.number_of_edges()))
             obj.diffusers = obj.get_followed_nodes()
             return obj
 
+    # Build the union of existing graphs, with all the edges of the network table between its nodes (the edges
+    # build_graph_from_nodes would find).
+    # The edge list of a graph can only be reused when the graph is induced (it has all the edges of the table between
+    # its nodes, like the graphs built by build_graph_from_nodes, merge or extend): then only the edges between nodes
+    # coming from different graphs are read, so the cost is proportional to the nodes added by every graph.
+    # The sampled graphs (build_graph_from_extended_seed_with_random_neighboors) are not induced, so by default all
+    # the edges between the nodes of the union are read.
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The list of the graphs to merge (SocialGraph or name of a saved graph)
+    #          - The name of the new graph
+    #          - The backend of the new graph
+    #          - True if all the graphs are induced
+    @classmethod
+    def merge(cls, graphs, name, backend="networkx", induced=False):
+        obj = cls(name=name, backend=backend)
+        if obj.number_of_nodes() > 0:
+            return obj
+        graphs = [graph if isinstance(graph, SocialGraph) else cls(graph) for graph in graphs]
+        graphs = sorted(graphs, key=lambda graph: graph.number_of_nodes(), reverse=True)
+        print("Merge the graphs {0} into {1}".format([graph.name for graph in graphs], name))
+        edge_loader = obj.get_edge_loader()
+        covered_nodes = set()
+        for graph in graphs:
+            graph_nodes = set(graph.compact_graph.node_ids.tolist())
+            new_nodes = graph_nodes - covered_nodes
+            if induced:
+                edges = graph.compact_graph.get_edge_list()
+                if covered_nodes and new_nodes:
+                    edges += edge_loader.load_edges_between(new_nodes, covered_nodes - graph_nodes)
+                obj.load_edges(edges, nodes=new_nodes)
+            obj.seeds = list(set(obj.seeds).union(graph.seeds))
+            covered_nodes |= graph_nodes
+        if not induced:
+            obj.load_edges(edge_loader.load_edges_in(covered_nodes, covered_nodes), nodes=covered_nodes)
+        print("Final number of nodes is: {0}, with {1} edges".format(obj.number_of_nodes(), obj.number_of_edges()))
+        obj.diffusers = obj.get_followed_nodes()
+        return obj
+
+    # Add nodes to the graph with their edges to the nodes already present and to the other new nodes
+    # Only the partitions of the new nodes are fully read, so the cost is proportional to the number of new nodes
+    # (the set of the crawled nodes is read once per edge source, see EdgeSource.get_crawled_nodes)
+    def extend(self, nodes):
+        existing_nodes = set(self.compact_graph.node_ids.tolist())
+        new_nodes = set(int(node) for node in nodes) - existing_nodes
+        if not new_nodes:
+            return
+        print("Extend the graph {0} with {1} nodes".format(self.name, len(new_nodes)))
+        edges = self.get_edge_loader().load_edges_between(new_nodes, existing_nodes | new_nodes)
+        self.load_edges(edges, nodes=new_nodes)
+        self.diffusers = self.get_followed_nodes()
+
+    @property
+    def graph(self):
+        if self._graph is None:
+            self._graph = as_versioned(self._compact_graph.to_networkx())
+            self._compact_graph_version = self.get_networkx_version()
+        return self._graph
+
+    @graph.setter
+    def graph(self, graph):
+        self._graph = as_versioned(graph)
+        self._compact_graph = None
+
+    # The modified graph is the original graph until a different graph is assigned to it
+    @property
+    def modified_graph(self):
+        if self._modified_graph is None:
+            return self.graph
+        return self._modified_graph
+
+    @modified_graph.setter
+    def modified_graph(self, graph):
+        if graph is self._graph:
+            self._modified_graph = None
+        else:
+            self._modified_graph = graph
+
+    # Return the array based version of the graph, rebuilt if the networkx graph changed since the last call
+    @property
+    def compact_graph(self):
+        if self._compact_graph is None or self._compact_graph_version != self.get_networkx_version():
+            self._compact_graph = CompactGraph.from_networkx(self._graph)
+            self._compact_graph_version = self.get_networkx_version()
+        return self._compact_graph
+
+    @compact_graph.setter
+    def compact_graph(self, compact_graph):
+        self._compact_graph = compact_graph
+        self._compact_graph_version = None
+        self._graph = None
+
+    # Return what identifies the state of the networkx graph: every change of a VersionedDiGraph increments its
+    # version, the sizes are only a fallback for the other classes of graphs
+    def get_networkx_version(self):
+        if self._graph is None:
+            return None
+        return getattr(self._graph, "version", None), len(self._graph), self._graph.number_of_edges()
+
+    def number_of_nodes(self):
+        if self._graph is None:
+            return self._compact_graph.number_of_nodes
+        return len(self._graph)
+
+    def number_of_edges(self):
+        if self._graph is None:
+            return self._compact_graph.number_of_edges
+        return self._graph.number_of_edges()
+
+    # Add a list of (follower, followed) edges and some isolated nodes in the store chosen by the backend
+    def load_edges(self, edges, nodes=()):
+        if self.backend == "compact":
+            compact_graph = self.compact_graph
+            sources, targets = compact_graph.edges()
+            new_edges = numpy.array(edges, dtype=numpy.int64).reshape((-1, 2))
+            self.compact_graph = CompactGraph.from_edges(
+                numpy.concatenate((compact_graph.node_ids[sources], new_edges[:, 0])),
+                numpy.concatenate((compact_graph.node_ids[targets], new_edges[:, 1])),
+                nodes=numpy.concatenate((compact_graph.node_ids, numpy.array(list(nodes), dtype=numpy.int64))))
+        else:
+            self.graph.add_nodes_from(nodes)
+            self.graph.add_edges_from(edges)
+
+    # Remove from the modified graph the nodes having only one friend and nb_out_edge followers.
+    # The nodes are checked one after the other in the order of the graph and every removal updates the degrees of
+    # its neighbours, so a chain of leaves is removed from its end. Only the degrees are updated in arrays, the nodes
+    # are removed at the end. The original graph is kept, the modified graph becomes a copy on the first change.
     def remove_useless_leaves(self, nb_out_edge=0):
-        for node in self.modified_graph.nodes():
-            if self.modified_graph.out_degree(node) == 1 and self.modified_graph.in_degree(node) == nb_out_edge:
-                self.modified_graph.remove_node(node)
+        if self._modified_graph is not None:
+            compact_graph = CompactGraph.from_networkx(self._modified_graph)
+            order = compact_graph.index_of(list(self._modified_graph.nodes()))
+        else:
+            compact_graph = self.compact_graph
+            if self._graph is None:
+                order = numpy.arange(compact_graph.number_of_nodes)
+            else:
+                order = compact_graph.index_of(list(self._graph.nodes()))
+        out_degrees, in_degrees = compact_graph.out_degree().tolist(), compact_graph.in_degree().tolist()
+        out_indptr, out_indices = compact_graph.out_indptr, compact_graph.out_indices
+        in_indptr, in_indices = compact_graph.in_indptr, compact_graph.in_indices
+        leaves = []
+        for node in order.tolist():
+            if out_degrees[node] == 1 and in_degrees[node] == nb_out_edge:
+                leaves.append(node)
+                for friend in out_indices[out_indptr[node]:out_indptr[node + 1]].tolist():
+                    in_degrees[friend] -= 1
+                for follower in in_indices[in_indptr[node]:in_indptr[node + 1]].tolist():
+                    out_degrees[follower] -= 1
+        if not leaves:
+            return
+        if self._modified_graph is None:
+            self.modified_graph = self.graph.copy()
+        self._modified_graph.remove_nodes_from(compact_graph.node_ids[leaves].tolist())
 
     def export_gml(self, path=None, g='modified'):
         graph_to_save = nx.DiGraph()
@@ -189,64 +332,161 @@ class SocialGraph:
             nx.write_gml(graph_to_save, DEFINITIONS_ROOT+"/data/graph/{0}/{1}.gml".format(self.name, self.name),
                          stringizer=str)
 
+    # Save the graph in the binary snapshot format, it is the format loaded first by the constructor
+    # The constructor never writes it: a GML graph is converted by graph_snapshot_job.py
+    def export_snapshot(self, path=None, g='modified'):
+        if g == 'modified' and self._modified_graph is not None:
+            compact_graph = CompactGraph.from_networkx(self._modified_graph)
+        else:
+            compact_graph = self.compact_graph
+        if path:
+            path = DEFINITIONS_ROOT+path
+        else:
+            path = self.get_snapshot_path(self.name)
+        print("Save graph snapshot to location: {}".format(path))
+        attributes = None
+        if self._node_attributes is not None:
+            attributes = self._node_attributes.aligned_to(compact_graph.node_ids).to_snapshot_attributes()
+        compact_graph.save_snapshot(path, seeds=self.seeds, attributes=attributes)
+
+    # Return the NodeAttributeStore of the nodes of the graph (screen_name, lang, nb_followers, nb_friends, nb_tweets)
+    # The attributes are read with one scan of the user table and one aggregation per chunk of users in
+    # Elasticsearch, then saved in their own file next to the graph (the snapshot of the graph is not rewritten), so
+    # the next loads read them from the disk as long as the file covers all the nodes of the graph
+    def get_node_attributes(self, refresh=False):
+        compact_graph = self.compact_graph
+        attributes_path = self.get_attributes_path(self.name)
+        if self._node_attributes is None and not refresh and os.path.exists(attributes_path):
+            node_attributes = NodeAttributeStore.load(attributes_path)
+            if node_attributes.contains_all(compact_graph.node_ids):
+                print("Load the attributes of the nodes from {0}".format(attributes_path))
+                self._node_attributes = node_attributes
+        elif self._node_attributes is not None and not self._node_attributes.contains_all(compact_graph.node_ids):
+            refresh = True
+        if self._node_attributes is None or refresh:
+            print("Load the attributes of the nodes from {0}".format(self.user_table))
+            node_attributes = NodeAttributeStore(compact_graph.node_ids)
+            nb_users = node_attributes.load_rows(UserTableReader(self.session, self.user_table).iter_table())
+            node_attributes.load_tweet_counts(self.get_tweet_query().count_tweets(compact_graph.node_ids.tolist()))
+            print("Found the attributes of {0} nodes out of {1}".format(nb_users, compact_graph.number_of_nodes))
+            self._node_attributes = node_attributes
+            if os.path.exists(os.path.dirname(attributes_path)):
+                node_attributes.save(attributes_path)
+        self._node_attributes = self._node_attributes.aligned_to(compact_graph.node_ids)
+        return self._node_attributes
+
     # Get the list of all the user follow by at least one person in the graph
     def get_followed_nodes(self):
-        followed_nodes = []
-        for node in self.graph.nodes():
-            if self.graph.in_degree(node) > 0:
-                followed_nodes.append(node)
+        compact_graph = self.compact_graph
+        followed_nodes = compact_graph.node_ids[compact_graph.in_degree() > 0].tolist()
         print("We found {} user that have at least one follower in the graph".format(len(followed_nodes)))
         return followed_nodes
 
+    @classmethod
+    def get_tweet_query(cls):
+        if cls.tweet_query is None:
+            cls.tweet_query = TweetQuery(cls.es)
+        return cls.tweet_query
+
     # Search tweets written by the input user in Elasticsearch
     def retrieve_tweet_of_a_user(self, node):
-        request = {
-            "query": {
-                "bool": {
-                    "must_not": {
-                        "exists": {
-                            "field": "retweeted_status"
-                        }
-                    },
-                    "must": {
-                        "match": {
-                            "user.id": node
-                        }
-                    }
-                }
-            }
-        }
-        es_response = self.es.search(doc_type="tweet", index="tweets", body=request, size=3200)
-        if es_response["hits"]["total"] != 0:
-            tweets = es_response["hits"]["hits"]
+        tweets = self.get_tweet_query().get_original_tweets([node]).get(node, [])
+        if tweets:
             print("Found {0} tweets for the user: {1}".format(len(tweets), node))
-            return tweets
-        else:
-            return []
+        return tweets
 
     def retrieve_retweet_from_the_friends_of_a_user(self, node):
-        all_retweet = []
-        for friend in self.modified_graph.successors(node):
-            request = {
-                "query": {
-                    "bool": {
-                        "must": [{"match": {"user.id": node}},
-                                 {"exists": {"field": "retweeted_status"}},
-                                 {"match": {"retweeted_status.user.id": friend}},
-                                 {"exists": {"field": "retweeted_status.text"}},
-                                 {"wildcard": {"retweeted_status.entities.urls.display_url": "*amren*"}}
-                                 ]
-                    }
-                }
-            }
-            es_response = self.es.search(doc_type="tweet", index="tweets", body=request, size=3200)
-            if es_response["hits"]["total"] != 0:
-                friend_retweet = es_response["hits"]["hits"]
-                all_retweet += friend_retweet
+        friendships = {node: set(self.modified_graph.successors(node))}
+        all_retweet = self.get_tweet_query().get_retweets_from_friends(friendships).get(node, [])
         if all_retweet:
             print("The user: {0} retweet: {1} tweet(s) from his friends".format(node, len(all_retweet)))
         return all_retweet
 
+    # Return the NeighbourhoodQuery of the compact graph, created again if the graph changed
+    def get_neighbourhood_query(self):
+        compact_graph = self.compact_graph
+        if self._neighbourhood_query is None or self._neighbourhood_query.compact_graph is not compact_graph:
+            self._neighbourhood_query = NeighbourhoodQuery(compact_graph)
+        return self._neighbourhood_query
+
+    # Return the dictionary {node: array of the nodes at most k hops away} computed for all the nodes at once
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The nodes
+    #          - The maximum number of hops (None for all the reachable nodes)
+    #          - The direction: "out" (friends), "in" (followers) or "both"
+    def get_k_hop_neighbourhoods(self, nodes, k=1, direction="out"):
+        nodes = list(nodes)
+        neighbourhoods = self.get_neighbourhood_query().get_k_hop(nodes, k, direction)
+        node_ids = self.compact_graph.node_ids
+        return {node: node_ids[neighbourhoods.indices[neighbourhoods.indptr[i]:neighbourhoods.indptr[i + 1]]]
+                for i, node in enumerate(nodes)}
+
+    # Return the dictionary {node: array of the nodes reachable from it}
+    def get_reachable_nodes(self, nodes, direction="out"):
+        return self.get_k_hop_neighbourhoods(nodes, None, direction)
+
+    # Return the (nb_sources x nb_nodes) array of the number of hops from every source to every node of the graph,
+    # the columns being aligned with the node_ids of the compact graph (-1 for the nodes that can not be reached)
+    def get_hop_distances(self, sources, direction="out", max_hops=None):
+        return self.get_neighbourhood_query().get_hop_distances(sources, direction, max_hops)
+
+    # Return the dictionary {node: number of users at most k hops away among its followers}, the audience that a
+    # tweet of the node can reach in k retweets
+    def get_audience_sizes(self, k=1):
+        sizes = self.get_neighbourhood_query().get_neighbourhood_sizes(k, "in")
+        return dict(zip(self.compact_graph.node_ids.tolist(), sizes.tolist()))
+
+    # Return the index of the retweet cascades between the nodes of the graph
+    # It is built with one scroll over the tweets index and stored in the result cache under the hash of the graph,
+    # it is built again when the graph changed or when rebuild is True
+    def get_cascade_index(self, rebuild=False):
+        compact_graph = self.compact_graph
+        result_cache = self.get_result_cache()
+        path = None if rebuild else result_cache.load_file("cascade_index", self.content_hash(), {}, ".npz")
+        cascade_index = None if path is None else CascadeIndex.load(path, compact_graph)
+        if cascade_index is None:
+            print("Build the retweet cascades of the graph {0}".format(self.name))
+            cascade_index = CascadeIndex.build(compact_graph, self.get_tweet_query().iter_retweets())
+            result_cache.save_file("cascade_index", self.content_hash(), {}, ".npz", cascade_index.save)
+        print("{0} retweet cascades in the graph {1}".format(cascade_index.number_of_cascades, self.name))
+        return cascade_index
+
+    # Build the exposure features of the (user, tweet) pairs of the retweet cascades of the graph, they are stored in
+    # the result cache and built again only for another version of the graph, other parameters or when rebuild is True
+    # Return the directory where the chunks of features are stored (read them with feature_library.load_features)
+    # Take 6 parameters in input:
+    #          - The class
+    #          - The number of sampled sources of the betweenness centrality (None for the exact centrality)
+    #          - The number of users per chunk
+    #          - The number of processes computing the centrality
+    #          - The community detection method adding the community features (None for no community feature)
+    #          - If the features are built again even if they are in the cache
+    def build_exposure_features(self, nb_node=None, chunk_size=1000, nb_processes=None, community_method=None,
+                                rebuild=False):
+        result_cache = self.get_result_cache()
+        parameters = {"k": nb_node, "chunk_size": chunk_size, "community_method": community_method}
+        directory = None if rebuild else result_cache.load_directory("exposure_features", self.content_hash(),
+                                                                     parameters)
+        if directory is not None:
+            return directory
+        betweenness_centrality = self.get_nodes_by_betweenness_centrality(nb_node, nb_processes=nb_processes)
+        centrality = numpy.array([betweenness_centrality.get(node, 0.0)
+                                  for node in self.compact_graph.node_ids.tolist()])
+        communities, community_statistics = None, None
+        if community_method is not None:
+            communities, community_statistics = self.get_community_statistics(community_method)
+        extractor = ExposureFeatureExtractor(self.get_cascade_index(), centrality, chunk_size=chunk_size,
+                                             communities=communities, community_statistics=community_statistics)
+
+        def write_features(features_directory):
+            nb_pairs = extractor.save(features_directory)
+            print("Saved the features of {0} (user, tweet) pairs".format(nb_pairs))
+
+        directory = result_cache.save_directory("exposure_features", self.content_hash(), parameters, write_features)
+        print("Features of the graph {0} stored in {1}".format(self.name, directory))
+        return directory
+
     @staticmethod
     def pickle_loader(file_path):
         if not os.path.exists(file_path):
@@ -257,8 +497,33 @@ class SocialGraph:
             return pickle.load(open(file_path, "rb"))
 
     @staticmethod
-    def get_graph_from_gml(name):
-        directory_path = DEFINITIONS_ROOT+"/data/graph/{0}/{1}.gml".format(name, name)
+    def get_gml_path(name):
+        return DEFINITIONS_ROOT+"/data/graph/{0}/{1}.gml".format(name, name)
+
+    @staticmethod
+    def get_snapshot_path(name):
+        return DEFINITIONS_ROOT+"/data/graph/{0}/{1}.npz".format(name, name)
+
+    @staticmethod
+    def get_attributes_path(name):
+        return DEFINITIONS_ROOT+"/data/graph/{0}/{1}_attributes.npz".format(name, name)
+
+    @classmethod
+    def get_graph_from_snapshot(cls, name):
+        snapshot_path = cls.get_snapshot_path(name)
+        if is_snapshot_up_to_date(snapshot_path, cls.get_gml_path(name)):
+            print("Load graph from snapshot: {0}".format(snapshot_path))
+            compact_graph, seeds, attributes = CompactGraph.load_snapshot(snapshot_path)
+            print("The graph got {0} nodes and {1} edges".format(compact_graph.number_of_nodes,
+                                                                 compact_graph.number_of_edges))
+            return compact_graph, seeds, NodeAttributeStore.from_snapshot_attributes(compact_graph.node_ids,
+                                                                                     attributes)
+        else:
+            return False
+
+    @classmethod
+    def get_graph_from_gml(cls, name):
+        directory_path = cls.get_gml_path(name)
         if os.path.exists(directory_path):
             print("Load graph from file: {0}".format(directory_path))
             loaded_graph = nx.read_gml(directory_path)
@@ -269,40 +534,182 @@ class SocialGraph:
 
     # Return the average of followers in the graph
     def get_average_number_of_followers(self):
-        return numpy.mean([self.graph.in_degree(node) for node in self.graph.nodes()])
+        return self.get_degree_statistics().mean("in")
 
     # Return the average number of friends in the graph
     def get_average_number_of_friends(self):
-        return numpy.mean([self.graph.out_degree(node) for node in self.graph.nodes()])
-
-    def get_nodes_by_betweenness_centrality(self, nb_node, normalized=True):
-        print("Trying to load the betweenness centrality from file...")
-        file_path = DEFINITIONS_ROOT+"/data/graph/{0}/{1}_betweenness_centrality.p".format(self.name, str(nb_node))
-        betweenness_centrality = self.pickle_loader(file_path)
-        if not betweenness_centrality:
-            print("Failed to load an existent betweenness centrality")
-            print("Computing the betweenness centrality")
-            betweenness_centrality = nx.algorithms.betweenness_centrality(
-                self.graph, k=nb_node, normalized=normalized)
-            pickle.dump(betweenness_centrality, open(file_path, "wb"))
-        else:
-            print("Load betweenness centrality from file")
-        return betweenness_centrality
+        return self.get_degree_statistics().mean("out")
+
+    # Return the degree statistics of the graph, computed again only when the graph changed
+    # They are not stored in the result cache: the degrees are two differences of the indptr arrays, cheaper than
+    # hashing the graph and reading a file
+    def get_degree_statistics(self):
+        compact_graph = self.compact_graph
+        if self._degree_statistics is None or self._degree_statistics.compact_graph is not compact_graph:
+            self._degree_statistics = DegreeStatistics(compact_graph)
+        return self._degree_statistics
+
+    # Return the cached dictionary {node: value} of a value computed for every node (centrality, community),
+    # compute_values returns the array of the values aligned with the node_ids of the compact graph
+    def get_cached_node_values(self, name, parameters, compute_values):
+        def compute():
+            values = compute_values(self.compact_graph)
+            return dict(zip(self.compact_graph.node_ids.tolist(), values.tolist()))
+
+        return self.get_result_cache().get_or_compute(name, self.content_hash(), parameters, compute)
+
+    def get_nodes_by_pagerank(self, damping=0.85):
+        return self.get_cached_node_values("pagerank", {"damping": damping},
+                                          lambda compact_graph: pagerank(compact_graph, damping=damping))
+
+    # Return the dictionary {node: hub score} (the node follows good authorities)
+    def get_nodes_by_hub_score(self):
+        return self.get_cached_node_values("hits_hubs", {}, lambda compact_graph: hits(compact_graph)[0])
+
+    # Return the dictionary {node: authority score} (the node is followed by good hubs)
+    def get_nodes_by_authority_score(self):
+        return self.get_cached_node_values("hits_authorities", {}, lambda compact_graph: hits(compact_graph)[1])
+
+    def get_nodes_by_eigenvector_centrality(self):
+        return self.get_cached_node_values("eigenvector_centrality", {}, eigenvector_centrality)
+
+    # Return the dictionary {node: core number} for the "in", "out" or "total" degree
+    def get_nodes_by_core_number(self, direction="total"):
+        return self.get_cached_node_values("core_number", {"direction": direction},
+                                          lambda compact_graph: core_number(compact_graph, direction))
+
+    # Return the dictionary {node: value} of the centrality chosen by its name (see CENTRALITY_METRICS)
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The name of the metric
+    #          - The number of sampled sources of the betweenness (None for the exact betweenness)
+    def get_nodes_by_centrality(self, metric, nb_node=None):
+        if metric == "betweenness":
+            return self.get_nodes_by_betweenness_centrality(nb_node)
+        if metric == "pagerank":
+            return self.get_nodes_by_pagerank()
+        if metric == "hits_hubs":
+            return self.get_nodes_by_hub_score()
+        if metric == "hits_authorities":
+            return self.get_nodes_by_authority_score()
+        if metric == "eigenvector":
+            return self.get_nodes_by_eigenvector_centrality()
+        if metric in ("in_core", "out_core", "total_core"):
+            return self.get_nodes_by_core_number(metric[:-len("_core")])
+        raise ValueError("Unknown centrality metric: {0}".format(metric))
+
+    # Return the dictionary {node: community} found by "louvain" or "label_propagation", cached per graph version
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The method
+    #          - The resolution of the modularity (louvain only, above 1 gives smaller communities)
+    #          - The seed of the random choices of the method
+    #          - The maximum number of passes of levels (louvain only, 1 stops after the first aggregations)
+    def get_communities(self, method="louvain", resolution=1.0, random_seed=0, max_passes=10):
+        if method == "louvain":
+            return self.get_cached_node_values("communities_louvain",
+                                              {"resolution": resolution, "random_seed": random_seed,
+                                               "max_passes": max_passes},
+                                              lambda compact_graph: louvain(compact_graph, resolution, random_seed,
+                                                                            max_passes=max_passes))
+        if method == "label_propagation":
+            return self.get_cached_node_values("communities_label_propagation", {"random_seed": random_seed},
+                                              lambda compact_graph: label_propagation(compact_graph,
+                                                                                      random_seed=random_seed))
+        raise ValueError("Unknown community detection method: {0}".format(method))
+
+    # Return the community of every node as an array aligned with the node_ids of the compact graph, and the
+    # statistics of the communities (dictionary of arrays indexed by community: size, internal_edges, cut_edges,
+    # density, conductance)
+    def get_community_statistics(self, method="louvain"):
+        communities = self.get_communities(method)
+        compact_graph = self.compact_graph
+        communities = numpy.array([communities[node] for node in compact_graph.node_ids.tolist()], dtype=numpy.int64)
+        return communities, get_community_statistics(compact_graph, communities)
+
+    # Return the IncrementalCentrality following the graph, created again if the graph was changed by other means
+    def get_incremental_centrality(self, nb_sources=256, random_seed=0):
+        compact_graph = self.compact_graph
+        if self._incremental_centrality is None or self._incremental_centrality.compact_graph is not compact_graph:
+            self._incremental_centrality = IncrementalCentrality(compact_graph, nb_sources=nb_sources,
+                                                                 random_seed=random_seed)
+        return self._incremental_centrality
+
+    # Add a batch of (follower, followed) edges, the degrees, the PageRank and the approximate betweenness are
+    # updated from the new edges instead of being computed again on the whole graph
+    # Return the dictionary describing the update (see IncrementalCentrality.add_edges)
+    def add_edge_batch(self, edges):
+        incremental_centrality = self.get_incremental_centrality()
+        edges = numpy.array(edges, dtype=numpy.int64).reshape((-1, 2))
+        update = incremental_centrality.add_edges(edges[:, 0], edges[:, 1])
+        self.compact_graph = incremental_centrality.compact_graph
+        self._degree_statistics = DegreeStatistics(self.compact_graph, incremental_centrality.in_degree,
+                                                   incremental_centrality.out_degree)
+        return update
+
+    # Return a hash of the edge set identifying the version of the graph
+    def content_hash(self):
+        return self.compact_graph.content_hash()
+
+    @classmethod
+    def get_result_cache(cls):
+        return ResultCache(cls.result_cache_directory, max_size=cls.result_cache_max_size)
+
+    # Return the dictionary {node: betweenness centrality}
+    # Take 6 parameters in input:
+    #          - The class
+    #          - The number of sampled sources (None for the exact centrality)
+    #          - If the centrality is normalized
+    #          - The number of processes computing the centrality (None to choose it from the size of the graph)
+    #          - If set, the sources are sampled until the error of every value is below epsilon, nb_node is ignored
+    #          - The probability that the error is above epsilon
+    def get_nodes_by_betweenness_centrality(self, nb_node, normalized=True, nb_processes=None, epsilon=None,
+                                            delta=0.1):
+        parameters = {"k": nb_node, "normalized": normalized, "epsilon": epsilon, "delta": delta}
+
+        def compute():
+            with BetweennessCentrality(self.compact_graph, nb_processes=nb_processes) as engine:
+                if epsilon is None:
+                    return engine.compute(k=nb_node, normalized=normalized)
+                betweenness_centrality, error_bound = engine.approximate(epsilon, delta, normalized=normalized)
+                print("Betweenness centrality approximated with an error below {0}".format(error_bound))
+                return betweenness_centrality
+
+        return self.get_result_cache().get_or_compute("betweenness_centrality", self.content_hash(), parameters,
+                                                      compute)
+
+    # Return the dictionary {node: probability to be activated by a diffusion starting from the seeds}
+    # Take 7 parameters in input:
+    #          - The class
+    #          - The seeds of the diffusion
+    #          - The model: "independent_cascade" or "linear_threshold"
+    #          - The probability (or weight) of the edges, "weighted" for 1 / number of accounts followed
+    #          - The number of Monte-Carlo runs
+    #          - The number of processes running the simulations
+    #          - The seed of the random generators
+    def get_activation_probabilities(self, seeds, model="independent_cascade", probability="weighted",
+                                     nb_runs=1000, nb_processes=1, random_seed=0):
+        compact_graph = self.compact_graph
+        diffusion_model = DiffusionModel(compact_graph, model=model, probability=probability,
+                                         nb_processes=nb_processes)
+        probabilities = diffusion_model.get_activation_probabilities(seeds, nb_runs=nb_runs,
+                                                                     random_seed=random_seed)
+        return dict(zip(compact_graph.node_ids.tolist(), probabilities.tolist()))
 
     """
     Graph visualization functions
     """
 
     def get_friends_followers_distribution_figure(self):
-        user_degree = {node: self.graph.degree(node) for node in self.graph.nodes()}
-        likely_seed = sort_node_by_importance(user_degree)[:200]
+        degree_statistics = self.get_degree_statistics()
+        likely_seed = degree_statistics.top_k_indexes("total", 200)
         trace1 = go.Histogram(
-            x=[self.graph.out_degree(node[0]) for node in likely_seed],
+            x=degree_statistics.out_degree[likely_seed],
             opacity=0.75,
             name="Friends"
         )
         trace2 = go.Histogram(
-            x=[self.graph.in_degree(node[0]) for node in likely_seed],
+            x=degree_statistics.in_degree[likely_seed],
             opacity=0.75,
             name="Followers"
         )
@@ -312,17 +719,59 @@ class SocialGraph:
         fig = go.Figure(data=data, layout=layout)
         return fig
 
-    def __init__(self, name):
-        loaded_graph = self.get_graph_from_gml(name)
-        if loaded_graph:
+    # Return the figure of the distributions of the number of friends and followers with logarithmic bins
+    def get_degree_distribution_figure(self, nb_bins=20):
+        degree_statistics = self.get_degree_statistics()
+        data = []
+        for direction, name in (("out", "Friends"), ("in", "Followers")):
+            bin_edges, _, density = degree_statistics.log_binned_histogram(direction, nb_bins)
+            data.append(go.Scatter(x=numpy.sqrt(bin_edges[:-1] * bin_edges[1:]), y=density, mode="lines+markers",
+                                   name=name))
+        layout = go.Layout(title="Degree distribution", xaxis=dict(type="log"), yaxis=dict(type="log"))
+        fig = go.Figure(data=data, layout=layout)
+        return fig
+
+    # Return the figure of the number of nodes per language of their twitter account
+    def get_language_distribution_figure(self, nb_languages=15):
+        languages, counts = numpy.unique(self.get_node_attributes().get("lang"), return_counts=True)
+        order = numpy.argsort(-counts, kind="mergesort")[:nb_languages]
+        data = [go.Bar(x=[language or "unknown" for language in languages[order].tolist()], y=counts[order])]
+        layout = go.Layout(title="Languages of the users")
+        fig = go.Figure(data=data, layout=layout)
+        return fig
+
+    # Constructor of the class
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The name of the graph
+    #          - The backend keeping the graph in memory: "networkx" or "compact" (numpy arrays, the networkx
+    #            graph is only built when self.graph is accessed)
+    def __init__(self, name, backend="networkx"):
+        self.backend = backend
+        self._graph = VersionedDiGraph()
+        self._modified_graph = None
+        self._compact_graph = None
+        self._compact_graph_version = None
+        self._degree_statistics = None
+        self._incremental_centrality = None
+        self._node_attributes = None
+        self._neighbourhood_query = None
+        loaded_snapshot = self.get_graph_from_snapshot(name)
+        loaded_graph = False if loaded_snapshot else self.get_graph_from_gml(name)
+        if loaded_snapshot:
+            self.compact_graph, self.seeds, self._node_attributes = loaded_snapshot
+            self.diffusers = self.get_followed_nodes()
+            self.name = name
+        elif loaded_graph:
             self.graph = loaded_graph
-            self.modified_graph = loaded_graph
+            if backend == "compact":
+                self.compact_graph = CompactGraph.from_networkx(loaded_graph)
             self.seeds = []
             self.diffusers = self.get_followed_nodes()
             self.name = name
         else:
-            self.graph = nx.DiGraph()
-            self.modified_graph = self.graph
+            if backend == "compact":
+                self.compact_graph = CompactGraph.from_edges([], [])
             self.seeds = []
             self.name = name
             if not os.path.exists(DEFINITIONS_ROOT+"/data/graph/{0}".format(name)):
@@ -331,14 +780,20 @@ class SocialGraph:
 
 class TweetGraph:
 
-    def __init__(self, social_graph):
+    # Constructor of the class, the tweets of all the nodes are retrieved with batched requests
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The SocialGraph
+    #          - The TweetQuery used to query Elasticsearch (default to the one of the SocialGraph)
+    def __init__(self, social_graph, tweet_query=None):
         self.social_graph = social_graph
-        original_diffusers_tweets = {}
-        retweet_from_followers = {}
-        for node in social_graph.get_followed_nodes():
-            original_diffusers_tweets[node] = social_graph.retrieve_tweet_of_a_user(node)
-        for node in social_graph.graph.nodes():
-            retweet_from_followers[node] = social_graph.retrieve_retweet_from_friends()
+        tweet_query = tweet_query or social_graph.get_tweet_query()
+        self.original_diffusers_tweets = tweet_query.get_original_tweets(social_graph.get_followed_nodes())
+        friendships = {node: set(social_graph.modified_graph.successors(node))
+                       for node in social_graph.modified_graph.nodes()}
+        self.retweet_from_followers = tweet_query.get_retweets_from_friends(friendships)
+        print("Found the tweets of {0} diffusers and the retweets of {1} users"
+              .format(len(self.original_diffusers_tweets), len(self.retweet_from_followers)))
 
 """
 HELPERS FUNCTIONS
@@ -0,0 +1,162 @@
+import numpy
+
+from source.lib.edge_loader_library import execute_concurrently
+from source.lib.edge_loader_library import get_token_ranges
+
+# Attributes of the store and the numpy type of their column, the strings have a fixed width (a screen name has at
+# most 15 characters) so a column is one block of memory instead of one python object per node
+ATTRIBUTE_TYPES = {
+    "screen_name": "U15",
+    "lang": "U8",
+    "nb_followers": numpy.int64,
+    "nb_friends": numpy.int64,
+    "nb_tweets": numpy.int64
+}
+# Value of the numerical attributes that are not known
+MISSING_COUNT = -1
+
+
+# Return the empty column of an attribute for nb_nodes nodes
+def get_empty_column(attribute, nb_nodes):
+    if numpy.dtype(ATTRIBUTE_TYPES[attribute]).kind == "U":
+        return numpy.zeros(nb_nodes, dtype=ATTRIBUTE_TYPES[attribute])
+    return numpy.full(nb_nodes, MISSING_COUNT, dtype=ATTRIBUTE_TYPES[attribute])
+
+
+# This class reads the twitter_user table with a parallel scan of the token ring
+class UserTableReader:
+    columns = "node_id, screen_name, lang, nb_followers, nb_friends"
+
+    # Constructor of the class
+    # Take 5 parameters in input:
+    #          - The cassandra session
+    #          - The user table ("keyspace.table")
+    #          - The number of queries in flight at the same time
+    #          - The number of rows fetched per page
+    #          - The number of token ranges used to split the scan
+    def __init__(self, session, user_table, concurrency=64, fetch_size=5000, nb_token_ranges=256):
+        self.session = session
+        self.concurrency = concurrency
+        self.nb_token_ranges = nb_token_ranges
+        self.range_statement = session.prepare("SELECT {0} FROM {1} WHERE token(node_id) >= ? AND token(node_id) <= ?"
+                                               .format(self.columns, user_table))
+        self.range_statement.fetch_size = fetch_size
+
+    def iter_table(self):
+        return execute_concurrently(self.session, self.range_statement, get_token_ranges(self.nb_token_ranges),
+                                    self.concurrency)
+
+
+# This class stores the attributes of the nodes of a graph in columns aligned with the node_ids of its CompactGraph:
+# the attributes of the node at the index i of the graph are at the index i of every column.
+class NodeAttributeStore:
+
+    # Constructor of the class
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The sorted array of the twitter ids of the nodes (node_ids of the CompactGraph)
+    #          - Optional dictionary {attribute: column}, the missing columns are empty
+    def __init__(self, node_ids, columns=None):
+        self.node_ids = node_ids
+        self.columns = {attribute: get_empty_column(attribute, len(node_ids)) for attribute in ATTRIBUTE_TYPES}
+        for attribute, column in (columns or {}).items():
+            if attribute in ATTRIBUTE_TYPES:
+                self.columns[attribute] = numpy.asarray(column, dtype=ATTRIBUTE_TYPES[attribute])
+
+    # Fill the columns with the rows of the twitter_user table, the rows of the users outside the graph are skipped
+    # The rows are filtered by batches while they are read, so only the rows of the graph are kept in memory
+    # Return the number of nodes found in the rows
+    # Take 3 parameters in input:
+    #          - The class
+    #          - The rows of the twitter_user table
+    #          - The number of rows filtered at once
+    def load_rows(self, rows, batch_size=50000):
+        found_nodes = numpy.zeros(len(self.node_ids), dtype=bool)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                self.load_batch(batch, found_nodes)
+                batch = []
+        self.load_batch(batch, found_nodes)
+        return int(found_nodes.sum())
+
+    # Fill the columns with the rows of a batch that belong to the graph and mark their nodes in found_nodes
+    def load_batch(self, rows, found_nodes):
+        if not rows:
+            return
+        indexes, found = self.find([row.node_id for row in rows])
+        rows = [rows[position] for position in numpy.flatnonzero(found)]
+        indexes = indexes[found]
+        for attribute in UserTableReader.columns.split(", ")[1:]:
+            values = [getattr(row, attribute) for row in rows]
+            if numpy.dtype(ATTRIBUTE_TYPES[attribute]).kind == "U":
+                column = numpy.array([value or "" for value in values], dtype=ATTRIBUTE_TYPES[attribute])
+            else:
+                column = numpy.array([MISSING_COUNT if value is None else value for value in values],
+                                     dtype=ATTRIBUTE_TYPES[attribute])
+            self.columns[attribute][indexes] = column
+        found_nodes[indexes] = True
+
+    # Fill the nb_tweets column from a dictionary {twitter id: number of tweets}, the other nodes get 0 tweet
+    def load_tweet_counts(self, tweet_counts):
+        self.columns["nb_tweets"][:] = 0
+        indexes, found = self.find(list(tweet_counts.keys()))
+        self.columns["nb_tweets"][indexes[found]] = numpy.array(list(tweet_counts.values()),
+                                                                dtype=numpy.int64)[found]
+
+    def find(self, node_ids):
+        node_ids = numpy.asarray(node_ids, dtype=numpy.int64)
+        if len(self.node_ids) == 0:
+            return numpy.zeros(len(node_ids), dtype=numpy.int64), numpy.zeros(len(node_ids), dtype=bool)
+        indexes = numpy.searchsorted(self.node_ids, node_ids)
+        indexes[indexes == len(self.node_ids)] = 0
+        return indexes, self.node_ids[indexes] == node_ids
+
+    # Return the column of an attribute for all the nodes
+    def get(self, attribute):
+        return self.columns[attribute]
+
+    # Return the dictionary {attribute: value} of one node
+    def get_node(self, node_id):
+        indexes, found = self.find([node_id])
+        if not found[0]:
+            raise KeyError("The node {0} is not in the store".format(node_id))
+        return {attribute: column[indexes[0]].item() for attribute, column in self.columns.items()}
+
+    # Return a store with the same attributes aligned with other node_ids (the new nodes have empty attributes)
+    def aligned_to(self, node_ids):
+        if numpy.array_equal(node_ids, self.node_ids):
+            return self
+        indexes, found = self.find(node_ids)
+        store = NodeAttributeStore(node_ids)
+        for attribute, column in self.columns.items():
+            store.columns[attribute][found] = column[indexes[found]]
+        return store
+
+    # Return True if every node of node_ids is in the store
+    def contains_all(self, node_ids):
+        return bool(self.find(node_ids)[1].all())
+
+    # Save the store with its node_ids in a .npz file
+    def save(self, path):
+        with open(path, "wb") as store_file:
+            numpy.savez(store_file, node_ids=self.node_ids, **self.columns)
+
+    # Load a store saved by save
+    @classmethod
+    def load(cls, path):
+        with numpy.load(path) as store_file:
+            return cls(store_file["node_ids"], {attribute: store_file[attribute] for attribute in store_file.files
+                                                if attribute != "node_ids"})
+
+    # Return the columns to save in a snapshot (see CompactGraph.save_snapshot)
+    def to_snapshot_attributes(self):
+        return dict(self.columns)
+
+    # Return the store of the attributes loaded from a snapshot, or None if the snapshot has no attribute
+    @classmethod
+    def from_snapshot_attributes(cls, node_ids, attributes):
+        if not any(attribute in attributes for attribute in ATTRIBUTE_TYPES):
+            return None
+        return cls(node_ids, attributes)
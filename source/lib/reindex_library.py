@@ -0,0 +1,95 @@
+import time
+
+from elasticsearch import helpers
+
+from source.lib.edge_loader_library import execute_concurrently
+from source.lib.edge_loader_library import get_token_ranges
+
+
+# This class copies the articles stored in Cassandra to Elasticsearch.
+# The tables are read with a parallel scan of the token ring, the articles are built from the rows without any
+# request (see Article.from_cassandra) and indexed by chunks with helpers.parallel_bulk. During the load the
+# refresh and the replicas of the index are disabled, they are restored at the end even if the load failed.
+class BulkReindexer:
+
+    # Constructor of the class
+    # Take 9 parameters in input:
+    #          - The class
+    #          - The cassandra session
+    #          - The elasticsearch client
+    #          - The number of documents per bulk request
+    #          - The number of threads sending the bulk requests
+    #          - The number of token ranges used to split the scan of a table
+    #          - The number of cassandra queries in flight at the same time
+    #          - The number of rows fetched per page
+    #          - The number of documents between two progress reports
+    def __init__(self, session, es, chunk_size=500, thread_count=4, nb_token_ranges=64, concurrency=16,
+                 fetch_size=1000, report_every=10000):
+        self.session = session
+        self.es = es
+        self.chunk_size = chunk_size
+        self.thread_count = thread_count
+        self.nb_token_ranges = nb_token_ranges
+        self.concurrency = concurrency
+        self.fetch_size = fetch_size
+        self.report_every = report_every
+
+    # Yield all the rows of a table ("keyspace.table") whose partition key is the given column
+    def iter_rows(self, table, partition_key):
+        statement = self.session.prepare("SELECT * FROM {0} WHERE token({1}) >= ? AND token({1}) <= ?"
+                                         .format(table, partition_key))
+        statement.fetch_size = self.fetch_size
+        return execute_concurrently(self.session, statement, get_token_ranges(self.nb_token_ranges), self.concurrency)
+
+    # Yield the bulk actions of all the articles of the given Article classes
+    def iter_actions(self, article_classes):
+        for article_class in article_classes:
+            for row in self.iter_rows(article_class.get_table(), "url"):
+                yield article_class.from_cassandra(row).get_bulk_action()
+
+    # Return the name of the concrete index behind an index or an alias, with its refresh interval and its number of
+    # replicas (the response of get_settings is keyed by the concrete index)
+    def get_index_settings(self, index):
+        concrete_index, index_settings = next(iter(self.es.indices.get_settings(index=index).items()))
+        settings = index_settings["settings"]["index"]
+        return concrete_index, {"refresh_interval": settings.get("refresh_interval", "1s"),
+                                "number_of_replicas": settings.get("number_of_replicas", 0)}
+
+    def put_index_settings(self, index, settings):
+        self.es.indices.put_settings(index=index, body={"index": settings})
+
+    # Index all the articles of the given Article classes
+    # Return the dictionary {"documents", "errors", "seconds", "documents_per_second"}
+    # Take 2 parameters in input:
+    #          - The class
+    #          - The Article classes to reindex (ex: [AmrenArticle, DailystormerArticle])
+    def reindex(self, article_classes):
+        indexes = set()
+        for article_class in article_classes:
+            article_class.bootstrap()
+            indexes.add(article_class.es_index)
+        index_settings = dict(self.get_index_settings(index) for index in indexes)
+        nb_documents, nb_errors = 0, 0
+        start = time.time()
+        try:
+            for index in index_settings:
+                self.put_index_settings(index, {"refresh_interval": "-1", "number_of_replicas": 0})
+            for success, item in helpers.parallel_bulk(self.es, self.iter_actions(article_classes),
+                                                       thread_count=self.thread_count, chunk_size=self.chunk_size,
+                                                       raise_on_error=False, raise_on_exception=False):
+                nb_documents += 1
+                if not success:
+                    nb_errors += 1
+                    print("Failed to index: {0}".format(item))
+                if nb_documents % self.report_every == 0:
+                    elapsed = time.time() - start
+                    print("Indexed {0} documents in {1:.1f}s ({2:.0f} documents/s)"
+                          .format(nb_documents, elapsed, nb_documents / max(elapsed, 1e-9)))
+        finally:
+            for index, settings in index_settings.items():
+                self.put_index_settings(index, settings)
+                self.es.indices.refresh(index=index)
+        elapsed = time.time() - start
+        print("Reindexed {0} documents ({1} errors) in {2:.1f}s".format(nb_documents, nb_errors, elapsed))
+        return {"documents": nb_documents, "errors": nb_errors, "seconds": elapsed,
+                "documents_per_second": nb_documents / max(elapsed, 1e-9)}
@@ -0,0 +1,70 @@
+import heapq
+
+from source.lib.edge_loader_library import edges_from_row
+
+MASK_64 = 2 ** 64 - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+
+# Return a pseudo random number in [0, 1) that only depends on the node and on the seed of the sampling
+# (splitmix64 finalizer), so the same node gets the same priority in every row where it appears
+def get_priority(node_id, random_seed):
+    z = (int(node_id) + (random_seed + 1) * GOLDEN_GAMMA) & MASK_64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK_64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK_64
+    return (z ^ (z >> 31)) / 2.0 ** 64
+
+
+# This class samples the neighbours of the seeds while the rows of the network table arrive.
+# It keeps the sample_size distinct neighbours having the smallest priorities (a bottom-k reservoir), so the
+# sample is uniform over the distinct neighbours, has exactly sample_size nodes (if there are enough of them)
+# and does not depend on the order of the rows. Only the candidates of the reservoir and their edges are kept
+# in memory, never the full neighbourhood of the seeds.
+class StreamingNeighbourSampler:
+
+    # Constructor of the class
+    # Take 4 parameters in input:
+    #          - The class
+    #          - The seeds, the edges between two seeds are always kept
+    #          - The number of neighbours to sample
+    #          - The seed of the sampling, the same seed gives the same sample
+    def __init__(self, seeds, sample_size, random_seed=0):
+        self.seeds = set(seeds)
+        self.sample_size = sample_size
+        self.random_seed = random_seed
+        self.reservoir = []
+        self.candidate_edges = {}
+        self.seed_edges = []
+        self.nb_rows = 0
+
+    def add_row(self, row):
+        self.nb_rows += 1
+        neighbour = row.friend_follower_id
+        if neighbour in self.seeds:
+            self.seed_edges += edges_from_row(row)
+        elif neighbour in self.candidate_edges:
+            self.candidate_edges[neighbour] += edges_from_row(row)
+        elif self.sample_size > 0:
+            # A node refused once is always refused after: the threshold of the reservoir only decreases
+            priority = get_priority(neighbour, self.random_seed)
+            if len(self.reservoir) < self.sample_size:
+                heapq.heappush(self.reservoir, (-priority, neighbour))
+                self.candidate_edges[neighbour] = edges_from_row(row)
+            elif priority < -self.reservoir[0][0]:
+                _, evicted = heapq.heapreplace(self.reservoir, (-priority, neighbour))
+                del self.candidate_edges[evicted]
+                self.candidate_edges[neighbour] = edges_from_row(row)
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add_row(row)
+
+    def get_sampled_nodes(self):
+        return list(self.candidate_edges.keys())
+
+    # Return the edges between the seeds and the edges between the seeds and the sampled neighbours
+    def get_edges(self):
+        edges = list(self.seed_edges)
+        for neighbour_edges in self.candidate_edges.values():
+            edges += neighbour_edges
+        return edges
@@ -0,0 +1,78 @@
+import threading
+
+from cassandra.cluster import Cluster
+from elasticsearch import Elasticsearch
+
+# Settings of the storage clients, change them with configure before the first use of the clients
+STORAGE_SETTINGS = {
+    "cassandra_hosts": ["192.168.2.33"],
+    "cassandra_port": 9042,
+    # Number of threads of the driver handling the requests and their callbacks
+    "cassandra_executor_threads": 4,
+    "elasticsearch_hosts": [{"host": "192.168.2.33", "port": 9200}],
+    # Number of HTTP connections kept open to every Elasticsearch node
+    "elasticsearch_maxsize": 25,
+}
+
+# The clients created by the registry, shared by all the libraries and the jobs of the process
+_clients = {}
+_clients_lock = threading.RLock()
+
+
+# Change the settings of the storage clients, the clients already created are closed and the next use creates them
+# again with the new settings
+def configure(**settings):
+    for name in settings:
+        if name not in STORAGE_SETTINGS:
+            raise ValueError("Unknown storage setting: {0}".format(name))
+    shutdown()
+    STORAGE_SETTINGS.update(settings)
+
+
+# Return the client of the given name, created with the given function on the first call
+def get_client(name, create):
+    if name not in _clients:
+        with _clients_lock:
+            if name not in _clients:
+                _clients[name] = create()
+    return _clients[name]
+
+
+def get_cluster():
+    return get_client("cassandra_cluster", lambda: Cluster(
+        STORAGE_SETTINGS["cassandra_hosts"], port=STORAGE_SETTINGS["cassandra_port"],
+        executor_threads=STORAGE_SETTINGS["cassandra_executor_threads"]))
+
+
+# Return the Cassandra session of the process, it is not bound to a keyspace so the tables are named "keyspace.table"
+def get_session():
+    return get_client("cassandra_session", lambda: get_cluster().connect())
+
+
+# Return the Elasticsearch client of the process
+def get_elasticsearch():
+    return get_client("elasticsearch", lambda: Elasticsearch(STORAGE_SETTINGS["elasticsearch_hosts"],
+                                                             maxsize=STORAGE_SETTINGS["elasticsearch_maxsize"]))
+
+
+# Close the clients, the next use creates them again
+def shutdown():
+    with _clients_lock:
+        if "cassandra_cluster" in _clients:
+            _clients["cassandra_cluster"].shutdown()
+        _clients.clear()
+
+
+# Class attribute giving a shared client, the client is only created when the attribute is used for the first time
+# (ex: session = LazyClient(get_session) then self.session or cls.session)
+class LazyClient:
+
+    # Constructor of the class
+    # Take 2 parameters in input:
+    #          - The class
+    #          - The function returning the client
+    def __init__(self, get_client_function):
+        self.get_client_function = get_client_function
+
+    def __get__(self, instance, owner):
+        return self.get_client_function()
@@ -0,0 +1,100 @@
+import numpy
+from scipy import sparse
+
+
+# This class answers neighbourhood questions for many nodes at once on a CompactGraph.
+# The sources are the rows of a sparse (nb_sources x nb_nodes) frontier matrix, one hop of all the BFS is one sparse
+# matrix product with the adjacency, so the walks are done by scipy instead of python loops over successors.
+# The direction "out" follows the edges (friends, friends of friends...), "in" follows them backward (followers,
+# followers of followers: the audience of the sources) and "both" ignores their direction.
+class NeighbourhoodQuery:
+
+    # Constructor of the class
+    # Take 2 parameters in input:
+    #          - The class
+    #          - The CompactGraph
+    def __init__(self, compact_graph):
+        self.compact_graph = compact_graph
+        nb_nodes = compact_graph.number_of_nodes
+        # Boolean matrices: their products count no paths (an int8 count of 256 paths would wrap around to 0)
+        self.adjacency = sparse.csr_matrix((numpy.ones(compact_graph.number_of_edges, dtype=bool),
+                                            compact_graph.out_indices, compact_graph.out_indptr),
+                                           shape=(nb_nodes, nb_nodes))
+        self.matrices = {}
+
+    # Return the matrix M of a direction: the nodes at one hop of the sources of the frontier F are the columns of F.M
+    def get_matrix(self, direction):
+        if direction not in self.matrices:
+            if direction == "out":
+                self.matrices[direction] = self.adjacency
+            elif direction == "in":
+                self.matrices[direction] = self.adjacency.transpose().tocsr()
+            elif direction == "both":
+                self.matrices[direction] = (self.adjacency + self.adjacency.transpose()).tocsr()
+            else:
+                raise ValueError("Unknown direction: {0}".format(direction))
+        return self.matrices[direction]
+
+    # Return the sparse (nb_sources x nb_nodes) frontier matrix of the sources given as twitter ids
+    def get_sources_matrix(self, sources):
+        indexes = self.compact_graph.index_of(list(sources))
+        return sparse.csr_matrix((numpy.ones(len(indexes), dtype=bool), (numpy.arange(len(indexes)), indexes)),
+                                 shape=(len(indexes), self.compact_graph.number_of_nodes))
+
+    # Yield (hop, frontier) for the hops 1, 2, ... of the BFS of all the sources, the frontier being the sparse
+    # (nb_sources x nb_nodes) matrix of the nodes discovered at this hop
+    def iter_frontiers(self, sources, direction="out", max_hops=None):
+        matrix = self.get_matrix(direction)
+        visited = self.get_sources_matrix(sources)
+        frontier = visited
+        hop = 0
+        while frontier.nnz > 0 and (max_hops is None or hop < max_hops):
+            hop += 1
+            reached = frontier.dot(matrix)
+            frontier = reached > visited
+            frontier.eliminate_zeros()
+            yield hop, frontier
+            visited = visited + frontier
+
+    # Return the sparse boolean (nb_sources x nb_nodes) matrix of the nodes at most k hops away from every source
+    # (every node reachable from the source if k is None)
+    # Take 5 parameters in input:
+    #          - The class
+    #          - The twitter ids of the sources
+    #          - The maximum number of hops
+    #          - The direction
+    #          - If the source belongs to its own neighbourhood
+    def get_k_hop(self, sources, k=1, direction="out", include_sources=False):
+        neighbourhood = self.get_sources_matrix(sources) if include_sources else \
+            sparse.csr_matrix((len(sources), self.compact_graph.number_of_nodes), dtype=bool)
+        for _, frontier in self.iter_frontiers(sources, direction, k):
+            neighbourhood = neighbourhood + frontier
+        return neighbourhood.tocsr()
+
+    # Return the sparse boolean matrix of the nodes reachable from every source
+    def get_reachable(self, sources, direction="out"):
+        return self.get_k_hop(sources, None, direction)
+
+    # Return the (nb_sources x nb_nodes) array of the number of hops from every source to every node (-1 if the
+    # node can not be reached), the sources are processed by batches to bound the memory of the frontiers
+    def get_hop_distances(self, sources, direction="out", max_hops=None, batch_size=256):
+        sources = list(sources)
+        distances = numpy.full((len(sources), self.compact_graph.number_of_nodes), -1, dtype=numpy.int32)
+        for start in range(0, len(sources), batch_size):
+            batch = sources[start:start + batch_size]
+            batch_distances = distances[start:start + len(batch)]
+            batch_distances[numpy.arange(len(batch)), self.compact_graph.index_of(batch)] = 0
+            for hop, frontier in self.iter_frontiers(batch, direction, max_hops):
+                rows, columns = frontier.nonzero()
+                batch_distances[rows, columns] = hop
+        return distances
+
+    # Return the number of nodes at most k hops away from every node of the graph (array aligned with node_ids)
+    # With the direction "in" it is the size of the audience reached in k retweets
+    def get_neighbourhood_sizes(self, k=1, direction="in", batch_size=1024):
+        node_ids = self.compact_graph.node_ids
+        sizes = numpy.zeros(len(node_ids), dtype=numpy.int64)
+        for start in range(0, len(node_ids), batch_size):
+            batch = node_ids[start:start + batch_size]
+            sizes[start:start + len(batch)] = numpy.asarray(self.get_k_hop(batch, k, direction).sum(axis=1)).ravel()
+        return sizes
@@ -0,0 +1,156 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from elasticsearch import helpers
+
+
+# Return the time of a tweet in milliseconds since the epoch
+def get_timestamp(tweet_source):
+    if "timestamp_ms" in tweet_source:
+        return int(tweet_source["timestamp_ms"])
+    return int(datetime.strptime(tweet_source["created_at"], "%a %b %d %X %z %Y").timestamp() * 1000)
+
+
+# This class retrieves the tweets of many users from the tweets index with few requests.
+# The users are grouped in chunks queried with a terms query, the chunks are processed by a pool of threads
+# and the results are streamed with a scroll, so no result is silently cut by a maximum size.
+class TweetQuery:
+
+    # Constructor of the class
+    # Take 8 parameters in input:
+    #          - The class
+    #          - The Elasticsearch client
+    #          - The name of the index
+    #          - The document type
+    #          - The number of user ids per request
+    #          - The maximum number of friendships per request of get_retweets_from_friends (the friend ids of a
+    #            request stay far below index.max_terms_count)
+    #          - The number of threads sending requests
+    #          - The number of documents per page of the scroll
+    def __init__(self, es, index="tweets", doc_type="tweet", chunk_size=500, max_friendships=10000, nb_workers=8,
+                 page_size=1000):
+        self.es = es
+        self.index = index
+        self.doc_type = doc_type
+        self.chunk_size = chunk_size
+        self.max_friendships = max_friendships
+        self.nb_workers = nb_workers
+        self.page_size = page_size
+
+    def scan(self, body):
+        return helpers.scan(self.es, query=body, index=self.index, doc_type=self.doc_type, scroll="2m",
+                            size=self.page_size)
+
+    # Apply the function to every chunk in the pool of threads and merge the dictionaries returned
+    def map_requests(self, function, chunks):
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.nb_workers) as executor:
+            for chunk_result in executor.map(function, chunks):
+                for key, values in chunk_result.items():
+                    results.setdefault(key, []).extend(values)
+        return results
+
+    # Apply the function to every chunk of ids in the pool of threads and merge the dictionaries returned
+    def map_chunks(self, function, ids):
+        ids = list(ids)
+        return self.map_requests(function, [ids[i:i + self.chunk_size] for i in range(0, len(ids), self.chunk_size)])
+
+    # Return the list of the (user ids, friend ids) of the requests of get_retweets_from_friends: the users are
+    # grouped until their number of friendships reaches max_friendships (or there are chunk_size users), the friends
+    # of a user having more friendships are split in several requests
+    def get_friendship_chunks(self, friendships):
+        chunks = []
+        user_ids, friend_ids, nb_friendships = [], set(), 0
+        for user_id, friends in friendships.items():
+            friends = list(friends)
+            if len(friends) > self.max_friendships:
+                chunks += [([user_id], friends[i:i + self.max_friendships])
+                           for i in range(0, len(friends), self.max_friendships)]
+                continue
+            if user_ids and (nb_friendships + len(friends) > self.max_friendships or
+                             len(user_ids) == self.chunk_size):
+                chunks.append((user_ids, list(friend_ids)))
+                user_ids, friend_ids, nb_friendships = [], set(), 0
+            if friends:
+                user_ids.append(user_id)
+                friend_ids.update(friends)
+                nb_friendships += len(friends)
+        if user_ids:
+            chunks.append((user_ids, list(friend_ids)))
+        return chunks
+
+    # Return the dictionary {user id: tweets written by the user that are not retweets}
+    def get_original_tweets(self, user_ids):
+        def get_chunk(chunk):
+            body = {
+                "query": {
+                    "bool": {
+                        "must_not": {"exists": {"field": "retweeted_status"}},
+                        "filter": {"terms": {"user.id": chunk}}
+                    }
+                }
+            }
+            tweets = {}
+            for tweet in self.scan(body):
+                tweets.setdefault(tweet["_source"]["user"]["id"], []).append(tweet)
+            return tweets
+
+        return self.map_chunks(get_chunk, user_ids)
+
+    # Return the dictionary {user id: number of tweets of the user in the index}, the users without tweet are missing
+    def count_tweets(self, user_ids):
+        def get_chunk(chunk):
+            body = {
+                "size": 0,
+                "query": {"bool": {"filter": {"terms": {"user.id": chunk}}}},
+                "aggs": {"users": {"terms": {"field": "user.id", "size": len(chunk)}}}
+            }
+            response = self.es.search(index=self.index, doc_type=self.doc_type, body=body)
+            return {bucket["key"]: [bucket["doc_count"]] for bucket in response["aggregations"]["users"]["buckets"]}
+
+        return {user_id: counts[0] for user_id, counts in self.map_chunks(get_chunk, user_ids).items()}
+
+    # Return the dictionary {user id: retweets made by the user of a tweet of one of his friends linking to amren}
+    # Take 2 parameters in input:
+    #          - The class
+    #          - The dictionary {user id: set of the ids of his friends}
+    def get_retweets_from_friends(self, friendships):
+        def get_chunk(chunk):
+            user_ids, friend_ids = chunk
+            body = {
+                "query": {
+                    "bool": {
+                        "filter": [{"terms": {"user.id": user_ids}},
+                                   {"terms": {"retweeted_status.user.id": friend_ids}},
+                                   {"exists": {"field": "retweeted_status.text"}},
+                                   {"wildcard": {"retweeted_status.entities.urls.display_url": "*amren*"}}
+                                   ]
+                    }
+                }
+            }
+            retweets = {}
+            for tweet in self.scan(body):
+                user_id = tweet["_source"]["user"]["id"]
+                # The terms queries match every user with every friend of the chunk, keep the real friendships
+                if tweet["_source"]["retweeted_status"]["user"]["id"] in friendships[user_id]:
+                    retweets.setdefault(user_id, []).append(tweet)
+            return retweets
+
+        return self.map_requests(get_chunk, self.get_friendship_chunks(friendships))
+
+    # Yield every retweet of the index as (retweeter id, time of the retweet, original tweet id, original author id,
+    # time of the original tweet), with one scroll over the index that only reads the needed fields
+    def iter_retweets(self):
+        body = {
+            "_source": ["user.id", "timestamp_ms", "created_at", "retweeted_status.id", "retweeted_status.user.id",
+                        "retweeted_status.created_at"],
+            "query": {
+                "bool": {
+                    "filter": {"exists": {"field": "retweeted_status.id"}}
+                }
+            }
+        }
+        for tweet in self.scan(body):
+            source = tweet["_source"]
+            original = source["retweeted_status"]
+            yield (source["user"]["id"], get_timestamp(source), original["id"], original["user"]["id"],
+                   get_timestamp(original))
@@ -1,10 +1,10 @@
-from elasticsearch import Elasticsearch
-from cassandra.cluster import Cluster
 from elasticsearch import helpers
 import tweepy
 from cassandra.concurrent import execute_concurrent_with_args
 
 from source.settings import settings
+from source.lib.storage_library import get_elasticsearch
+from source.lib.storage_library import get_session
 
 if __name__ == '__main__' and __package__ is None:
     from os import sys, path
@@ -60,29 +60,25 @@ AUTH = tweepy.OAuthHandler(settings.CONSUMER_KEY, settings.CONSUMER_SECRET)
 AUTH.set_access_token(settings.ACCESS_TOKEN, settings.ACCESS_TOKEN_SECRET)
 API = tweepy.API(AUTH)
 
-# Cassandra
-CLUSTER = Cluster(['192.168.2.33'], port=9042)
-SESSION = CLUSTER.connect()
-
-# Elasticsearch
-ES_HOST = {"host": "192.168.2.33", "port": 9200}
-ES = Elasticsearch([ES_HOST])
+# Cassandra table of the tweets
+TWEETS_TABLE = "twitter.tweets"
+# If the tweets index and table were created by this process
+STORAGE_INITIALISED = False
 
 
 # Function to initialise cassandra manage the table and keyspace creation
-# It will also set the KEYSPACE
+# The session is shared by all the libraries so it is not bound to the keyspace, the table is named "keyspace.table"
 def cassandra_initialisation(session, strategy, replication_factor, keyspace, table_name):
     request = "CREATE KEYSPACE IF NOT EXISTS {0}" \
               " WITH replication = {{'class': '{1}', 'replication_factor': '{2}' }}"
     request = request.format(keyspace, strategy, replication_factor)
     session.execute(request)
-    session.set_keyspace(keyspace)
-    table = """CREATE TABLE IF NOT EXISTS {} (
+    table = """CREATE TABLE IF NOT EXISTS {}.{} (
                 node_id bigint,
                 tweet_id bigint,
                 json_tweet text,
                 PRIMARY KEY ((node_id), tweet_id)
-            );""".format(table_name)
+            );""".format(keyspace, table_name)
     session.execute(table)
 
 
@@ -94,8 +90,8 @@ def save_tweets(node_id, tweets, session, es):
 
 # Function to save the "protected user" that doesn't want to make their tweets public
 def save_protected(node_id, session):
-    prepared_statement = session.prepare("INSERT INTO tweets (node_id, tweet_id, json_tweet) VALUES ({}, ?, ?)"
-                                         .format(node_id))
+    prepared_statement = session.prepare("INSERT INTO {} (node_id, tweet_id, json_tweet) VALUES ({}, ?, ?)"
+                                         .format(TWEETS_TABLE, node_id))
     session.execute(prepared_statement, (0, "protected"))
 
 
@@ -103,8 +99,8 @@ def save_protected(node_id, session):
 def save_tweets_in_cassandra(node_id, tweets, session):
     tweets_id = [tweet['id'] for tweet in tweets]
     tweet_string = [str(tweet) for tweet in tweets]
-    prepared_statement = session.prepare("INSERT INTO tweets (node_id, tweet_id, json_tweet) VALUES ({}, ?, ?)"
-                                         .format(node_id))
+    prepared_statement = session.prepare("INSERT INTO {} (node_id, tweet_id, json_tweet) VALUES ({}, ?, ?)"
+                                         .format(TWEETS_TABLE, node_id))
     execute_concurrent_with_args(session, prepared_statement, zip(tweets_id, tweet_string))
     print("Node: {0} containing {1} tweets save into the database".format(node_id, len(tweets)))
 
@@ -130,27 +126,35 @@ def get_tweet(node_id):
 
 # Function that process an ID and save the tweets corresponding to this user
 def collect_and_save_tweet_from_user(user_id):
-    query = "SELECT COUNT(*) FROM tweets WHERE node_id={0}".format(user_id)
-    response = SESSION.execute(query)
+    storage_initialisation()
+    session = get_session()
+    query = "SELECT COUNT(*) FROM {0} WHERE node_id={1}".format(TWEETS_TABLE, user_id)
+    response = session.execute(query)
     if response[0].count == 0:
         try:
             print("Getting node: {}".format(user_id))
             statuses = get_tweet(user_id)
             tweets = [status._json for status in statuses]
-            save_tweets(user_id, tweets, SESSION, ES)
+            save_tweets(user_id, tweets, session, get_elasticsearch())
         except Exception:
             print("Protected user")
-            save_protected(user_id, SESSION)
+            save_protected(user_id, session)
             pass
     else:
         print("Node: {0}, already fetch".format(user_id))
 
 
-# Initialise Cassandra and elasticsearch
-if not ES.indices.exists("tweets"):
-    ES.indices.create("tweets", body=TWEETS_MAPPING)
-
-cassandra_initialisation(SESSION, "SimpleStrategy", 2, "twitter", "tweets")
+# Initialise Cassandra and elasticsearch, only once per process (on the first use instead of the import)
+def storage_initialisation():
+    global STORAGE_INITIALISED
+    if STORAGE_INITIALISED:
+        return
+    es = get_elasticsearch()
+    if not es.indices.exists("tweets"):
+        es.indices.create("tweets", body=TWEETS_MAPPING)
+    keyspace, table_name = TWEETS_TABLE.split(".")
+    cassandra_initialisation(get_session(), "SimpleStrategy", 2, keyspace, table_name)
+    STORAGE_INITIALISED = True
 
 
 
@@ -1,17 +1,17 @@
 from datetime import datetime
 from source.lib.network_library import SocialGraph
 from source.lib.network_library import sort_node_by_importance
-from cassandra.cluster import Cluster
-from elasticsearch import Elasticsearch
 from elasticsearch import helpers
 
+from source.lib.storage_library import LazyClient
+from source.lib.storage_library import get_elasticsearch
+from source.lib.storage_library import get_session
+
 
 class TwitterUser:
 
-    cluster = Cluster(['192.168.2.33'], port=9042)
-    session = cluster.connect()
-    es_host = {"host": "192.168.2.33", "port": 9200}
-    es = Elasticsearch([es_host])
+    session = LazyClient(get_session)
+    es = LazyClient(get_elasticsearch)
     user_table = "twitter.twitter_user"
 
     def get_average_tweet_numbers_per_hour(self):
@@ -130,8 +130,19 @@ class TwitterUser:
         self.friends = friends
         self.followers = followers
 
+    # Return the list of the TwitterUser of the given nodes of a SocialGraph, the friends and the followers of all the
+    # nodes are found with two batched neighbourhood queries instead of one walk of the graph per node
+    @classmethod
+    def from_social_graph(cls, social_graph, twitter_ids):
+        twitter_ids = list(twitter_ids)
+        friends = social_graph.get_k_hop_neighbourhoods(twitter_ids, 1, "out")
+        followers = social_graph.get_k_hop_neighbourhoods(twitter_ids, 1, "in")
+        return [cls(twitter_id, friends[twitter_id].tolist(), followers[twitter_id].tolist())
+                for twitter_id in twitter_ids]
+
 
-graph = SocialGraph("sub_graph_14000_nodes")
-test = TwitterUser(196168350, graph.graph.successors(196168350), graph.graph.predecessors(196168350))
-print(test.get_average_tweet_numbers_per_hour())
-print(test.get_user_info())
+if __name__ == '__main__':
+    graph = SocialGraph("sub_graph_14000_nodes")
+    test = TwitterUser.from_social_graph(graph, [196168350])[0]
+    print(test.get_average_tweet_numbers_per_hour())
+    print(test.get_user_info())
@@ -0,0 +1,28 @@
+import networkx as nx
+
+from source.lib.compact_graph_library import CompactGraph
+from source.lib.incremental_library import IncrementalCentrality
+
+
+# 40 x 40 grid whose neighbours follow each other, the nodes are numbered row by row
+def get_grid():
+    return nx.convert_node_labels_to_integers(nx.grid_2d_graph(40, 40).to_directed(), ordering="sorted")
+
+
+def test_local_change_visits_a_bounded_region():
+    grid = get_grid()
+    incremental_centrality = IncrementalCentrality(CompactGraph.from_networkx(grid), nb_sources=16)
+    update = incremental_centrality.add_edges([0], [41])
+    assert update["new_edges"] == 1
+    assert 0 < update["pagerank_visited_nodes"] < len(grid) // 8
+
+
+def test_pagerank_error_is_bounded_by_the_tolerance():
+    grid = get_grid()
+    incremental_centrality = IncrementalCentrality(CompactGraph.from_networkx(grid), nb_sources=16)
+    incremental_centrality.add_edges([0, 800], [41, 842])
+    grid.add_edges_from([(0, 41), (800, 842)])
+    expected = nx.pagerank(grid, tol=1e-14, max_iter=10000)
+    pagerank = incremental_centrality.get_pagerank()
+    error = sum(abs(pagerank[node] - expected[node]) for node in expected)
+    assert error < incremental_centrality.tolerance / (1 - incremental_centrality.damping)
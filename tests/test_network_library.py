@@ -0,0 +1,101 @@
+import networkx as nx
+import pytest
+
+from source.lib import network_library
+from source.lib.edge_cache_library import EdgeRow
+from source.lib.edge_loader_library import EdgeSource
+from source.lib.network_library import SocialGraph
+
+
+# Network table kept in memory: node 1 and node 2 are crawled
+class MemoryEdgeSource(EdgeSource):
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def iter_partitions(self, node_ids):
+        return iter([row for row in self.rows if row.node_id in set(node_ids)])
+
+    def iter_restricted_partitions(self, node_ids, friend_follower_ids, chunk_size=None):
+        return iter([row for row in self.rows if row.node_id in set(node_ids) and
+                     row.friend_follower_id in set(friend_follower_ids)])
+
+    def iter_table(self):
+        return iter(self.rows)
+
+    def distinct_node_ids(self):
+        return sorted(set(row.node_id for row in self.rows))
+
+
+ROWS = [EdgeRow(1, 2, True, True), EdgeRow(1, 3, True, False), EdgeRow(1, 4, False, True), EdgeRow(1, 5, True, False),
+        EdgeRow(2, 3, False, True), EdgeRow(2, 5, True, True), EdgeRow(2, 6, True, False)]
+
+
+@pytest.fixture
+def edge_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(network_library, "DEFINITIONS_ROOT", str(tmp_path))
+    edge_source = MemoryEdgeSource(ROWS)
+    monkeypatch.setattr(SocialGraph, "get_edge_loader", classmethod(lambda cls: edge_source))
+    return edge_source
+
+
+def get_edges(social_graph):
+    return set(social_graph.compact_graph.get_edge_list())
+
+
+def get_sampled_graph(name, nodes, edges):
+    social_graph = SocialGraph(name)
+    social_graph.load_edges(edges, nodes=nodes)
+    return social_graph
+
+
+@pytest.mark.parametrize("backend", ["networkx", "compact"])
+def test_merge_of_sampled_graphs_has_the_edges_of_the_union(edge_source, backend):
+    # The sampled graphs miss edges between their own nodes: 1 -> 5, 2 -> 5 and 5 -> 2 in the first one,
+    # 1 -> 2, 1 -> 3 and 3 -> 2 in the second one (2 -> 5 is also between the shared node 2 and a node of the first)
+    first_graph = get_sampled_graph("first", [1, 2, 5, 6], [(1, 2), (2, 1), (2, 6)])
+    second_graph = get_sampled_graph("second", [1, 2, 3, 4], [(2, 1), (4, 1)])
+    expected = SocialGraph.build_graph_from_nodes({1, 2, 3, 4, 5, 6}, "expected")
+    merged_graph = SocialGraph.merge([first_graph, second_graph], "merged", backend=backend)
+    assert get_edges(merged_graph) == get_edges(expected)
+
+
+# The rows giving the edges inside the first graph are removed from the table before the merge, so they can only come
+# from its edge list
+def test_merge_of_induced_graphs_only_reads_the_edges_between_the_graphs(edge_source):
+    first_graph = SocialGraph.build_graph_from_nodes({1, 2, 5, 6}, "first")
+    second_graph = SocialGraph.build_graph_from_nodes({1, 3, 4}, "second")
+    expected = SocialGraph.build_graph_from_nodes({1, 2, 3, 4, 5, 6}, "expected")
+    edge_source.rows = [row for row in ROWS if row.node_id != 1 or row.friend_follower_id in (3, 4)]
+    merged_graph = SocialGraph.merge([first_graph, second_graph], "merged", induced=True)
+    assert get_edges(merged_graph) == get_edges(expected)
+
+
+def get_graph_with_chain(backend):
+    # 1 -> 2 -> 3 is a chain of leaves ending on the cycle 3 <-> 4, 5 follows 3 and 6 follows 5 and 3
+    social_graph = SocialGraph("leaves", backend=backend)
+    social_graph.load_edges([(1, 2), (2, 3), (3, 4), (4, 3), (5, 3), (6, 5), (6, 3)])
+    return social_graph
+
+
+@pytest.mark.parametrize("backend", ["networkx", "compact"])
+def test_remove_useless_leaves_updates_the_degrees_after_every_removal(edge_source, backend):
+    social_graph = get_graph_with_chain(backend)
+    social_graph.remove_useless_leaves()
+    # 2 is only a leaf once 1 is removed, 5 is not a leaf because 6 is checked after it
+    assert sorted(social_graph.modified_graph.nodes()) == [3, 4, 5, 6]
+    assert social_graph.number_of_nodes() == 6
+    assert sorted(social_graph.graph.nodes()) == [1, 2, 3, 4, 5, 6]
+
+
+def test_remove_useless_leaves_matches_the_removal_one_node_at_a_time(edge_source):
+    random_graph = nx.gnm_random_graph(300, 330, directed=True, seed=1)
+    expected = random_graph.copy()
+    for node in list(expected.nodes()):
+        if expected.out_degree(node) == 1 and expected.in_degree(node) == 1:
+            expected.remove_node(node)
+    social_graph = SocialGraph("random")
+    social_graph.load_edges(random_graph.edges(), nodes=random_graph.nodes())
+    social_graph.remove_useless_leaves(nb_out_edge=1)
+    assert set(social_graph.modified_graph.edges()) == set(expected.edges())
+    assert len(social_graph.graph) == len(random_graph)
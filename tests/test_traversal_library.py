@@ -0,0 +1,36 @@
+import numpy
+
+from source.lib.compact_graph_library import CompactGraph
+from source.lib.traversal_library import NeighbourhoodQuery
+
+
+# Graph 0 -> 1..nb_paths -> sink: the sink is reached by nb_paths paths of 2 hops
+def get_parallel_paths_query(nb_paths):
+    sink = nb_paths + 1
+    sources = [0] * nb_paths + list(range(1, nb_paths + 1))
+    targets = list(range(1, nb_paths + 1)) + [sink] * nb_paths
+    return NeighbourhoodQuery(CompactGraph.from_edges(sources, targets)), sink
+
+
+def test_k_hop_counts_no_paths():
+    for nb_paths in (255, 256, 512):
+        query, sink = get_parallel_paths_query(nb_paths)
+        neighbourhood = query.get_k_hop([0], 2)
+        assert neighbourhood.nnz == nb_paths + 1
+        assert neighbourhood[0, sink]
+
+
+def test_hop_distances_of_a_node_reached_by_many_paths():
+    query, sink = get_parallel_paths_query(256)
+    distances = query.get_hop_distances([0])
+    assert distances[0, sink] == 2
+    assert (distances[0, 1:sink] == 1).all()
+    assert query.get_reachable([0]).nnz == 257
+
+
+def test_audience_sizes_of_a_node_reached_by_many_paths():
+    query, sink = get_parallel_paths_query(256)
+    sizes = query.get_neighbourhood_sizes(k=2, direction="in")
+    assert sizes[sink] == 257
+    assert sizes[0] == 0
+    assert numpy.array_equal(query.get_neighbourhood_sizes(k=2, direction="both")[[0, sink]], [257, 257])